@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Benchmark upload_to_zenodo.archive against a local fake Zenodo.
+
+For every engine and batch size, a fresh `zen.testing.FakeZenodo` is started
+and `archive()` uploads that many synthetic papers to it from a separate
+process. Reports papers per second, p50 / p99 latency of each upload step
+(in-process engines only), peak resident memory and throttled responses.
+
+Usage
+-----
+$ PYTHONPATH=.:scripts python ./benchmarks/bench_archive.py \
+    --sizes 100 1000 10000 \
+    --engines async pipeline joblib \
+    --latency 0.01
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import zen.testing
+
+STEPS = ('create', 'upload', 'metadata', 'publish', 'get')
+
+
+def synthetic_papers(num_papers, pdf_file):
+    return [dict(title='Synthetic paper {}'.format(n),
+                 author=['Ada Lovelace', 'Charles Babbage'],
+                 year='2099', ee=pdf_file, pages='{}-{}'.format(n, n + 5),
+                 abstract='Abstract of synthetic paper {}.'.format(n),
+                 dblp_key='conf/ismir/Synthetic{}'.format(n))
+            for n in range(num_papers)]
+
+
+def synthetic_conferences():
+    return {'2099': dict(
+        conference_dates='January 1-2, 2099', conference_place='Nowhere',
+        imprint_place='Nowhere', conference_title='ISMIR',
+        partof_title='Proceedings of ISMIR 2099', publication_date='2099-01-01',
+        imprint_isbn='0', doi=None, conference_acronym='ISMIR 2099',
+        conference_url='http://localhost', imprint_publisher='ISMIR',
+        upload_type='publication', publication_type='conferencepaper',
+        access_right='open', license='CC-BY-4.0', editors=[])}
+
+
+def _step(method, path):
+    if '/api/files/' in path:
+        return 'upload'
+    elif path.endswith('/actions/publish'):
+        return 'publish'
+    elif method == 'post':
+        return 'create'
+    elif method == 'put':
+        return 'metadata'
+    return 'get'
+
+
+def _run(num_papers, pdf_file, engine, concurrency, upload_workers, num_cpus, queue):
+    # Imported here, so the child picks up the fake host from the environment.
+    import zen.api
+    import upload_to_zenodo
+
+    timings = {step: [] for step in STEPS}
+    request = zen.api.ZenodoClient._request
+
+    def timed(self, method, path, *args, **kwargs):
+        now = time.perf_counter()
+        try:
+            return request(self, method, path, *args, **kwargs)
+        finally:
+            timings[_step(method, path)].append(time.perf_counter() - now)
+
+    zen.api.ZenodoClient._request = timed
+
+    papers = synthetic_papers(num_papers, pdf_file)
+    now = time.perf_counter()
+    upload_to_zenodo.archive(papers, synthetic_conferences(), zen.api.DEV,
+                             num_cpus=num_cpus, engine=engine,
+                             concurrency=concurrency, upload_workers=upload_workers)
+    elapsed = time.perf_counter() - now
+
+    rss = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss +
+           resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    queue.put(dict(elapsed=elapsed, timings=timings, rss_mb=rss / 1024.))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def run(num_papers, pdf_file, engine, concurrency, upload_workers, num_cpus,
+        **fake_params):
+    with zen.testing.FakeZenodo(**fake_params) as fake:
+        os.environ['ZENODO_HOST_DEV'] = fake.host
+        os.environ['ZENODO_TOKEN_DEV'] = fake.token
+
+        ctx = multiprocessing.get_context('spawn')
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(num_papers, pdf_file, engine, concurrency,
+                                              upload_workers, num_cpus, queue))
+        proc.start()
+        result = queue.get()
+        proc.join()
+        result['throttled'] = fake.stats[429]
+
+    return result
+
+
+def main(sizes, engines, concurrency, upload_workers, num_cpus, pdf_file,
+         **fake_params):
+    tmpdir = tempfile.mkdtemp()
+    pdf_copy = os.path.join(tmpdir, 'paper.pdf')
+    shutil.copy(pdf_file, pdf_copy)
+
+    header = '{:>8s} {:>7s} {:>10s} {:>9s} {:>5s}'.format(
+        'engine', 'papers', 'papers/s', 'rss (MB)', '429s')
+    header += ''.join(' {:>17s}'.format(step + ' p50/p99') for step in STEPS[:4])
+    print(header)
+
+    try:
+        for engine in engines:
+            for num_papers in sizes:
+                res = run(num_papers, pdf_copy, engine, concurrency, upload_workers,
+                          num_cpus, **fake_params)
+                row = '{:>8s} {:>7d} {:>10.1f} {:>9.1f} {:>5d}'.format(
+                    engine, num_papers, num_papers / res['elapsed'], res['rss_mb'],
+                    res['throttled'])
+                for step in STEPS[:4]:
+                    values = res['timings'][step]
+                    if values:
+                        row += ' {:>8.1f}/{:<8.1f}'.format(
+                            1000 * percentile(values, 0.5), 1000 * percentile(values, 0.99))
+                    else:
+                        row += ' {:>17s}'.format('-')
+                print(row)
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes",
+                        metavar="sizes", type=int, nargs='+', default=[100, 1000, 10000],
+                        help="Numbers of synthetic papers to upload.")
+    parser.add_argument("--engines",
+                        metavar="engines", type=str, nargs='+', default=['async'],
+                        help="Engines of upload_to_zenodo.archive to compare.")
+    parser.add_argument("--concurrency",
+                        metavar="concurrency", type=int, default=16,
+                        help="Papers in flight at once for the async engine, or "
+                             "workers per light step for the pipeline engine.")
+    parser.add_argument("--upload_workers",
+                        metavar="upload_workers", type=int, default=4,
+                        help="File upload workers for the pipeline engine.")
+    parser.add_argument("--num_cpus",
+                        metavar="num_cpus", type=int, default=-2,
+                        help="Number of workers for the joblib engine.")
+    parser.add_argument("--latency",
+                        metavar="latency", type=float, default=0.01,
+                        help="Fake server latency per request, in seconds.")
+    parser.add_argument("--error_rate",
+                        metavar="error_rate", type=float, default=0.0,
+                        help="Fraction of requests failing with a transient 503; failed POSTs "
+                             "are not retried.")
+    parser.add_argument("--rate_limit",
+                        metavar="rate_limit", type=float, default=None,
+                        help="Fake server limit in requests per second, answering 429 beyond it.")
+    parser.add_argument("--throttle_rate",
+                        metavar="throttle_rate", type=float, default=0.0,
+                        help="Fraction of requests randomly answered with a 429.")
+    parser.add_argument("--bandwidth",
+                        metavar="bandwidth", type=float, default=None,
+                        help="Fake server upload bandwidth per connection, in bytes per second.")
+    parser.add_argument("--pdf_file",
+                        metavar="pdf_file", type=str,
+                        default=os.path.join(os.path.dirname(__file__), os.path.pardir,
+                                             'tests', 'resources', 'sample.pdf'),
+                        help="PDF uploaded for every synthetic paper.")
+    args = parser.parse_args()
+    main(args.sizes, args.engines, args.concurrency, args.upload_workers, args.num_cpus,
+         args.pdf_file, bandwidth=args.bandwidth,
+         latency=args.latency, error_rate=args.error_rate,
+         rate_limit=args.rate_limit, throttle_rate=args.throttle_rate, retry_after=0.5)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Time abstract cleanup over the proceedings corpus.
+
+Every paper of the corpus is turned back into text shaped like pdfminer
+output (lines of a two-column page, fi / fl ligatures): its stored abstract,
+or its title for the papers without one. The texts are cleaned by:
+  * legacy: the chain of `str.replace` calls `extract_abstract` used to run;
+  * cleaner: `zen.cleanup.clean`, the same chain completed (all ligatures,
+    invisible characters, space runs) behind an extensible `Cleaner`.
+
+Reports texts and MB per second, over the fastest pass of each method, and
+how many results equal the stored text after cleaning.
+
+Usage
+-----
+$ PYTHONPATH=. python ./benchmarks/bench_cleanup.py --repeat 10
+"""
+import argparse
+import glob
+import json
+import os
+import textwrap
+import time
+
+import zen.cleanup
+
+
+def legacy(text):
+    text = text.strip()
+    text = text.replace('-\n', '')
+    text = text.replace('\n', ' ')
+    text = text.replace('ﬁ', 'fi')
+    text = text.replace('ﬂ', 'fl')
+    text = text.replace('  ', ' ')
+    return text
+
+
+METHODS = dict(legacy=legacy, cleaner=zen.cleanup.clean)
+
+
+def load_texts(pattern):
+    abstracts, titles = [], []
+    for filename in sorted(glob.glob(pattern)):
+        with open(filename, 'r', encoding='utf-8') as fp:
+            for record in json.load(fp):
+                abstract = record.get('abstract') or record.get('Abstract')
+                if abstract:
+                    abstracts.append(zen.cleanup.clean(abstract))
+                else:
+                    titles.append(zen.cleanup.clean(record['title']))
+    return abstracts, titles
+
+
+def as_extracted(text, width=55):
+    # Hyphens ending a word ("low- and high-level") stay inside a line, as
+    # only words split across lines end one with a hyphen.
+    lines = textwrap.wrap(text.replace('- ', '-\0'), width,
+                          break_long_words=False, break_on_hyphens=False)
+    text = '\n'.join(lines).replace('\0', ' ')
+    return ' ' + text.replace('fi', 'ﬁ').replace('fl', 'ﬂ') + '\n\n'
+
+
+def main(pattern, methods, repeat):
+    abstracts, titles = load_texts(pattern)
+    expected = abstracts + titles
+    raw = [as_extracted(text) for text in expected]
+    megabytes = sum(len(text.encode('utf-8')) for text in raw) / 2 ** 20
+    print('{} papers ({} abstracts, {} titles), {:.1f} MB, {} passes'.format(
+        len(raw), len(abstracts), len(titles), megabytes, repeat))
+    print('{:>10s} {:>12s} {:>8s} {:>8s}'.format('method', 'texts/s', 'MB/s', 'equal'))
+
+    # Passes alternate between the methods, and the fastest of each counts,
+    # so that load on the machine skews them alike.
+    best = dict((method, float('inf')) for method in methods)
+    for _ in range(repeat):
+        for method in methods:
+            func = METHODS[method]
+            now = time.perf_counter()
+            cleaned = [func(text) for text in raw]
+            best[method] = min(best[method], time.perf_counter() - now)
+
+    for method in methods:
+        cleaned = [METHODS[method](text) for text in raw]
+        print('{:>10s} {:>12.0f} {:>8.1f} {:>8d}'.format(
+            method, len(raw) / best[method], megabytes / best[method],
+            sum(a == b for a, b in zip(cleaned, expected))))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--proceedings",
+                        metavar="proceedings", type=str,
+                        default=os.path.join(os.path.dirname(__file__), os.path.pardir,
+                                             'database', 'proceedings', '*.json'),
+                        help="Glob of the proceedings metadata files.")
+    parser.add_argument("--methods",
+                        metavar="methods", type=str, nargs='+', default=list(METHODS),
+                        choices=list(METHODS),
+                        help="Cleanup implementations to compare.")
+    parser.add_argument("--repeat",
+                        metavar="repeat", type=int, default=5,
+                        help="Number of passes over the corpus, per method.")
+    args = parser.parse_args()
+    main(args.proceedings, args.methods, args.repeat)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Time loading and querying the proceedings through `zen.corpus`.
+
+Reports the cold load time of the whole corpus (parsing, normalisation and
+indexing), then the time per lookup by every indexed field, against a linear
+scan of all records as the scripts used to do.
+
+Usage
+-----
+$ PYTHONPATH=. python ./benchmarks/bench_corpus.py --num_lookups 1000
+"""
+import argparse
+import random
+import time
+
+import zen.corpus
+
+
+def scan(papers, field, value):
+    key = zen.corpus.index_key(field, value)
+    return [paper for paper in papers
+            if zen.corpus.index_key(field, paper.get(field)) == key]
+
+
+def main(root, num_lookups, seed):
+    now = time.perf_counter()
+    corpus = zen.corpus.Corpus(root).load()
+    elapsed = time.perf_counter() - now
+    papers = list(corpus)
+    print('{} papers in {} years loaded and indexed in {:.1f} ms'.format(
+        len(papers), len(corpus.years), 1000 * elapsed))
+
+    rng = random.Random(seed)
+    print('{:>10s} {:>12s} {:>12s}'.format('field', 'index (us)', 'scan (us)'))
+    for field in zen.corpus.INDEXES:
+        values = [paper[field] for paper in papers if paper[field] is not None]
+        queries = [rng.choice(values) for _ in range(num_lookups)]
+
+        now = time.perf_counter()
+        found = [corpus.lookup(field, value) for value in queries]
+        indexed = time.perf_counter() - now
+
+        # The scan is slow enough that a tenth of the queries will do.
+        now = time.perf_counter()
+        expected = [scan(papers, field, value) for value in queries[::10]]
+        scanned = 10 * (time.perf_counter() - now)
+        assert found[::10] == expected
+
+        print('{:>10s} {:>12.2f} {:>12.1f}'.format(
+            field, 1e6 * indexed / num_lookups, 1e6 * scanned / num_lookups))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root",
+                        metavar="root", type=str, default=zen.corpus.DATABASE_DIR,
+                        help="Database directory.")
+    parser.add_argument("--num_lookups",
+                        metavar="num_lookups", type=int, default=1000,
+                        help="Number of lookups per field.")
+    parser.add_argument("--seed",
+                        metavar="seed", type=int, default=123,
+                        help="Random seed for the queries.")
+    args = parser.parse_args()
+    main(args.root, args.num_lookups, args.seed)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Time streaming a DBLP XML dump with `zen.dblp.iter_dump`.
+
+Writes a synthetic dump shaped like `dblp.xml` (journal articles and
+conference papers of many venues, character entities, one ISMIR paper in
+`--ismir_every`), optionally gzipped, then extracts the ISMIR records and
+reports throughput and peak memory.
+
+Usage
+-----
+$ PYTHONPATH=. python ./benchmarks/bench_dblp_dump.py --num_records 500000 --gzip
+"""
+import argparse
+import gzip
+import os
+import resource
+import tempfile
+import time
+
+import zen.dblp
+
+HEADER = ('<?xml version="1.0" encoding="ISO-8859-1"?>\n'
+          '<!DOCTYPE dblp SYSTEM "dblp.dtd">\n<dblp>\n')
+
+RECORD = ('<{tag} mdate="2020-01-01" key="{key}">\n'
+          '<author>J&uuml;rgen M&uuml;ller {n}</author>\n<author>Ana Garc&iacute;a</author>\n'
+          '<author>Jean-Fran&ccedil;ois Smith</author>\n'
+          '<title>On the <i>Analysis</i> of Signals &amp; Systems, Part {n}.</title>\n'
+          '<pages>{n}-{m}</pages>\n<year>2010</year>\n<booktitle>{venue}</booktitle>\n'
+          '<ee>https://doi.org/10.1000/{n}</ee>\n<crossref>conf/{venue}/2010</crossref>\n'
+          '<url>db/conf/{venue}/{venue}2010.html#X{n}</url>\n</{tag}>\n')
+
+
+def write_dump(path, num_records, ismir_every):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='latin-1') as fp:
+        fp.write(HEADER)
+        for n in range(num_records):
+            if n % ismir_every == 0:
+                tag, venue = 'inproceedings', 'ismir'
+            elif n % 2:
+                tag, venue = 'article', 'journals/tasl'
+            else:
+                tag, venue = 'inproceedings', 'icassp'
+            key = '{}/X{}'.format(venue if '/' in venue else 'conf/' + venue, n)
+            fp.write(RECORD.format(tag=tag, key=key, n=n, m=n + 8, venue=venue))
+        fp.write('</dblp>\n')
+
+
+def main(num_records, ismir_every, compress):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'dblp.xml' + ('.gz' if compress else ''))
+        write_dump(path, num_records, ismir_every)
+        size = os.path.getsize(path)
+        with (gzip.open if compress else open)(path, 'rb') as fp:
+            raw = sum(len(chunk) for chunk in iter(lambda: fp.read(1 << 20), b''))
+
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        now = time.perf_counter()
+        found = sum(1 for _ in zen.dblp.iter_dump(path))
+        elapsed = time.perf_counter() - now
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print('{} records, {:.1f} MB on disk, {:.1f} MB of XML, {} ISMIR records'.format(
+        num_records, size / 2**20, raw / 2**20, found))
+    print('{:.1f} s: {:.0f} records/s, {:.1f} MB/s of XML'.format(
+        elapsed, num_records / elapsed, raw / 2**20 / elapsed))
+    print('peak RSS {:.1f} MB (before parsing {:.1f} MB)'.format(peak / 1024, rss / 1024))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--num_records",
+                        metavar="num_records", type=int, default=500000,
+                        help="Number of records in the synthetic dump.")
+    parser.add_argument("--ismir_every",
+                        metavar="ismir_every", type=int, default=1000,
+                        help="One ISMIR paper in this many records.")
+    parser.add_argument("--gzip",
+                        action='store_true',
+                        help="Compress the synthetic dump.")
+    args = parser.parse_args()
+    main(args.num_records, args.ismir_every, args.gzip)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Time near-duplicate detection of `zen.dedup` against comparing all pairs.
+
+Signs the whole corpus with and without the signature cache, finds the
+duplicate clusters with LSH banding, then compares the title and text
+signatures of every pair, and reports the pairs each method found.
+
+Usage
+-----
+$ PYTHONPATH=. python ./benchmarks/bench_dedup.py
+"""
+import argparse
+import itertools
+import tempfile
+import time
+
+import zen.corpus
+import zen.dedup
+
+
+def all_pairs(signatures):
+    found = set()
+    for (a, sa), (b, sb) in itertools.combinations(sorted(signatures.items()), 2):
+        if zen.dedup.similarity(sa[0], sb[0]) >= zen.dedup.TITLE_THRESHOLD or \
+                zen.dedup.similarity(sa[1], sb[1]) >= zen.dedup.TEXT_THRESHOLD:
+            found.add((a, b))
+    return found
+
+
+def main(database_dir):
+    sources = zen.corpus.proceedings_files(database_dir)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for label in ('sign', 'sign (cached)'):
+            now = time.perf_counter()
+            signatures, _ = zen.dedup.load_signatures(sources, cache_dir)
+            print('{}: {:.1f} ms'.format(label, 1000 * (time.perf_counter() - now)))
+
+    now = time.perf_counter()
+    clusters = zen.dedup.find_duplicates(signatures)
+    lsh = set((a, b) for cluster in clusters for a, b, _, _ in cluster['pairs'])
+    print('lsh: {:.1f} ms, {} pairs'.format(1000 * (time.perf_counter() - now), len(lsh)))
+
+    now = time.perf_counter()
+    exact = all_pairs(signatures)
+    print('all pairs: {:.1f} ms, {} pairs, {} missed by lsh'.format(
+        1000 * (time.perf_counter() - now), len(exact), len(exact - lsh)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database_dir",
+                        metavar="database_dir", type=str, default=zen.corpus.DATABASE_DIR,
+                        help="Directory with proceedings/*.json.")
+    args = parser.parse_args()
+    main(args.database_dir)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Compare abstract extraction paths of extract_pdf_abstract.
+
+For each PDF, times:
+  * legacy: rewrite all pages with pdfrw into a temp file, then run pdfminer
+    over the whole rewritten file (the former `extract` pipeline);
+  * all_pages: pdfminer over the whole source PDF;
+  * first_page: pdfminer over the first page of the source only;
+  * early: layout of the abstract's column only, stopping at the
+    introduction heading (`extract`).
+
+Reports papers per second, p50 / p99 time per paper, how many abstracts each
+path found, how many equal the first_page ones (the oracle) and, with
+`--memory`, the median peak traced memory per paper. With a single
+`--methods`, disagreements with the oracle are listed. The full-page layout
+of the oracle may slot text of the next column in next to the abstract, which
+the early path leaves out; on sample.pdf, the heading '4. TYPESET TEXT'.
+
+Usage
+-----
+$ PYTHONPATH=.:scripts python ./benchmarks/bench_extract.py \
+    tests/resources/sample.pdf --repeat 20
+
+$ PYTHONPATH=.:scripts python ./benchmarks/bench_extract.py database/pdfs/2018
+"""
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+import extract_pdf_abstract
+
+
+def legacy(path_pdf):
+    path_tmp_pdf = extract_pdf_abstract.extract_first_page(path_pdf)
+    try:
+        return extract_pdf_abstract.extract_abstract(
+            extract_pdf_abstract.extract_text(path_tmp_pdf))
+    finally:
+        os.unlink(path_tmp_pdf)
+
+
+def all_pages(path_pdf):
+    return extract_pdf_abstract.extract_abstract(extract_pdf_abstract.extract_text(path_pdf))
+
+
+def first_page(path_pdf):
+    return extract_pdf_abstract.extract_abstract(extract_pdf_abstract.extract_text(
+        path_pdf, maxpages=extract_pdf_abstract.MAX_PAGES))
+
+
+def early(path_pdf):
+    return extract_pdf_abstract.extract_abstract_early(path_pdf)
+
+
+METHODS = dict(legacy=legacy, all_pages=all_pages, first_page=first_page, early=early)
+
+# Full layout of the first page; what the other paths are checked against.
+ORACLE = 'first_page'
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def find_pdfs(paths):
+    pdfs = []
+    for path in paths:
+        if os.path.isdir(path):
+            pdfs.extend(sorted(glob.glob(os.path.join(path, '**', '*.pdf'), recursive=True)))
+        else:
+            pdfs.append(path)
+    return pdfs
+
+
+def run(method, pdfs, memory=False):
+    timings, peaks, abstracts, failed = [], [], [], 0
+    for path_pdf in pdfs:
+        now = time.perf_counter()
+        try:
+            abstract = METHODS[method](path_pdf)
+        except Exception:
+            failed += 1
+            abstract = ''
+        timings.append(time.perf_counter() - now)
+        abstracts.append(abstract)
+
+    # Traced separately, as tracing slows pdfminer down several times over.
+    for path_pdf in (pdfs if memory else []):
+        tracemalloc.start()
+        try:
+            METHODS[method](path_pdf)
+        except Exception:
+            pass
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return dict(timings=timings, peaks=peaks, abstracts=abstracts, failed=failed)
+
+
+def main(paths, methods, repeat, memory):
+    pdfs = find_pdfs(paths) * repeat
+    print('{} PDFs'.format(len(pdfs)))
+    print('{:>10s} {:>9s} {:>8s} {:>8s} {:>13s} {:>9s} {:>6s} {:>6s}'.format(
+        'method', 'papers/s', 'p50 ms', 'p99 ms', 'peak mem (MB)', 'abstracts', 'oracle',
+        'errors'))
+
+    oracle = run(ORACLE, pdfs)['abstracts']
+    for method in methods:
+        res = run(method, pdfs, memory)
+        peak = percentile(res['peaks'], 0.5) / 2 ** 20 if res['peaks'] else float('nan')
+        agree = sum(a == b for a, b in zip(res['abstracts'], oracle))
+        print('{:>10s} {:>9.1f} {:>8.1f} {:>8.1f} {:>13.1f} {:>9d} {:>6d} {:>6d}'.format(
+            method, len(pdfs) / sum(res['timings']),
+            1000 * percentile(res['timings'], 0.5), 1000 * percentile(res['timings'], 0.99),
+            peak, sum(map(bool, res['abstracts'])), agree, res['failed']))
+
+        if len(methods) > 1:
+            continue
+        for path_pdf, abstract, expected in zip(pdfs, res['abstracts'], oracle):
+            if abstract != expected:
+                print('{}:\n  {}: {!r}\n  oracle: {!r}'.format(
+                    path_pdf, method, abstract, expected))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths",
+                        metavar="paths", type=str, nargs='*',
+                        default=[os.path.join(os.path.dirname(__file__), os.path.pardir,
+                                              'tests', 'resources', 'sample.pdf')],
+                        help="PDF files, or directories searched for PDFs.")
+    parser.add_argument("--methods",
+                        metavar="methods", type=str, nargs='+', default=list(METHODS),
+                        choices=list(METHODS),
+                        help="Extraction paths to compare.")
+    parser.add_argument("--repeat",
+                        metavar="repeat", type=int, default=1,
+                        help="Number of passes over the PDFs.")
+    parser.add_argument("--memory",
+                        action='store_true',
+                        help="Also trace the median peak memory per paper, in a separate pass.")
+    args = parser.parse_args()
+    main(args.paths, args.methods, args.repeat, args.memory)
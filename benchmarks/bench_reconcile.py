@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Time reconciling the whole corpus with `zen.reconcile`.
+
+Every year of the corpus is matched against export records made from its
+own papers, with titles and author lists perturbed as in real exports, once
+with blocking and once scoring all pairs of a year, and the accuracy of both
+is reported.
+
+Usage
+-----
+$ PYTHONPATH=. python ./benchmarks/bench_reconcile.py
+"""
+import argparse
+import random
+import time
+
+import zen.corpus
+import zen.reconcile
+
+
+def perturb(rng, paper):
+    title = paper['title'] or ''
+    if rng.random() < 0.3:
+        title = title.lower().rstrip('.') + '.'
+    authors = list(paper['author'] or [])
+    if len(authors) > 1 and rng.random() < 0.1:
+        authors.pop()
+    return zen.reconcile.export_record(paper['year'], title, authors, paper['pages'],
+                                       paper['doi'])
+
+
+def all_pairs(papers, records):
+    # The scores of `zen.reconcile.match`, for every pair of a year.
+    features = [(zen.reconcile._title_keys(record['title']),
+                 zen.reconcile._surnames(record['author'])) for record in records]
+    scores = []
+    for paper in papers:
+        titles = zen.reconcile._title_keys(paper['title'])
+        surnames = zen.reconcile._surnames(paper['author'] or [])
+        scores.append([zen.reconcile.TITLE_WEIGHT * zen.reconcile._jaccard(titles, other[0]) +
+                       (1 - zen.reconcile.TITLE_WEIGHT) * zen.reconcile._jaccard(surnames,
+                                                                                 other[1])
+                       for other in features])
+    return scores
+
+
+def main(database_dir, seed):
+    rng = random.Random(seed)
+    corpus = zen.corpus.Corpus(database_dir)
+    papers = dict((year, corpus.papers(year)) for year in corpus.years)
+    exports = dict((year, [perturb(rng, paper) for paper in year_papers])
+                   for year, year_papers in papers.items())
+    for records in exports.values():
+        rng.shuffle(records)
+
+    now = time.perf_counter()
+    results = zen.reconcile.reconcile(papers, exports)
+    elapsed = time.perf_counter() - now
+    correct = sum(papers[year][position]['title'] == exports[year][index]['title'] or
+                  zen.corpus.normalize_title(papers[year][position]['title']) ==
+                  zen.corpus.normalize_title(exports[year][index]['title'])
+                  for year, result in results.items()
+                  for position, index, _ in result['matches'])
+    total = sum(len(year_papers) for year_papers in papers.values())
+    print('blocked: {:.1f} ms, {} of {} papers matched correctly'.format(
+        1000 * elapsed, correct, total))
+
+    now = time.perf_counter()
+    num_pairs = sum(len(papers[year]) * len(exports[year]) for year in papers)
+    for year in papers:
+        all_pairs(papers[year], exports[year])
+    print('all pairs: {:.1f} ms, {} pairs scored'.format(
+        1000 * (time.perf_counter() - now), num_pairs))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database_dir",
+                        metavar="database_dir", type=str, default=zen.corpus.DATABASE_DIR,
+                        help="Directory with proceedings/*.json.")
+    parser.add_argument("--seed",
+                        metavar="seed", type=int, default=123,
+                        help="Random seed for the perturbations.")
+    args = parser.parse_args()
+    main(args.database_dir, args.seed)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Time building and querying the BM25 index of `zen.search`.
+
+Builds the index of the whole corpus, re-runs the (no-op) incremental build,
+then runs queries made of title words of random papers and reports p50 / p99
+latency, against grepping the JSON files for the same words as before.
+
+Usage
+-----
+$ PYTHONPATH=. python ./benchmarks/bench_search.py --num_queries 500
+"""
+import argparse
+import glob
+import os
+import random
+import tempfile
+import time
+
+import zen.corpus
+import zen.search
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def grep(database_dir, words):
+    # Case-insensitive substring search of the raw files, any word.
+    hits = []
+    for filename in sorted(glob.glob(os.path.join(database_dir, 'proceedings', '*.json'))):
+        with open(filename, encoding='utf-8') as fp:
+            for line in fp:
+                lower = line.lower()
+                if any(word in lower for word in words):
+                    hits.append(line)
+    return hits
+
+
+def main(database_dir, num_queries, seed):
+    rng = random.Random(seed)
+    titles = [paper['title'] for paper in zen.corpus.Corpus(database_dir)]
+    queries = [' '.join(rng.sample(terms, min(len(terms), rng.randint(1, 3))))
+               for terms in (zen.search.tokenize(rng.choice(titles))
+                             for _ in range(num_queries)) if terms]
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        for label in ('full build', 'no-op build'):
+            now = time.perf_counter()
+            zen.search.build(database_dir, index_dir)
+            print('{}: {:.1f} ms'.format(label, 1000 * (time.perf_counter() - now)))
+
+        now = time.perf_counter()
+        index = zen.search.Index(index_dir)
+        print('open: {:.1f} ms, {} papers, {} queries'.format(
+            1000 * (time.perf_counter() - now), index.num_docs, len(queries)))
+
+        timings = {'bm25': [], 'grep': []}
+        for query in queries:
+            now = time.perf_counter()
+            index.search(query)
+            timings['bm25'].append(time.perf_counter() - now)
+        for query in queries[:max(1, len(queries) // 10)]:
+            now = time.perf_counter()
+            grep(database_dir, query.split())
+            timings['grep'].append(time.perf_counter() - now)
+        index.close()
+
+    print('{:>6s} {:>8s} {:>8s}'.format('method', 'p50 ms', 'p99 ms'))
+    for method, values in timings.items():
+        print('{:>6s} {:>8.2f} {:>8.2f}'.format(
+            method, 1000 * percentile(values, 0.5), 1000 * percentile(values, 0.99)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database_dir",
+                        metavar="database_dir", type=str, default=zen.corpus.DATABASE_DIR,
+                        help="Directory with proceedings/*.json.")
+    parser.add_argument("--num_queries",
+                        metavar="num_queries", type=int, default=500,
+                        help="Number of queries.")
+    parser.add_argument("--seed",
+                        metavar="seed", type=int, default=123,
+                        help="Random seed for the queries.")
+    args = parser.parse_args()
+    main(args.database_dir, args.num_queries, args.seed)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Compare per-call requests against the pooled ZenodoClient.
+
+Serves a minimal deposition API on localhost and uploads a number of papers
+through it, once the way `zen.api` used to (a connectivity ping plus a fresh
+connection per call) and once through a shared `zen.api.ZenodoClient`.
+
+Usage
+-----
+$ python ./benchmarks/bench_zen_client.py --num_papers 50 --latency 0.005
+"""
+import argparse
+import hashlib
+import http.server
+import io
+import json
+import socket
+import threading
+import time
+
+import requests
+
+import zen.api
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.stats['connections'] += 1
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        data = self.rfile.read(length)
+        self.server.stats['requests'] += 1
+        time.sleep(self.server.latency)
+
+        host = 'http://{}:{}'.format(*self.server.server_address)
+        body = json.dumps(dict(id=1, doi='10.5072/zenodo.1',
+                               doi_url='https://doi.org/10.5072/zenodo.1',
+                               links=dict(bucket=host + '/api/files/1'),
+                               checksum='md5:' + hashlib.md5(data).hexdigest()))
+        body = body.encode('utf-8')
+        self.send_response(200 if self.command != 'POST' else 201)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_HEAD = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is expected here.
+        pass
+
+
+def serve(latency):
+    server = _Server(('127.0.0.1', 0), _Handler)
+    server.latency = latency
+    server.stats = dict(connections=0, requests=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def upload_legacy(host, payload):
+    """One paper, as the module-level functions used to do it."""
+    url = host + '/api/deposit/depositions'
+    params = dict(access_token='token')
+    headers = {"Content-Type": "application/json"}
+    calls = [
+        lambda: requests.post(url, params=params, data="{}", headers=headers),
+        lambda: requests.post(url + '/1/files', params=params,
+                              files={'file': ('a.pdf', io.BytesIO(payload))}),
+        lambda: requests.put(url + '/1', params=params, data='{}', headers=headers),
+        lambda: requests.post(url + '/1/actions/publish', params=params)]
+    for call in calls:
+        requests.get(host)
+        call()
+
+
+def upload_client(client, payload):
+    """One paper, through a shared pooled client."""
+    zid = client.create_id()
+    client.upload_file(zid, 'a.pdf', fp=io.BytesIO(payload))
+    client.update_metadata(zid, {})
+    client.publish(zid)
+
+
+def run(name, fx, server, num_papers):
+    server.stats.update(connections=0, requests=0)
+    now = time.perf_counter()
+    for _ in range(num_papers):
+        fx()
+    elapsed = time.perf_counter() - now
+    print('{:>8s}: {:6.2f} requests/paper, {:6.2f} connections/paper, '
+          '{:7.2f} ms/paper'.format(name,
+                                    server.stats['requests'] / num_papers,
+                                    server.stats['connections'] / num_papers,
+                                    1000 * elapsed / num_papers))
+
+
+def main(num_papers, latency, size):
+    server = serve(latency)
+    host = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    payload = b'%PDF' + b'\0' * size
+
+    client = zen.api.ZenodoClient(stage=zen.api.DEV, token='token', host=host)
+    run('legacy', lambda: upload_legacy(host, payload), server, num_papers)
+    run('client', lambda: upload_client(client, payload), server, num_papers)
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_papers",
+                        metavar="num_papers", type=int, default=50,
+                        help="Number of papers to upload per variant.")
+    parser.add_argument("--latency",
+                        metavar="latency", type=float, default=0.005,
+                        help="Simulated server latency per request, in seconds.")
+    parser.add_argument("--size",
+                        metavar="size", type=int, default=200000,
+                        help="Size in bytes of the uploaded file.")
+    args = parser.parse_args()
+    main(args.num_papers, args.latency, args.size)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Compile the proceedings metadata into an indexed SQLite database.
+
+Usage
+-----
+
+$ python ./scripts/build_database.py database ismir.sqlite
+
+Only the JSON files that changed since the last build are re-imported; see
+`zen.db` for the schema and the read API.
+"""
+import argparse
+import logging
+
+import zen.db
+
+logger = logging.getLogger("build_database")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("database_dir",
+                        metavar="database_dir", type=str,
+                        help="Directory with conferences.json and proceedings/*.json.")
+    parser.add_argument("output_file",
+                        metavar="output_file", type=str,
+                        help="SQLite file to create or update.")
+    parser.add_argument("--force",
+                        action='store_true',
+                        help="Re-import every source, changed or not.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    updated = zen.db.build(args.database_dir, args.output_file, args.force)
+    logger.info('%d sources updated', len(updated))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Normalise the abstracts of proceedings metadata files in place.
+
+Usage
+-----
+
+$ python ./scripts/clean_abstracts.py database/proceedings/*.json --dry_run
+
+Runs every abstract through `zen.cleanup.clean` (ligatures, invisible
+characters, line-end hyphenation, line breaks, space runs). With
+`--dry_run`, the changes are printed as a unified diff instead of written;
+otherwise only files with changed abstracts are rewritten, in their own
+format, so that only the lines of the changed abstracts differ.
+"""
+import argparse
+import difflib
+import json
+import logging
+
+import zen.cleanup
+import zen.corpus
+
+logger = logging.getLogger("clean_abstracts")
+
+# The 2020 metadata spells the field with a capital.
+FIELDS = ('abstract', 'Abstract')
+
+
+def clean_records(records, clean=zen.cleanup.clean):
+    '''Clean the abstracts of proceedings records, in place.
+
+    Parameters
+    ----------
+    records : list of dict
+        ISMIR paper records.
+
+    clean : callable, default=zen.cleanup.clean
+        Text normaliser.
+
+    Returns
+    -------
+    changes : list of (int, str, str, str)
+        Index, field, old and new value of every changed abstract.
+    '''
+    changes = []
+    for idx, record in enumerate(records):
+        for field in FIELDS:
+            old = record.get(field)
+            if not old:
+                continue
+            new = clean(old)
+            if new != old:
+                record[field] = new
+                changes.append((idx, field, old, new))
+    return changes
+
+
+def diff(filename, changes):
+    '''Unified diff of changed abstracts, one JSON-escaped line per abstract.'''
+    old = ['[{}].{}: {}\n'.format(idx, field, json.dumps(value))
+           for idx, field, value, _ in changes]
+    new = ['[{}].{}: {}\n'.format(idx, field, json.dumps(value))
+           for idx, field, _, value in changes]
+    return ''.join(difflib.unified_diff(old, new, filename, filename, n=0))
+
+
+def main(filenames, dry_run=False):
+    '''Clean the abstracts of several metadata files.
+
+    Parameters
+    ----------
+    filenames : list of str
+        Proceedings JSON files.
+
+    dry_run : bool, default=False
+        Print a diff of the changes rather than writing them.
+
+    Returns
+    -------
+    num_changed : int
+        Number of abstracts changed (or that would be).
+    '''
+    num_changed = 0
+    for filename in filenames:
+        with open(filename, 'r', encoding='utf-8') as fp:
+            text = fp.read()
+
+        records = json.loads(text)
+        changes = clean_records(records)
+        num_changed += len(changes)
+        if not changes:
+            continue
+
+        logger.info('%s: %d abstracts changed', filename, len(changes))
+        if dry_run:
+            print(diff(filename, changes), end='')
+            continue
+
+        with open(filename, 'w', encoding='utf-8') as fp:
+            fp.write(zen.corpus.dumps_like(records, text))
+
+    return num_changed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("filenames",
+                        metavar="filenames", type=str, nargs='+',
+                        help="Proceedings metadata files.")
+    parser.add_argument("--dry_run",
+                        action='store_true',
+                        help="Print a diff of the changes instead of writing them.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    num_changed = main(args.filenames, args.dry_run)
+    logger.info('%d abstracts %s', num_changed,
+                'would change' if args.dry_run else 'changed')
@@ -9,19 +9,288 @@ $ python ./scripts/download_proceedings.py \
     proceedings.json \
     ./path/to/pdfs
 
+Downloads are streamed to `<name>.pdf.part` and renamed into place once
+complete, so an interrupted run never leaves a truncated PDF behind. Re-running
+the same command resumes partial files with HTTP range requests and skips
+finished ones; `--refresh` instead re-validates finished files with
+conditional requests, fetching only those that changed upstream. Finished
+files carry the server's Last-Modified date as their modification time;
+the validators of a partial file are kept next to it, in a `.http.json`
+file removed once the download completes.
+
+All downloads share one connection pool, with at most `--num_workers` (or,
+as with joblib, `--num_cpus`) in flight overall and `--per_host` against any
+single host.
+
+With `--cache_dir`, PDFs are also kept in the local PDF store shared with
+`extract_pdf_abstract.py` and `upload_to_zenodo.py`; ones already there are
+copied instead of downloaded.
 """
 
 import argparse
-from joblib import Parallel, delayed
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextlib
+import email.utils
 import json
+import logging
 import os
-import random
+import re
 import requests
+from requests.adapters import HTTPAdapter
+import shutil
 import sys
+import threading
+import time
 import tqdm
+import urllib.parse
+from urllib3.util.retry import Retry
+
+import zen.pdfcache
+import zen.workers
+
+logger = logging.getLogger("download_proceedings")
+
+CHUNK_SIZE = 1 << 16
+
+
+class HostLimiter(object):
+    '''Cap the number of concurrent downloads from each host.
+
+    Parameters
+    ----------
+    per_host : int
+        Downloads allowed in flight against a single host.
+
+    Examples
+    --------
+    >>> limiter = HostLimiter(4)
+    >>> with limiter('https://archives.ismir.net/ismir2018/paper/000001.pdf'):
+    ...     pass
+    '''
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._semaphores = dict()
+        self._lock = threading.Lock()
+
+    def __call__(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+
+def make_session(pool_maxsize=10, max_retries=3, backoff_factor=0.5):
+    '''Build a pooled session, retrying connection errors and 5xx responses.
+
+    Parameters
+    ----------
+    pool_maxsize : int, default=10
+        Connections kept alive per host; match it to the number of workers.
+
+    max_retries : int, default=3
+        Retries per request.
+
+    backoff_factor : float, default=0.5
+        Base of the exponential backoff between retries, in seconds.
+
+    Returns
+    -------
+    session : requests.Session
+    '''
+    retry = Retry(total=max_retries, backoff_factor=backoff_factor,
+                  status_forcelist=(500, 502, 503, 504), raise_on_status=False)
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _validators_path(path):
+    return path + '.http.json'
+
+
+def _read_validators(path):
+    try:
+        with open(_validators_path(path), 'r') as fp:
+            return json.load(fp)
+    except (IOError, ValueError):
+        return dict()
+
+
+def _write_validators(path, headers):
+    validators = dict(etag=headers.get('ETag'),
+                      last_modified=headers.get('Last-Modified'))
+    with open(_validators_path(path), 'w') as fp:
+        json.dump(validators, fp)
+
+
+def _remove(path):
+    for fn in (path, _validators_path(path)):
+        if os.path.exists(fn):
+            os.remove(fn)
+
+
+def _parse_http_date(value):
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _content_range_start(value):
+    match = re.match(r'bytes (\d+)-', value or '')
+    return int(match.group(1)) if match else None
+
 
+def fetch(url, fout, session, timeout=60):
+    '''Download a URL to a file, resuming or re-validating a previous attempt.
 
-def download_pdf(fid, url, year, dst):
+    The body is streamed to `fout + '.part'`, which is renamed to `fout` once
+    its length matches the response. A leftover partial file is resumed with
+    a `Range` request guarded by `If-Range`, so it restarts from scratch if
+    the remote file changed in between. If only `fout` exists, the request
+    is made conditional on its modification time, which is set to the
+    Last-Modified date of the response.
+
+    Parameters
+    ----------
+    url : str
+        Location of the file.
+
+    fout : str
+        Output path.
+
+    session : requests.Session
+        Session to issue the request on.
+
+    timeout : float, default=60
+        Seconds to wait for the server between bytes.
+
+    Returns
+    -------
+    updated : bool
+        True if `fout` was (re)written, False if the server reported it
+        unchanged.
+
+    Raises
+    ------
+    requests.RequestException
+        On HTTP errors and broken connections; a partial download is kept
+        for the next attempt.
+    IOError
+        If the transfer ended short of the advertised length.
+    '''
+    part = fout + '.part'
+    headers = {'Accept-Encoding': 'identity'}
+
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    validators = _read_validators(part) if offset else dict()
+    if offset and (validators.get('etag') or validators.get('last_modified')):
+        headers['Range'] = 'bytes={}-'.format(offset)
+        headers['If-Range'] = validators.get('etag') or validators['last_modified']
+    elif offset:
+        # Without a validator, there is no telling if the bytes we have still
+        # belong to the same file.
+        offset = 0
+    elif os.path.exists(fout):
+        headers['If-Modified-Since'] = email.utils.formatdate(os.path.getmtime(fout),
+                                                              usegmt=True)
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as res:
+        if res.status_code == 304:
+            return False
+        elif res.status_code == 416:
+            # The partial file is no prefix of the remote one; start over.
+            _remove(part)
+            return fetch(url, fout, session, timeout=timeout)
+        res.raise_for_status()
+
+        if res.status_code == 206:
+            if _content_range_start(res.headers.get('Content-Range')) != offset:
+                _remove(part)
+                raise IOError('{}: unexpected Content-Range {}'.format(
+                    url, res.headers.get('Content-Range')))
+            mode = 'ab'
+        else:
+            offset, mode = 0, 'wb'
+            _write_validators(part, res.headers)
+
+        length = res.headers.get('Content-Length')
+        expected = offset + int(length) if length is not None else None
+
+        with open(part, mode) as fp:
+            for chunk in res.iter_content(CHUNK_SIZE):
+                fp.write(chunk)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    size = os.path.getsize(part)
+    if expected is not None and size != expected:
+        raise IOError('{}: got {} of {} bytes'.format(url, size, expected))
+
+    # The validators only matter to resume a partial file.
+    modified = _parse_http_date(_read_validators(part).get('last_modified'))
+    os.replace(part, fout)
+    for fn in (_validators_path(part), _validators_path(fout)):
+        if os.path.exists(fn):
+            os.remove(fn)
+    if modified is not None:
+        os.utime(fout, (time.time(), modified))
+    return True
+
+
+def _link(src, dst):
+    # Hard links share the bytes with the store, where the file system allows.
+    tmp = dst + '.part'
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def download_pdf(fid, url, year, dst, session=None, limiter=None, refresh=False,
+                 cache=None, key=None):
+    '''Download one paper's PDF to `dst/year/fid.pdf`.
+
+    Parameters
+    ----------
+    fid : str
+        File name, without extension.
+
+    url : str or list of str
+        Location of the PDF; from a list, the first one ending in 'pdf'.
+
+    year : str
+        Subdirectory of `dst` to write to.
+
+    dst : str
+        Output directory.
+
+    session : requests.Session, default=None
+        Pooled session to download with; a new one is made if not given.
+
+    limiter : HostLimiter, default=None
+        Per-host concurrency limit to respect.
+
+    refresh : bool, default=False
+        If True, re-validate a previously downloaded PDF with the server.
+
+    cache : zen.pdfcache.PdfCache, default=None
+        Local PDF store; a PDF it holds for `url` is copied from there, and
+        downloaded ones are added to it.
+
+    key : str, default=None
+        DBLP key of the paper, to index the PDF under in `cache`.
+
+    Returns
+    -------
+    success : bool
+        True if the PDF exists locally after the call.
+    '''
 
     # create output dir
     os.makedirs(os.path.join(dst, year), exist_ok=True)
@@ -37,15 +306,33 @@ def download_pdf(fid, url, year, dst):
     if url is None:
         print('missing url for {}'.format(fid))
 
-    elif not os.path.exists(fout):
-        res = requests.get(url)
-        with open(fout, 'wb') as fp:
-            fp.write(res.content)
+    else:
+        cached = cache.lookup('url:{}'.format(url)) if cache is not None else None
+
+        if cached is not None and not refresh:
+            if not os.path.exists(fout):
+                _link(cached, fout)
+                logger.info('%s: copied from the PDF store', fid)
+        elif refresh or not os.path.exists(fout):
+            session = session or make_session()
+            try:
+                with limiter(url) if limiter else contextlib.nullcontext():
+                    if fetch(url, fout, session):
+                        logger.info('%s: downloaded %s', fid, url)
+                        # New content, to be stored below.
+                        cached = None
+                    else:
+                        logger.info('%s: unchanged', fid)
+            except (requests.RequestException, IOError) as derp:
+                logger.warning('%s: download failed: %s', fid, derp)
+
+        if cache is not None and cached is None and os.path.exists(fout):
+            cache.add(fout, *zen.pdfcache.aliases(dict(dblp_key=key, ee=url)))
 
     return os.path.exists(fout)
 
 
-def main(records, output_dir, num_cpus, verbose):
+def main(records, output_dir, num_workers=8, per_host=4, refresh=False, cache=None):
 
     pdfs = []
 
@@ -57,22 +344,28 @@ def main(records, output_dir, num_cpus, verbose):
 
         try:
             cur_url = cur_record['ee']
-            pdfs.append((cur_fn, cur_url, cur_year))
+            pdfs.append((cur_fn, cur_url, cur_year, cur_key))
         except KeyError:
             print('{}: No URL available.'.format(cur_fn))
             cur_url = ''
 
-    items = pdfs
-    random.shuffle(items)
+    session = make_session(pool_maxsize=num_workers)
+    limiter = HostLimiter(per_host)
 
-    dfx = delayed(download_pdf)
-    pool = Parallel(n_jobs=num_cpus, verbose=verbose)
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        futures = [pool.submit(download_pdf, fid, url, year, dst=output_dir,
+                               session=session, limiter=limiter, refresh=refresh,
+                               cache=cache, key=key)
+                   for fid, url, year, key in pdfs]
+        results = [future.result()
+                   for future in tqdm.tqdm(as_completed(futures), total=len(futures))]
 
-    return all(pool(dfx(*kv, dst=output_dir) for kv in tqdm.tqdm(items)))
+    return all(results)
 
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description=__doc__)
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
 
     # Inputs
     parser.add_argument("metadata_file",
@@ -81,16 +374,41 @@ if __name__ == '__main__':
     parser.add_argument("output_dir",
                         metavar="output_dir", type=str,
                         help="Path to write the downloaded PDFs.")
+    parser.add_argument("--num_workers",
+                        metavar="num_workers", type=int, default=8,
+                        help="Number of downloads in flight at once.")
     parser.add_argument("--num_cpus",
-                        metavar="num_cpus", type=int, default=-2,
-                        help="Number of CPUs to use in parallel.")
+                        metavar="num_cpus", type=int, default=None,
+                        help="Number of downloads in flight at once, as joblib's n_jobs "
+                             "(-1: one per CPU); overrides --num_workers.")
     parser.add_argument("--verbose",
                         metavar="verbose", type=int, default=0,
-                        help="Verbosity level for joblib.")
+                        help="Verbosity level; 1 or more logs every download.")
+    parser.add_argument("--per_host",
+                        metavar="per_host", type=int, default=4,
+                        help="Number of downloads in flight against one host.")
+    parser.add_argument("--refresh",
+                        action='store_true',
+                        help="Re-validate already downloaded PDFs with the server.")
+    parser.add_argument("--cache_dir",
+                        metavar="cache_dir", type=str, default=None,
+                        help="Local PDF store to copy PDFs from, and add downloads to.")
+    parser.add_argument("--cache_max_mb",
+                        metavar="cache_max_mb", type=int, default=None,
+                        help="Size cap of the PDF store, in MB.")
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose > 0 else logging.WARNING)
+    if args.num_cpus is not None:
+        args.num_workers = zen.workers.num_workers(args.num_cpus)
 
     with open(args.metadata_file, 'r') as fp:
         records = json.load(fp)
 
-    success = main(records, args.output_dir, args.num_cpus, args.verbose)
+    cache = None
+    if args.cache_dir is not None:
+        cache = zen.pdfcache.PdfCache(args.cache_dir, max_bytes=zen.pdfcache.megabytes(
+            args.cache_max_mb))
+
+    success = main(records, args.output_dir, args.num_workers, args.per_host,
+                   args.refresh, cache)
     sys.exit(0 if success else 1)
@@ -7,22 +7,77 @@ Example usage
 -------------
 $ ./scripts/export_to_markdown.py \
     records.json \
+    conferences.json \
     output.md
 
-Or, this can be used with `parallel` to bulk export a number of pages:
+Or, to export the pages of every year at once:
 
-$ seq -w 00 18 | \
-    parallel -j4 -v "./scripts/metadata_to_markdown.py \
-        database/proceedings/2018.json \
-        assets/md/ismir20{}.md --page_sort"
+$ ./scripts/export_to_markdown.py --all_years \
+    --database_dir database \
+    --output_dir assets/md \
+    --page_sort
+
+This writes `assets/md/ismir<year>.md` for every year. The corpus is read
+and the template compiled once, compiled templates are kept in
+`--cache_dir` across runs, and a manifest of the hashes of each year's
+inputs (proceedings, conference entry and template) in the output directory
+limits a rebuild to the years whose inputs changed.
 """
 import argparse
+import hashlib
 import json
+import logging
+import os
 from pathlib import Path
 import jinja2
+from joblib import Parallel, delayed
+
+import zen.corpus
+
+logger = logging.getLogger("export_to_markdown")
+
+TEMPLATE_DIR = Path(__file__).absolute().parent / 'templates'
+TEMPLATE = 'ismir_proceedings.md'
+
+# Default location of the compiled templates.
+CACHE_DIR = os.path.join('~', '.cache', 'conference-archive', 'jinja')
+
+# Name of the manifest of input hashes in the output directory.
+MANIFEST = '.manifest.json'
+
+# Environments by (template directory, cache directory), built once per process.
+_ENVIRONMENTS = dict()
+
+
+def template_environment(template_dir=TEMPLATE_DIR, cache_dir=CACHE_DIR):
+    '''A jinja environment, shared by all renders of this process.
 
+    Parameters
+    ----------
+    template_dir : str or Path, default=TEMPLATE_DIR
+        Directory of the templates.
 
-def render(records, conferences, year=None, page_sort=False):
+    cache_dir : str, default=CACHE_DIR
+        Directory of compiled templates, reused across processes and runs;
+        None keeps them in memory only.
+
+    Returns
+    -------
+    env : jinja2.Environment
+    '''
+    key = (str(template_dir), cache_dir)
+    if key not in _ENVIRONMENTS:
+        bytecode_cache = None
+        if cache_dir is not None:
+            cache_dir = os.path.expanduser(cache_dir)
+            os.makedirs(cache_dir, exist_ok=True)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(cache_dir)
+        _ENVIRONMENTS[key] = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(str(template_dir)), bytecode_cache=bytecode_cache)
+    return _ENVIRONMENTS[key]
+
+
+def render(records, conferences, year=None, page_sort=False, cache_dir=CACHE_DIR):
     if year is not None:
         records = filter(lambda x: x['year'] == str(year), records)
     else:
@@ -31,10 +86,7 @@ def render(records, conferences, year=None, page_sort=False):
     if page_sort:
         records = sorted(records, key=lambda x: int(x['pages'].split('-')[0]))
 
-    PATH = Path(__file__).absolute().parent
-    template_env = jinja2.Environment(loader=jinja2.FileSystemLoader(PATH / 'templates'))
-
-    template = template_env.get_template('ismir_proceedings.md')
+    template = template_environment(cache_dir=cache_dir).get_template(TEMPLATE)
     context = {
         'meta': conferences[str(year)],
         'year': year,
@@ -43,24 +95,153 @@ def render(records, conferences, year=None, page_sort=False):
     return template.render(context)
 
 
+def _render_year(papers, meta, year, page_sort, cache_dir):
+    try:
+        return render(papers, {str(year): meta}, year, page_sort, cache_dir), None
+    except jinja2.TemplateError as derp:
+        return None, '{}: {}'.format(type(derp).__name__, derp)
+
+
+def input_hash(proceedings_file, meta, template_source, page_sort):
+    '''Hex SHA-256 over everything a year's page is rendered from.'''
+    sha = hashlib.sha256()
+    with open(proceedings_file, 'rb') as fp:
+        sha.update(hashlib.sha256(fp.read()).digest())
+    sha.update(json.dumps([meta, page_sort], sort_keys=True).encode('utf-8'))
+    sha.update(template_source.encode('utf-8'))
+    return sha.hexdigest()
+
+
+def render_all(database_dir, output_dir, page_sort=False, num_cpus=1, force=False,
+               cache_dir=CACHE_DIR):
+    '''Render the page of every year whose inputs changed.
+
+    Parameters
+    ----------
+    database_dir : str
+        Directory holding `conferences.json` and `proceedings/<year>.json`.
+
+    output_dir : str
+        Directory of the `ismir<year>.md` pages and the manifest.
+
+    page_sort : bool, default=False
+        Sort records following page numbers, in years that have them.
+
+    num_cpus : int, default=1
+        Number of parallel render processes.
+
+    force : bool, default=False
+        Render every year, changed or not.
+
+    cache_dir : str, default=CACHE_DIR
+        Directory of compiled templates.
+
+    Returns
+    -------
+    rendered : list of str
+        Years whose page was written.
+
+    failed : dict
+        Years whose page could not be rendered, and why; they are tried
+        again on the next build.
+    '''
+    corpus = zen.corpus.Corpus(database_dir)
+    files = zen.corpus.proceedings_files(database_dir)
+    env = template_environment(cache_dir=cache_dir)
+    template_source = env.loader.get_source(env, TEMPLATE)[0]
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_file = os.path.join(output_dir, MANIFEST)
+    manifest = dict()
+    if not force and os.path.exists(manifest_file):
+        with open(manifest_file) as fp:
+            manifest = json.load(fp)
+
+    hashes, stale = dict(), []
+    for year in corpus.years:
+        if year not in corpus.conferences:
+            logger.warning('no conference entry for %s, skipping', year)
+            continue
+        hashes[year] = input_hash(files[year], corpus.conferences[year], template_source,
+                                  page_sort)
+        output_file = os.path.join(output_dir, 'ismir{}.md'.format(year))
+        if manifest.get(year) != hashes[year] or not os.path.exists(output_file):
+            stale.append(year)
+
+    # Years that have no page numbers keep the order of the file.
+    jobs = []
+    for year in stale:
+        papers = corpus.papers(year)
+        jobs.append(delayed(_render_year)(
+            papers, corpus.conferences[year], year,
+            page_sort and all(paper['pages'] for paper in papers), cache_dir))
+    results = Parallel(n_jobs=num_cpus)(jobs) if jobs else []
+
+    rendered, failed = [], dict()
+    for year, (text, error) in zip(stale, results):
+        if error is not None:
+            failed[year] = error
+            manifest.pop(year, None)
+            logger.error('failed to render %s: %s', year, error)
+            continue
+        with open(os.path.join(output_dir, 'ismir{}.md'.format(year)), 'w') as fp:
+            fp.write(text)
+        manifest[year] = hashes[year]
+        rendered.append(year)
+
+    manifest = dict((year, value) for year, value in manifest.items() if year in hashes)
+    with open(manifest_file + '.tmp', 'w') as fp:
+        json.dump(manifest, fp, indent=2, sort_keys=True)
+    os.replace(manifest_file + '.tmp', manifest_file)
+    return rendered, failed
+
+
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description=__doc__)
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
 
     # Inputs
-    parser.add_argument("proceedings", type=str,
+    parser.add_argument("proceedings", type=str, nargs='?',
                         help="Path to proceedings records.")
-    parser.add_argument("conferences", type=str,
+    parser.add_argument("conferences", type=str, nargs='?',
                         help="Path to conferences.json.")
-    parser.add_argument("output_file", type=str,
+    parser.add_argument("output_file", type=str, nargs='?',
                         help="Path to output markdown file.")
     parser.add_argument("--page_sort", dest="page_sort", action='store_true',
                         help="Sort records following page numbers.")
+    parser.add_argument("--all_years", "--all-years", dest="all_years", action='store_true',
+                        help="Render the page of every year of --database_dir.")
+    parser.add_argument("--database_dir",
+                        metavar="database_dir", type=str, default=zen.corpus.DATABASE_DIR,
+                        help="Directory with conferences.json and proceedings/*.json.")
+    parser.add_argument("--output_dir",
+                        metavar="output_dir", type=str, default='.',
+                        help="Output directory of the pages, with --all_years.")
+    parser.add_argument("--num_cpus",
+                        metavar="num_cpus", type=int, default=1,
+                        help="Number of parallel render processes, with --all_years.")
+    parser.add_argument("--cache_dir",
+                        metavar="cache_dir", type=str, default=CACHE_DIR,
+                        help="Directory of compiled templates.")
+    parser.add_argument("--force", action='store_true',
+                        help="Render every year, changed or not.")
 
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.all_years:
+        rendered, failed = render_all(args.database_dir, args.output_dir, args.page_sort,
+                                      args.num_cpus, args.force, args.cache_dir)
+        print('rendered {} years, {} failed'.format(len(rendered), len(failed)))
+        raise SystemExit(1 if failed else 0)
+
+    if not (args.proceedings and args.conferences and args.output_file):
+        parser.error('proceedings, conferences and output_file are required '
+                     'without --all_years')
     with open(args.proceedings) as f:
         proceedings = json.load(f)
     with open(args.conferences) as f:
         conferences = json.load(f)
 
     with open(args.output_file, 'w') as fp:
-        fp.write(render(proceedings, conferences, page_sort=args.page_sort))
+        fp.write(render(proceedings, conferences, page_sort=args.page_sort,
+                        cache_dir=args.cache_dir))
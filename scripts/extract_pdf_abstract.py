@@ -9,29 +9,78 @@ $ python ./scripts/extract_pdf_abstract.py \
     ./path/to/proceedings/2017.json \
     ./path/to/pdfs
 
+Each PDF goes through a fast tier first, laying out only the column of text
+between the ABSTRACT and 1. INTRODUCTION headings found in the content
+stream; the full layout analysis of the page runs only if that fails. PDFs
+are processed in worker processes that are killed and replaced past
+`--timeout` seconds or `--max_memory_mb`, so a pathological file cannot stall
+the run. The tier of every paper is summarised at the end, and written out
+with `--report`.
+
+Abstracts are cached by PDF content and extractor version in
+`--abstract_cache`, so re-runs only process new or changed PDFs; `--force`
+re-extracts everything. The metadata file is only rewritten if it changed.
 """
 import argparse
-from joblib import Parallel, delayed
+import collections
+import contextlib
 import json
 import io
 import os
+import pdfminer
+import pdfminer.converter
 import pdfminer.high_level
 import pdfminer.layout
+import pdfminer.pdfinterp
+import pdfminer.pdfpage
 import pdfminer.settings
 from pdfrw import PdfReader, PdfWriter
 from pdfrw.findobjs import page_per_xobj
+import sqlite3
 import tempfile
 import tqdm
 
+import zen.cleanup
+import zen.pdfcache
+import zen.workers
 
 pdfminer.settings.STRICT = False
 MAX_LEN = 1500
 
+# The abstract and the start of the introduction are on the first page.
+MAX_PAGES = 1
+
+# Bump whenever a change to the extraction code can change its output, to
+# invalidate the abstracts cached by earlier versions.
+EXTRACTOR_VERSION = 4
+
+# Default location of the AbstractCache.
+ABSTRACT_CACHE = os.path.join('~', '.cache', 'conference-archive', 'abstracts.sqlite')
+
+# Seconds a worker may spend on one PDF before it is killed.
+TIMEOUT = 120
+
+# Tiers of `extract_abstract_tiered`.
+TIER_FAST = 'fast'
+TIER_FULL = 'full'
+
+# Headings delimiting the abstract, as in `extract_abstract`, without the
+# whitespace the content stream may leave out.
+QUERY_ABSTRACT = 'ABSTRACT'
+STOP_INTRO = '1.INTRODUCTION'
+
 
 def extract_first_page(fname):
+    """Rewrite every page of the PDF as a form XObject into a temporary file.
+
+    This is the former extraction path, kept for comparison in
+    `benchmarks/bench_extract.py`; `extract_text` reads the first pages of the
+    source directly instead. The caller removes the returned file.
+    """
 
-    # create a temporary PDF file
-    path_tmpfile = os.path.join(tempfile.gettempdir(), os.path.basename(fname))
+    # create a temporary PDF file, unique per call
+    fd, path_tmpfile = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
 
     # extract all elements from the PDF and put them on separate pages
     pdf_reader = PdfReader(fname).pages
@@ -45,8 +94,30 @@ def extract_first_page(fname):
     return path_tmpfile
 
 
-def extract_text(fname):
-    """Get all the text from the PDF."""
+def _open(fname):
+    # A path, the contents of a PDF, or an open binary file.
+    if isinstance(fname, bytes):
+        return contextlib.nullcontext(io.BytesIO(fname))
+    elif hasattr(fname, 'read'):
+        return contextlib.nullcontext(fname)
+    return open(fname, 'rb')
+
+
+def extract_text(fname, maxpages=0):
+    """Get the text from the first `maxpages` pages of the PDF, or all if 0.
+
+    Parameters
+    ----------
+    fname : str, bytes or file-like
+        Path to the PDF, its contents, or a binary file object.
+
+    maxpages : int, default=0
+        Number of pages to read; pdfminer stops parsing after these.
+
+    Returns
+    -------
+    text : str
+    """
 
     laparams = pdfminer.layout.LAParams()
     for param in ('all_texts', 'detect_vertical', 'word_margin', 'char_margin', 'line_margin', 'boxes_flow'):
@@ -57,9 +128,9 @@ def extract_text(fname):
     # send output to a string stream
     outfp = io.StringIO()
 
-    with open(fname, 'rb') as fp:
+    with _open(fname) as fp:
         pdfminer.high_level.extract_text_to_fp(fp, outfp=outfp, codec='utf-8',
-                                               laparams=laparams, pages=0)
+                                               laparams=laparams, maxpages=maxpages)
 
     return outfp.getvalue()
 
@@ -81,30 +152,163 @@ def extract_abstract(raw_text):
     if intro_index == -1:
         return ''
 
-    # post-processing
-    abstract = raw_text[abs_index + len(query_abstract):intro_index]
-    abstract = abstract.strip()
-
-    # replace some ugly things
-    abstract = abstract.replace('-\n', '')
-    abstract = abstract.replace('\n', ' ')
-    abstract = abstract.replace('ﬁ', 'fi')
-    abstract = abstract.replace('ﬂ', 'fl')
-    abstract = abstract.replace('  ', ' ')
-
-    return abstract
-
-
-def extract(key, path_pdf):
+    # post-processing: ligatures, hyphenation and whitespace
+    return zen.cleanup.clean(raw_text[abs_index + len(query_abstract):intro_index])
+
+
+class _IntroductionReached(Exception):
+    pass
+
+
+def _column(chars, heading):
+    """Horizontal extent of the column of text holding the heading.
+
+    Columns are told apart by the gutter between them, which no character
+    crosses; the gaps between words are covered by the other lines, or are
+    narrower than a character of the heading.
+    """
+    margin = max(char.width for char in heading)
+    left, right = min(char.x0 for char in heading), max(char.x1 for char in heading)
+
+    columns = []
+    for x0, x1 in sorted((char.x0, char.x1) for char in chars if char.get_text().strip()):
+        if columns and x0 <= columns[-1][1] + margin:
+            columns[-1][1] = max(columns[-1][1], x1)
+        else:
+            columns.append([x0, x1])
+    return next((x0, x1) for x0, x1 in columns if x0 <= left and right <= x1)
+
+
+class AbstractDevice(pdfminer.converter.TextConverter):
+    """Text converter that lays out only the abstract's column, from ABSTRACT
+    to 1. INTRODUCTION.
+
+    Characters are collected in content stream order, which follows the
+    reading order for the conference templates. Interpretation of the page
+    stops at the introduction heading; `layout_abstract` then runs the layout
+    analysis over the characters from the abstract heading on that lie in its
+    column, leaving out the title, authors, text of the other columns and
+    everything after the heading. On pages without both headings, the device
+    behaves as a plain `TextConverter`.
+    """
+
+    def begin_page(self, page, ctm):
+        super().begin_page(page, ctm)
+        self.chars = []
+        self.start = None
+        self.heading = None
+        self._tail = ''
+        self._marks = []
+
+    def render_char(self, *args, **kwargs):
+        adv = super().render_char(*args, **kwargs)
+        # characters inside figures never belong to the abstract
+        if isinstance(self.cur_item, pdfminer.layout.LTPage):
+            self._track(self.cur_item._objs[-1])
+        return adv
+
+    def _track(self, char):
+        self.chars.append(char)
+        text = ''.join(char.get_text().split())
+        if not text:
+            return
+
+        # positions of the last non-blank characters, to find where the
+        # abstract heading starts
+        self._marks = (self._marks + [len(self.chars) - 1])[-len(QUERY_ABSTRACT):]
+        self._tail = (self._tail + text)[-len(STOP_INTRO):]
+
+        if self.start is None and self._tail.endswith(QUERY_ABSTRACT):
+            self.start = self._marks[0]
+            self.heading = [self.chars[mark] for mark in self._marks]
+        elif self.start is not None and self._tail.endswith(STOP_INTRO):
+            raise _IntroductionReached()
+
+    def layout_abstract(self):
+        """Lay out and write the characters of the abstract's column collected
+        since the abstract heading."""
+        chars = self.chars[self.start:]
+        left, right = _column(chars, self.heading)
+        page = pdfminer.layout.LTPage(self.pageno, self.cur_item.bbox)
+        for char in chars:
+            if left <= (char.x0 + char.x1) / 2 <= right:
+                page.add(char)
+        page.analyze(self.laparams)
+        self.receive_layout(page)
+
+
+def extract_abstract_tiered(fname, maxpages=MAX_PAGES):
+    """Extract the abstract with the cheapest pass that finds it.
+
+    The fast tier scans the raw content stream for the headings and lays out
+    only the abstract's column; see `AbstractDevice`. The full tier, a layout
+    analysis of the whole page(s) as in `extract_text`, runs only when the
+    headings are not found in the stream, or the fast tier yields an empty or
+    implausibly long abstract. It produces the same abstract as
+    `extract_abstract(extract_text(fname))` by construction. The fast tier
+    does so whenever the abstract is drawn in reading order and the full
+    layout keeps its column apart; where the full layout slots text of the
+    next column in next to the abstract, only the fast tier leaves it out.
+
+    Parameters
+    ----------
+    fname : str, bytes or file-like
+        Path to the PDF, its contents, or a binary file object.
+
+    maxpages : int, default=MAX_PAGES
+        Number of pages to search for the abstract.
+
+    Returns
+    -------
+    abstract : str
+        Cleaned abstract, or '' if none was found.
+
+    tier : str
+        TIER_FAST or TIER_FULL, whichever produced `abstract`.
+    """
+    rsrcmgr = pdfminer.pdfinterp.PDFResourceManager()
+    outfp = io.StringIO()
+    device = AbstractDevice(rsrcmgr, outfp, codec='utf-8',
+                            laparams=pdfminer.layout.LAParams())
+    interpreter = pdfminer.pdfinterp.PDFPageInterpreter(rsrcmgr, device)
+
+    with _open(fname) as fp:
+        for page in pdfminer.pdfpage.PDFPage.get_pages(fp, maxpages=maxpages):
+            try:
+                interpreter.process_page(page)
+            except _IntroductionReached:
+                # only the abstract's column is laid out, on its own
+                outfp.seek(0)
+                outfp.truncate()
+                device.layout_abstract()
+                break
+        else:
+            # no headings in the stream; the device laid out the full pages
+            return extract_abstract(outfp.getvalue()), TIER_FULL
+
+    abstract = extract_abstract(outfp.getvalue())
+    if 0 < len(abstract) <= MAX_LEN:
+        return abstract, TIER_FAST
+
+    if hasattr(fname, 'seek'):
+        fname.seek(0)
+    return extract_abstract(extract_text(fname, maxpages=maxpages)), TIER_FULL
+
+
+def extract_abstract_early(fname, maxpages=MAX_PAGES):
+    """Extract the abstract, stopping at the introduction heading if possible.
+
+    See `extract_abstract_tiered`, which also reports the tier used.
+    """
+    return extract_abstract_tiered(fname, maxpages)[0]
+
+
+def extract(key, path_pdf, max_pages=MAX_PAGES):
     """Extraction function which defines the processing pipeline."""
 
-    path_tmp_pdf = extract_first_page(path_pdf)
-
-    # extract all text from first page
-    raw_text = extract_text(path_tmp_pdf)
-
-    # extract abstract from whole page and replace hyphens etc.
-    abstract = extract_abstract(raw_text)
+    # lay out the first page(s) only as far as the introduction, if the
+    # headings can be found, and extract the abstract, replacing hyphens etc.
+    abstract, tier = extract_abstract_tiered(path_pdf, maxpages=max_pages)
 
     # something went wrong when abstract is longer than 1500 chars
     if len(abstract) > MAX_LEN:
@@ -113,17 +317,88 @@ def extract(key, path_pdf):
     if not abstract:
         print('{}: Could not extract abstract.'.format(path_pdf))
 
-    # clean up temp file
-    os.unlink(path_tmp_pdf)
-
     # TODO: Fix this return object
-    out = {'@key': key, 'abstract': abstract}
+    out = {'@key': key, 'abstract': abstract, 'tier': tier}
 
     return out
 
 
-def main(records, pdf_dir, num_cpus=-1, verbose=0):
-    """Main function."""
+def extractor_key(max_pages=MAX_PAGES):
+    """Identify the extraction code and settings an abstract was produced with."""
+    laparams = vars(pdfminer.layout.LAParams())
+    return json.dumps(dict(version=EXTRACTOR_VERSION, pdfminer=pdfminer.__version__,
+                           laparams=laparams, max_pages=max_pages),
+                      sort_keys=True, default=str)
+
+
+class AbstractCache(object):
+    """On-disk cache of extracted abstracts.
+
+    Entries are keyed by the SHA-256 of the PDF and by `extractor_key`, so a
+    changed PDF, extractor or set of layout parameters misses the cache. The
+    hash of each file is remembered along with its size and modification
+    time, so unchanged PDFs are not even read again.
+
+    Parameters
+    ----------
+    path : str
+        SQLite database file; created if needed.
+    """
+
+    def __init__(self, path):
+        path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None, timeout=60)
+        self.db.executescript('''
+            CREATE TABLE IF NOT EXISTS abstracts (
+                sha256 TEXT, extractor TEXT, abstract TEXT, tier TEXT,
+                PRIMARY KEY (sha256, extractor));
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT);
+        ''')
+
+    def digest(self, path_pdf):
+        """SHA-256 of a PDF, re-hashed only if its size or mtime changed."""
+        path_pdf = os.path.abspath(path_pdf)
+        stat = os.stat(path_pdf)
+        row = self.db.execute('SELECT size, mtime_ns, sha256 FROM files WHERE path = ?',
+                              (path_pdf,)).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            return row[2]
+
+        sha256 = zen.pdfcache.sha256sum(path_pdf)
+        self.db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                        (path_pdf, stat.st_size, stat.st_mtime_ns, sha256))
+        return sha256
+
+    def get(self, sha256, extractor):
+        """Cached (abstract, tier), or None."""
+        return self.db.execute(
+            'SELECT abstract, tier FROM abstracts WHERE sha256 = ? AND extractor = ?',
+            (sha256, extractor)).fetchone()
+
+    def put(self, sha256, extractor, abstract, tier):
+        self.db.execute('INSERT OR REPLACE INTO abstracts VALUES (?, ?, ?, ?)',
+                        (sha256, extractor, abstract, tier))
+
+
+def main(records, pdf_dir, num_cpus=-1, verbose=0, cache=None, max_pages=MAX_PAGES,
+         timeout=TIMEOUT, max_memory=None, abstracts=None, force=False):
+    """Main function.
+
+    Every PDF is processed in a worker process of its own, killed and
+    replaced if it runs past `timeout` seconds or `max_memory` bytes; such
+    papers keep their previous abstract. The tier that produced each
+    abstract (see `extract_abstract_tiered`), or the reason there is none, is
+    stored in the returned `tiers`.
+
+    PDFs missing from `pdf_dir` are resolved through `cache`, a
+    zen.pdfcache.PdfCache, if given.
+
+    With `abstracts`, an AbstractCache, only PDFs that are new or changed
+    since a previous run (or whose extractor changed) are processed, unless
+    `force` is True.
+    """
 
     path_pdfs = []
     index_key = dict()
@@ -133,19 +408,50 @@ def main(records, pdf_dir, num_cpus=-1, verbose=0):
         index_key[cur_key] = cur_idx
         cur_fn = cur_key.split('/')[-1]
         cur_path = os.path.join(pdf_dir, '{}.pdf'.format(cur_fn))
+        if cache is not None and not os.path.exists(cur_path):
+            cur_path = cache.resolve(cur_record) or cur_path
         path_pdfs.append((cur_key, cur_path))
 
-    dfx = delayed(extract)
-    pool = Parallel(n_jobs=num_cpus, verbose=verbose)
-    abstracts = pool(dfx(cur_key, cur_path) for cur_key, cur_path in tqdm.tqdm(path_pdfs))
-
-    out = {}
+    tiers = dict()
+    digests = dict()
+    extractor = extractor_key(max_pages)
+    todo = []
+
+    for cur_key, cur_path in path_pdfs:
+        if abstracts is not None and os.path.exists(cur_path):
+            digests[cur_key] = abstracts.digest(cur_path)
+            hit = None if force else abstracts.get(digests[cur_key], extractor)
+            if hit is not None:
+                records[index_key[cur_key]]['abstract'], tiers[cur_key] = hit
+                continue
+        todo.append((cur_key, cur_path))
+
+    results = zen.workers.imap_isolated(
+        extract, [(cur_key, cur_path, max_pages) for cur_key, cur_path in todo],
+        num_workers=zen.workers.num_workers(num_cpus), timeout=timeout,
+        max_memory=max_memory)
+
+    for cur_idx, status, cur_abstract in tqdm.tqdm(results, total=len(todo)):
+        cur_key, cur_path = todo[cur_idx]
+        if status != zen.workers.OK:
+            print('{}: {}: {}'.format(cur_path, status, str(cur_abstract).strip().split('\n')[-1]))
+            tiers[cur_key] = status
+            continue
 
-    for cur_abstract in abstracts:
         cur_record_idx = index_key[cur_abstract['@key']]
         records[cur_record_idx]['abstract'] = cur_abstract['abstract']
+        tiers[cur_key] = cur_abstract['tier']
+        if cur_key in digests:
+            abstracts.put(digests[cur_key], extractor, cur_abstract['abstract'],
+                          cur_abstract['tier'])
+        if verbose:
+            print('{}: {}'.format(cur_path, cur_abstract['tier']))
+
+    counts = collections.Counter(tiers.values())
+    print('tiers: ' + ', '.join('{}={}'.format(k, v) for k, v in sorted(counts.items())) +
+          '; {} from cache'.format(len(path_pdfs) - len(todo)))
 
-    return records
+    return records, tiers
 
 
 if __name__ == '__main__':
@@ -163,13 +469,55 @@ if __name__ == '__main__':
                         help='Number of CPUs to use in parallel.')
     parser.add_argument('--verbose',
                         metavar='verbose', type=int, default=0,
-                        help='Verbosity level for joblib.')
+                        help='If non-zero, print the tier of every paper.')
+    parser.add_argument('--cache_dir',
+                        metavar='cache_dir', type=str, default=None,
+                        help='Local PDF store to read PDFs missing from pdf_dir from.')
+    parser.add_argument('--cache_max_mb',
+                        metavar='cache_max_mb', type=int, default=None,
+                        help='Size cap of the PDF store, in MB.')
+    parser.add_argument('--max_pages',
+                        metavar='max_pages', type=int, default=MAX_PAGES,
+                        help='Number of pages to read from each PDF; 0 for all.')
+    parser.add_argument('--timeout',
+                        metavar='timeout', type=float, default=TIMEOUT,
+                        help='Seconds allowed per PDF before its worker is killed.')
+    parser.add_argument('--max_memory_mb',
+                        metavar='max_memory_mb', type=int, default=None,
+                        help='Memory limit of each worker, in MB.')
+    parser.add_argument('--report',
+                        metavar='report', type=str, default=None,
+                        help='Path to write the tier of every paper to, as JSON.')
+    parser.add_argument('--abstract_cache',
+                        metavar='abstract_cache', type=str, default=ABSTRACT_CACHE,
+                        help='SQLite file caching abstracts by PDF hash and extractor version.')
+    parser.add_argument('--force',
+                        action='store_true',
+                        help='Re-extract every PDF, ignoring cached abstracts.')
     args = parser.parse_args()
 
     with open(args.metadata_file, 'r') as fp:
         records = json.load(fp)
 
-    proceedings_abstract = main(records, args.pdf_dir, args.num_cpus, args.verbose)
+    cache = None
+    if args.cache_dir is not None:
+        cache = zen.pdfcache.PdfCache(args.cache_dir, max_bytes=zen.pdfcache.megabytes(
+            args.cache_max_mb))
+
+    max_memory = None
+    if args.max_memory_mb is not None:
+        max_memory = args.max_memory_mb * 2 ** 20
+
+    original = json.dumps(records, indent=2)
+    proceedings_abstract, tiers = main(
+        records, args.pdf_dir, args.num_cpus, args.verbose, cache, args.max_pages,
+        args.timeout, max_memory, AbstractCache(args.abstract_cache), args.force)
+
+    if args.report is not None:
+        with open(args.report, 'w') as fp:
+            json.dump(tiers, fp, indent=2)
 
-    with open(args.metadata_file, 'w', encoding='utf-8') as f:
-        f.write(json.dumps(proceedings_abstract, indent=2))
+    updated = json.dumps(proceedings_abstract, indent=2)
+    if updated != original:
+        with open(args.metadata_file, 'w', encoding='utf-8') as f:
+            f.write(updated)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Find duplicate and near-duplicate papers in the proceedings.
+
+Usage
+-----
+
+$ python ./scripts/find_duplicates.py
+$ python ./scripts/find_duplicates.py softconf-2021.json --output dups.json
+
+Every year of `--database_dir` is checked, along with any extra JSON lists
+of paper records given as arguments (e.g. submission dumps), which are named
+after their file. Signatures are cached in `--cache_dir`, so only new or
+changed files are hashed again.
+"""
+import argparse
+import json
+import os
+
+import zen.corpus
+import zen.dedup
+
+# Default location of the cached signatures.
+CACHE_DIR = os.path.join('~', '.cache', 'conference-archive', 'dedup')
+
+
+def main(database_dir, filenames, cache_dir, title_threshold, text_threshold):
+    '''Find clusters of near-duplicate papers.
+
+    Parameters
+    ----------
+    database_dir : str
+        Directory holding `proceedings/<year>.json`.
+
+    filenames : list of str
+        Extra JSON files of paper records.
+
+    cache_dir : str
+        Directory of the cached signatures.
+
+    title_threshold, text_threshold : float
+        See `zen.dedup.find_duplicates`.
+
+    Returns
+    -------
+    clusters : list of dict
+        Most similar first, each with the `papers` as (source, position,
+        title) and the duplicate `pairs` with their similarities.
+    '''
+    sources = zen.corpus.proceedings_files(database_dir)
+    for filename in filenames:
+        sources[os.path.splitext(os.path.basename(filename))[0]] = filename
+
+    signatures, papers = zen.dedup.load_signatures(sources, cache_dir)
+    clusters = zen.dedup.find_duplicates(signatures, title_threshold, text_threshold)
+    return [dict(papers=[(name, position, papers[name, position]['title'])
+                         for name, position in cluster['keys']],
+                 pairs=[dict(a=list(a), b=list(b), title=title, text=text)
+                        for a, b, title, text in cluster['pairs']])
+            for cluster in clusters]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("filenames",
+                        metavar="filenames", type=str, nargs='*',
+                        help="Extra JSON files of paper records to check.")
+    parser.add_argument("--database_dir",
+                        metavar="database_dir", type=str, default=zen.corpus.DATABASE_DIR,
+                        help="Directory with proceedings/*.json.")
+    parser.add_argument("--cache_dir",
+                        metavar="cache_dir", type=str, default=CACHE_DIR,
+                        help="Directory of the cached signatures.")
+    parser.add_argument("--title_threshold",
+                        metavar="title_threshold", type=float,
+                        default=zen.dedup.TITLE_THRESHOLD,
+                        help="Minimum title similarity of duplicates.")
+    parser.add_argument("--text_threshold",
+                        metavar="text_threshold", type=float,
+                        default=zen.dedup.TEXT_THRESHOLD,
+                        help="Minimum title and abstract similarity of duplicates.")
+    parser.add_argument("--output",
+                        metavar="output", type=str, default=None,
+                        help="Optional path to write the clusters as JSON.")
+    args = parser.parse_args()
+    clusters = main(args.database_dir, args.filenames, args.cache_dir,
+                    args.title_threshold, args.text_threshold)
+    for cluster in clusters:
+        for pair in cluster['pairs']:
+            print('title {title:.2f}  text {text:.2f}  {a}  {b}'.format(**pair))
+        for name, position, title in cluster['papers']:
+            print('    {}[{}]  {}'.format(name, position, title))
+    print('{} clusters'.format(len(clusters)))
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(clusters, fp, indent=2)
@@ -1,8 +1,190 @@
 #!/usr/bin/python
+"""Generate the XML submissions of ISMIR proceedings to DBLP.
+
+Usage
+-----
+
+One year, from its proceedings file:
+
+$ ./scripts/generate_dblp.py -y 2022 database/conferences.json \
+    database/proceedings/2022.json dblp2022.xml
+
+A range of years, from the database directory:
+
+$ ./scripts/generate_dblp.py --years 2018-2022 --database_dir database \
+    --output_dir dblp
+
+The template output is streamed to the file chunk by chunk, XML-escaped,
+and checked against the structure of the DBLP submission DTD as it is
+written; an invalid submission is not left behind.
+"""
 import argparse
 import json
-import jinja2
+import logging
 import os
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+import jinja2
+
+import zen.corpus
+
+logger = logging.getLogger("generate_dblp")
+
+TEMPLATE = 'dblp.xml'
+
+# Children that every element of a submission must have, with text, after
+# the DBLP submission DTD.
+REQUIRED = {
+    'dblpsubmission': ('proceedings',),
+    'proceedings': ('key', 'title', 'publisher', 'year', 'toc'),
+    'conf': ('acronym',),
+    'series': ('title',),
+    'toc': ('publ',),
+    'publ': ('author', 'title'),
+}
+
+_ENVIRONMENT = None
+
+
+def template_environment():
+    '''The jinja environment of the DBLP templates, built once.
+
+    Values are escaped as XML text, and None renders as an empty string.
+    '''
+    global _ENVIRONMENT
+    if _ENVIRONMENT is None:
+        path = os.path.dirname(os.path.abspath(__file__))
+        _ENVIRONMENT = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(os.path.join(path, 'templates')),
+            finalize=lambda value: '' if value is None else escape(str(value)))
+    return _ENVIRONMENT
+
+
+class SubmissionValidator(object):
+    '''Incremental check of a DBLP submission against `REQUIRED`.
+
+    Feed it the document in chunks; finished `publ` elements are dropped,
+    so memory does not grow with the number of papers.
+    '''
+
+    def __init__(self):
+        self.parser = ET.XMLPullParser(events=('start', 'end'))
+        self.stack = []
+        self.num_papers = 0
+
+    def feed(self, chunk):
+        self.parser.feed(chunk)
+        self._check()
+
+    def close(self):
+        self.parser.close()
+        self._check()
+
+    def _check(self):
+        for event, elem in self.parser.read_events():
+            if event == 'start':
+                self.stack.append(elem)
+                continue
+
+            self.stack.pop()
+            path = '/'.join([parent.tag for parent in self.stack] + [elem.tag])
+            for tag in REQUIRED.get(elem.tag, ()):
+                child = elem.find(tag)
+                if child is None:
+                    raise ValueError('{}: missing <{}>'.format(path, tag))
+                if not len(child) and not (child.text or '').strip():
+                    raise ValueError('{}: empty <{}>'.format(path, tag))
+
+            if elem.tag == 'publ':
+                self.num_papers += 1
+                # Keep one finished paper, for the check of its <toc>.
+                for done in self.stack[-1].findall('publ')[:-1]:
+                    self.stack[-1].remove(done)
+
+
+def write_submission(meta, year, papers, output_file):
+    '''Stream the DBLP submission of one year to a file.
+
+    Parameters
+    ----------
+    meta : dict
+        Conference entry of the year.
+
+    year : int or str
+        Year of the proceedings.
+
+    papers : iterable of dict
+        Paper records; they are normalised, so a single author may be a
+        plain string.
+
+    output_file : str
+        Path of the XML file, replaced only if the submission is valid.
+
+    Returns
+    -------
+    num_papers : int
+        Number of papers written.
+
+    Raises
+    ------
+    ValueError
+        If the submission does not have the structure DBLP expects.
+    '''
+    template = template_environment().get_template(TEMPLATE)
+    context = {
+        'meta': meta,
+        'year': year,
+        'publications': (zen.corpus.normalize_paper(paper) for paper in papers)
+    }
+
+    validator = SubmissionValidator()
+    try:
+        with open(output_file + '.tmp', 'w', encoding='utf-8') as fp:
+            for chunk in template.generate(context):
+                fp.write(chunk)
+                validator.feed(chunk)
+            validator.close()
+    except (ValueError, ET.ParseError) as derp:
+        os.remove(output_file + '.tmp')
+        raise ValueError('{}: invalid DBLP submission for {}: {}'.format(
+            output_file, year, derp))
+    os.replace(output_file + '.tmp', output_file)
+    return validator.num_papers
+
+
+def generate(years, database_dir, output_dir):
+    '''Write the DBLP submissions of several years.
+
+    Parameters
+    ----------
+    years : iterable of int
+        Years to generate.
+
+    database_dir : str
+        Directory holding `conferences.json` and `proceedings/<year>.json`.
+
+    output_dir : str
+        Directory of the `dblp<year>.xml` files.
+
+    Returns
+    -------
+    outputs : dict
+        Year to the path of its submission.
+    '''
+    corpus = zen.corpus.Corpus(database_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = dict()
+    for year in years:
+        year = str(year)
+        if year not in corpus.conferences:
+            raise Exception(f"Year {year} isn't in conferences.json. Has it been added yet?")
+        output_file = os.path.join(output_dir, 'dblp{}.xml'.format(year))
+        num_papers = write_submission(corpus.conferences[year], year, corpus.papers(year),
+                                      output_file)
+        logger.info('wrote %d papers to %s', num_papers, output_file)
+        outputs[year] = output_file
+    return outputs
 
 
 def main(year, conferences_json, proceedings_json, output_file):
@@ -19,27 +201,37 @@ def main(year, conferences_json, proceedings_json, output_file):
     if str(year) not in conferences:
         raise Exception(f"Year {year} isn't in conferences.json. Has it been added yet?")
 
-    context = {
-        'meta': conferences[str(year)],
-        'year': year,
-        'publications': proceedings
-    }
+    write_submission(conferences[str(year)], year, proceedings, output_file)
 
-    # get jinja template
-    PATH = os.path.dirname(os.path.abspath(__file__))
-    template_env = jinja2.Environment(loader=jinja2.FileSystemLoader(os.path.join(PATH, 'templates')))
 
-    template = template_env.get_template('dblp.xml')
-    with open(output_file, 'w') as f:
-        f.write(template.render(context))
+def year_range(value):
+    '''Parse a year, or an inclusive range like 2018-2022.'''
+    first, _, last = value.partition('-')
+    return list(range(int(first), int(last or first) + 1))
 
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description="Generate a data file to be uploaded to DBLP")
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("-y", required=False, type=int, help="The year to update for")
-    parser.add_argument("conferences", help="path to conferences.json")
-    parser.add_argument("papers", help="the 202x.json file with the proceedings")
-    parser.add_argument("output_file", help="path to output XML file")
+    parser.add_argument("conferences", nargs='?', help="path to conferences.json")
+    parser.add_argument("papers", nargs='?', help="the 202x.json file with the proceedings")
+    parser.add_argument("output_file", nargs='?', help="path to output XML file")
+    parser.add_argument("--years",
+                        metavar="years", type=year_range, default=None,
+                        help="Year or range of years, e.g. 2018-2022, from --database_dir.")
+    parser.add_argument("--database_dir",
+                        metavar="database_dir", type=str, default=zen.corpus.DATABASE_DIR,
+                        help="Directory with conferences.json and proceedings/*.json.")
+    parser.add_argument("--output_dir",
+                        metavar="output_dir", type=str, default='.',
+                        help="Output directory of dblp<year>.xml, with --years.")
 
     args = parser.parse_args()
-    main(args.y, args.conferences, args.papers, args.output_file)
+    logging.basicConfig(level=logging.INFO)
+    if args.years:
+        generate(args.years, args.database_dir, args.output_dir)
+    elif args.conferences and args.papers and args.output_file:
+        main(args.y, args.conferences, args.papers, args.output_file)
+    else:
+        parser.error('conferences, papers and output_file are required without --years')
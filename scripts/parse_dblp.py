@@ -6,86 +6,69 @@ Usage
 -----
 ```
 $ python scripts/parse_dblp.py proceedings.json
+$ python scripts/parse_dblp.py proceedings.json --years 2000-2017 --resume
+$ python scripts/parse_dblp.py proceedings.json --dump dblp.xml.gz
 ```
+
+Every DBLP response is cached in `--cache_dir` and reused for `--ttl`
+seconds, then revalidated with its ETag, so a re-run does not scrape the
+listing pages again. Requests go out from `--num_cpus` threads at no more
+than one per `--delay` seconds overall. Each year is read from its table of
+contents export in a single request, unless `--per_record` is given.
+
+With `--dump`, nothing is fetched: the ISMIR papers and volumes of the
+years are read from a local copy of the full DBLP dump
+(https://dblp.org/xml/dblp.xml.gz), streamed in constant memory.
 """
 import argparse
-import bs4
 import logging
 import json
 import os
-import requests
 import sys
-import time
-import tqdm
-import xmltodict
-
-logger = logging.getLogger("mirror-dblp")
-
-DBLP = "http://dblp.uni-trier.de/db/conf/ismir/ismir{year}.html"
-XML = "https://dblp.uni-trier.de/rec/xml/{cite_key}.xml"
-
-
-def get_cite_key(s):
-    return s.split('/')[-1]
-
-
-def collect_citekeys(year):
-    """Recover paper metadata from DBLP given a conference year.
-
-    Parameters
-    ----------
-    year : str or int
-        Conference year (YYYY) to download.
 
-    Returns
-    -------
-    cite_keys : list
-        Collection of paper citation keys.
-    """
-    resp = requests.get(DBLP.format(year=str(year)))
-    soup = bs4.BeautifulSoup(resp.text)
-    records = soup.findAll(attrs={'class': 'entry inproceedings'})
-    cite_keys = [rec.attrs.get('id') for rec in records]
+import zen.dblp
 
-    print("ISMIR{}: {} rows".format(year, len(cite_keys)))
-    return cite_keys
-
-
-def fetch_record(cite_key):
-    resp = requests.get(XML.format(cite_key=cite_key))
-    if resp.status_code >= 400:
-        raise ValueError(XML.format(cite_key=cite_key))
+logger = logging.getLogger("mirror-dblp")
 
-    xml = resp.text.replace('\n', '')
-    return dict(xmltodict.parse(xml)['dblp']['inproceedings'])
 
+def year_range(value):
+    '''Parse a year, or an inclusive range like 2000-2017.'''
+    first, _, last = value.partition('-')
+    return list(range(int(first), int(last or first) + 1))
 
-def main(output_file, num_cpus, verbose, resume=False, delay=0.5):
-    cite_keys = []
-    for year in range(2000, 2018):
-        cite_keys += collect_citekeys(year)
 
+def main(output_file, num_cpus, verbose, resume=False, delay=0.5, years=range(2000, 2018),
+         cache_dir=zen.dblp.CACHE_DIR, ttl=zen.dblp.TTL, bulk=True, host=zen.dblp.HOST,
+         dump=None):
     if resume and os.path.exists(output_file):
         with open(output_file, 'r') as fp:
             records = json.load(fp)
     else:
         records = dict()
 
+    if dump is not None:
+        years = set(str(year) for year in years)
+        for cite_key, record in zen.dblp.iter_dump(dump):
+            if record.get('year') in years:
+                records.setdefault(cite_key, record)
+        print("Total {} rows".format(len(records)))
+        with open(output_file, 'w') as fp:
+            json.dump(records, fp, indent=2)
+        return os.path.exists(output_file)
+
+    harvester = zen.dblp.Harvester(cache_dir, ttl, rate=1. / delay if delay > 0 else 1000,
+                                   num_workers=num_cpus, host=host)
     try:
-        for ckey in tqdm.tqdm(cite_keys):
-            now = time.time()
-            if ckey not in records:
-                records[ckey] = fetch_record(ckey)
-                time.sleep(max([delay - (time.time() - now), 0]))
+        harvester.harvest(years, records, bulk=bulk)
 
     except KeyboardInterrupt:
         print('Halting early')
 
-    except ValueError as derp:
+    except (ValueError, OSError) as derp:
         print("Fetch failed: {}".format(derp))
 
     finally:
-        print("Total {} rows".format(len(records)))
+        print("Total {} rows, {} requests".format(len(records), harvester.requests))
         with open(output_file, 'w') as fp:
             json.dump(records, fp, indent=2)
 
@@ -93,26 +76,45 @@ def main(output_file, num_cpus, verbose, resume=False, delay=0.5):
 
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description=__doc__)
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
 
     # Inputs
     parser.add_argument("output_file",
                         metavar="output_file", type=str,
                         help="Path to write the output metadata as JSON.")
     parser.add_argument("--num_cpus",
-                        metavar="num_cpus", type=int, default=-2,
-                        help="Number of CPUs to use in parallel.")
+                        metavar="num_cpus", type=int, default=4,
+                        help="Number of concurrent requests.")
     parser.add_argument("--verbose",
                         metavar="verbose", type=int, default=0,
-                        help="Verbosity level for joblib.")
+                        help="Verbosity level; 1 logs progress, 2 every request.")
     parser.add_argument("--resume",
                         action='store_true',
                         help="If given, will resume")
     parser.add_argument("--delay",
                         type=float, default=0.5,
-                        help="Delay time in seconds between XML requests.")
+                        help="Minimum time in seconds between requests, across threads.")
+    parser.add_argument("--years",
+                        metavar="years", type=year_range, default=list(range(2000, 2018)),
+                        help="Year or range of years, e.g. 2000-2017.")
+    parser.add_argument("--cache_dir",
+                        metavar="cache_dir", type=str, default=zen.dblp.CACHE_DIR,
+                        help="Directory of the HTTP cache.")
+    parser.add_argument("--ttl",
+                        metavar="ttl", type=float, default=zen.dblp.TTL,
+                        help="Seconds a cached response is used before revalidating it.")
+    parser.add_argument("--per_record",
+                        action='store_true',
+                        help="Fetch every record on its own instead of the TOC exports.")
+    parser.add_argument("--dump",
+                        metavar="dump", type=str, default=None,
+                        help="Read a local dblp.xml(.gz) dump instead of fetching.")
     args = parser.parse_args()
+    logging.basicConfig(level=[logging.WARNING, logging.INFO, logging.DEBUG][
+        min(args.verbose, 2)])
     success = main(args.output_file, args.num_cpus, args.verbose,
-                   args.resume, args.delay)
+                   args.resume, args.delay, args.years, args.cache_dir, args.ttl,
+                   bulk=not args.per_record, dump=args.dump)
     logging.info("Complete scrape: success={}".format(success))
     sys.exit(0 if success else 1)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Reconcile the proceedings with their DBLP exports.
+
+Usage
+-----
+
+$ python ./scripts/reconcile_dblp.py
+$ python ./scripts/reconcile_dblp.py dblp.json --write --output report.json
+
+Every year with a `proceedings/<year>_dblp.xml` or `_dblp.html` export in
+`--database_dir` is matched paper by paper, along with any records
+harvested by `scripts/parse_dblp.py` given as arguments. Disagreements in
+titles, authors, pages, DOIs and cite keys are printed; with `--write`, cite
+keys found in the exports are filled into papers that have none. Exports
+submitted by us carry no cite keys, so only DBLP's own records can fill
+them.
+"""
+import argparse
+import json
+import logging
+
+import zen.corpus
+import zen.reconcile
+
+logger = logging.getLogger("reconcile_dblp")
+
+
+def write_keys(filename, keys):
+    '''Fill in the `dblp_key` of papers of a proceedings file.
+
+    The file keeps its own format, so only the filled in keys differ.
+
+    Parameters
+    ----------
+    filename : str
+        Proceedings metadata file.
+
+    keys : dict
+        Paper index to its cite key.
+    '''
+    with open(filename, 'r', encoding='utf-8') as fp:
+        text = fp.read()
+    records = json.loads(text)
+    for position, key in keys.items():
+        records[position]['dblp_key'] = key
+    with open(filename, 'w', encoding='utf-8') as fp:
+        fp.write(zen.corpus.dumps_like(records, text))
+
+
+def main(database_dir, filenames, write=False, min_score=zen.reconcile.MIN_SCORE):
+    '''Reconcile every year, and optionally write back the cite keys.
+
+    Parameters
+    ----------
+    database_dir : str
+        Directory holding `proceedings/<year>.json` and the exports.
+
+    filenames : list of str
+        Extra exports, as written by `scripts/parse_dblp.py`.
+
+    write : bool, default=False
+        Fill in missing `dblp_key` fields.
+
+    min_score : float, default=zen.reconcile.MIN_SCORE
+        Minimum score of a match.
+
+    Returns
+    -------
+    report : dict
+        Year to its matches and mismatches, see `zen.reconcile.reconcile`,
+        with papers and export records by title.
+    '''
+    papers, exports = zen.reconcile.load(database_dir, filenames)
+    results = zen.reconcile.reconcile(papers, exports, min_score)
+    files = zen.corpus.proceedings_files(database_dir)
+
+    report = dict()
+    for year, result in results.items():
+        ours, theirs = papers[year], exports[year]
+        report[year] = dict(
+            matched=len(result['matches']),
+            keys=dict((ours[position]['title'], key)
+                      for position, key in result['keys'].items()),
+            mismatches=[dict(position=position, title=ours[position]['title'], fields=fields)
+                        for position, _, fields in result['mismatches']],
+            unmatched=[ours[position]['title'] for position in result['unmatched']],
+            unmatched_exports=[theirs[index]['title']
+                               for index in result['unmatched_exports']])
+        if write and result['keys']:
+            write_keys(files[year], result['keys'])
+            logger.info('%s: wrote %d cite keys', files[year], len(result['keys']))
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("filenames",
+                        metavar="filenames", type=str, nargs='*',
+                        help="Records harvested by parse_dblp.py.")
+    parser.add_argument("--database_dir",
+                        metavar="database_dir", type=str, default=zen.corpus.DATABASE_DIR,
+                        help="Directory with proceedings/*.json and the DBLP exports.")
+    parser.add_argument("--write",
+                        action='store_true',
+                        help="Fill in missing dblp_key fields.")
+    parser.add_argument("--min_score",
+                        metavar="min_score", type=float, default=zen.reconcile.MIN_SCORE,
+                        help="Minimum score of a match.")
+    parser.add_argument("--output",
+                        metavar="output", type=str, default=None,
+                        help="Optional path to write the report as JSON.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    report = main(args.database_dir, args.filenames, args.write, args.min_score)
+    for year, result in sorted(report.items()):
+        print('{}: {} matched, {} cite keys, {} mismatches, {} + {} unmatched'.format(
+            year, result['matched'], len(result['keys']), len(result['mismatches']),
+            len(result['unmatched']), len(result['unmatched_exports'])))
+        for mismatch in result['mismatches']:
+            print('    [{position}] {title}'.format(**mismatch))
+            for field, (ours, theirs) in sorted(mismatch['fields'].items()):
+                print('        {}: {!r} != {!r}'.format(field, ours, theirs))
+        for title in result['unmatched']:
+            print('    not in the export: {}'.format(title))
+        for title in result['unmatched_exports']:
+            print('    only in the export: {}'.format(title))
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=2)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding: utf8
+"""Search the titles and abstracts of the proceedings.
+
+Usage
+-----
+
+$ python ./scripts/search_proceedings.py chord recognition --limit 5
+
+The BM25 index in `--index_dir` is brought up to date with the metadata
+before searching; only years whose JSON changed are re-indexed.
+"""
+import argparse
+import os
+
+import zen.corpus
+import zen.search
+
+# Default location of the index.
+INDEX_DIR = os.path.join('~', '.cache', 'conference-archive', 'search')
+
+
+def main(query, database_dir, index_dir, limit=10, rebuild=False):
+    '''Update the index and search it.
+
+    Parameters
+    ----------
+    query : str
+        Free-text query.
+
+    database_dir : str
+        Directory holding `proceedings/<year>.json`.
+
+    index_dir : str
+        Directory of the index.
+
+    limit : int, default=10
+        Maximum number of results.
+
+    rebuild : bool, default=False
+        Re-index every year, changed or not.
+
+    Returns
+    -------
+    results : list of dict
+        See `zen.search.Index.search`.
+    '''
+    index_dir = os.path.expanduser(index_dir)
+    zen.search.build(database_dir, index_dir, force=rebuild)
+    with zen.search.Index(index_dir) as index:
+        return index.search(query, limit)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query",
+                        metavar="query", type=str, nargs='+',
+                        help="Search terms.")
+    parser.add_argument("--database_dir",
+                        metavar="database_dir", type=str, default=zen.corpus.DATABASE_DIR,
+                        help="Directory with proceedings/*.json.")
+    parser.add_argument("--index_dir",
+                        metavar="index_dir", type=str, default=INDEX_DIR,
+                        help="Directory of the search index.")
+    parser.add_argument("--limit",
+                        metavar="limit", type=int, default=10,
+                        help="Maximum number of results.")
+    parser.add_argument("--rebuild",
+                        action='store_true',
+                        help="Re-index every year.")
+    args = parser.parse_args()
+    results = main(' '.join(args.query), args.database_dir, args.index_dir, args.limit,
+                   args.rebuild)
+    for result in results:
+        print('{score:6.2f}  {year}  {title}  {doi}'.format(**result))
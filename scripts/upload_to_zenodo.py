@@ -23,16 +23,271 @@ $ ./scripts/upload_to_zenodo.py \
     --num_cpus -2 \
     --max_items 10
 ```
+
+Every completed step (create, upload, metadata, publish) is appended to a
+journal next to the output file, `uploaded-proceedings.journal.jsonl` above.
+If a run dies part-way, re-run the same command with `--resume` to continue
+each paper from its last completed step.
+
+Throttled (429) responses are retried once Zenodo allows it, and all workers
+in a process slow down and ramp back up together; `--rate_limit` also caps the
+requests per second, over all workers.
+
+The uploads are I/O-bound; `--engine async` runs them on an asyncio event loop
+with at most `--concurrency` papers in flight, sharing one connection pool:
+```
+$ ./scripts/upload_to_zenodo.py \
+    data/proceedings.json \
+    data/conferences.json \
+    uploaded-proceedings.json \
+    --stage dev \
+    --engine async \
+    --concurrency 16
+```
+
+When file uploads dominate (e.g. a full proceedings batch), `--engine pipeline`
+gives each step its own workers: `--concurrency` for each of the light
+create / metadata / publish steps, and `--upload_workers` for file uploads.
+Per-step utilisation and queue depths are logged at the end.
+
+PDFs given by URL are streamed from their source on every upload; with
+`--cache_dir`, they are read from the local PDF store shared with
+`download_proceedings.py` and `extract_pdf_abstract.py` instead, and fetched
+into it if missing.
 """
 import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
 from joblib import Parallel, delayed
 import json
+import logging
 import random
 import zen.api
+import zen.journal
 import zen.models
+import zen.pdfcache
+import zen.pipeline
+import zen.workers
+
+logger = logging.getLogger("upload_to_zenodo")
+
+ENGINES = ('joblib', 'async', 'pipeline')
+
+
+def _file_changed(deposition, filepath, resolve=None):
+    """Test whether a PDF differs from the copy held by a deposition.
+
+    `resolve`, if given, maps `filepath` to a local copy to hash instead.
+    Remote PDFs are never downloaded to be compared: a PDF in the
+    deposition's own bucket or record is its copy, and any other URL without
+    a local copy is assumed unchanged.
+    """
+    basename = filepath.split('/')[-1]
+    remote = {f.get('filename'): f.get('checksum')
+              for f in deposition.get('files', [])}
+    if basename not in remote:
+        return True
+
+    # The PDF already points at the deposition's own copy.
+    own = ['/record/{}/files/'.format(deposition['id'])]
+    bucket = deposition.get('links', dict()).get('bucket')
+    if bucket:
+        own.append(bucket.rstrip('/') + '/')
+    if any(prefix in filepath for prefix in own):
+        return False
+
+    if resolve is not None:
+        filepath = resolve()
+    if filepath.startswith('http'):
+        logger.info('%s: no local copy of %s to compare, keeping the uploaded file',
+                    deposition['id'], filepath)
+        return False
+    return zen.api.md5sum(filepath) != remote[basename].split(':')[-1]
 
 
-def upload(ismir_paper, conferences, stage=zen.DEV):
+def _normalize(value, field=None):
+    """Comparable form of a metadata value, as Zenodo echoes it back.
+
+    Zenodo collapses whitespace, lowercases license identifiers (or returns
+    them as `{'id': ...}`), and drops empty values.
+    """
+    if field == 'license' and isinstance(value, dict):
+        value = value.get('id')
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = str(value)
+    if isinstance(value, str):
+        value = ' '.join(value.split())
+        if field == 'license':
+            value = value.lower()
+    return None if value == '' else value
+
+
+def _metadata_changed(local, remote, field=None):
+    """Test whether any field of `local` is missing or different in `remote`.
+
+    Zenodo adds fields of its own (e.g. `prereserve_doi`, or `affiliation` on
+    creators), so only the fields we send are compared, after `_normalize`.
+    """
+    if isinstance(local, dict):
+        return (not isinstance(remote, dict) or
+                any(_metadata_changed(v, remote.get(k), k) for k, v in local.items()))
+    elif isinstance(local, list):
+        return (not isinstance(remote, list) or len(local) != len(remote) or
+                any(_metadata_changed(a, b, field) for a, b in zip(local, remote)))
+    return _normalize(local, field) != _normalize(remote, field)
+
+
+class UploadJob(object):
+    """One paper on its way through the create, upload, metadata and publish steps.
+
+    Each step is a method, so the steps can run back to back in one worker
+    (see `upload`), or in the stages of a pipeline.
+
+    Parameters
+    ----------
+    ismir_paper : zen.models.IsmirPaper
+        ISMIR paper record.
+
+    conferences : dict of zen.models.IsmirConference
+        Conference metadata.
+
+    client : zen.api.ZenodoClient
+        Client to upload with.
+
+    journal : zen.journal.Journal, default=None
+        If given, each completed step is recorded here.
+
+    state : dict, default=None
+        Replayed journal state for this paper; steps it has already completed
+        are skipped.
+
+    cache : zen.pdfcache.PdfCache, default=None
+        If given, the PDF is read from, or fetched into, this local store.
+    """
+    STEPS = ('create', 'upload', 'metadata', 'publish')
+
+    def __init__(self, ismir_paper, conferences, client, journal=None, state=None,
+                 cache=None):
+        self.paper = zen.models.IsmirPaper(**ismir_paper)
+        self.conf = zen.models.IsmirConference(**conferences[self.paper['year']])
+        self.client = client
+        self.journal = journal
+        self.state = state or dict()
+        self.cache = cache
+        self.key = zen.journal.paper_key(self.paper)
+        self.source = self.paper['ee']
+        self.zid = None
+        self.deposition = None
+        self.file_changed = True
+        self.meta_changed = True
+        self.zenodo_meta = None
+
+    def local_source(self):
+        """Path to read the PDF from; through the cache, if any."""
+        if self.cache is None:
+            return self.source
+        return self.cache.resolve(dict(self.paper, ee=self.source)) or self.source
+
+    def record(self, step, **data):
+        self.state.update(step=step, **data)
+        if self.journal is not None:
+            self.journal.record(self.key, step, **data)
+
+    def create(self):
+        """Create the deposition, or, in update mode, find what changed."""
+        if not self.paper['zenodo_id']:
+            # New submission
+            self.zid = self.state.get('zenodo_id')
+            if self.zid is None:
+                self.zid = self.client.create_id()
+                self.record('created', zenodo_id=self.zid)
+        else:
+            # Update mode
+            #  * If the checksum is different, re-upload the pdf, unless
+            #    the record was published and its files are locked
+            #  * If the metadata is different, update it
+            #  * Otherwise, leave the published record alone
+            self.zid = self.paper['zenodo_id']
+            if self.state.get('step') is None:
+                self.deposition = self.client.get(self.zid)
+
+        self.paper['ee'] = f'https://zenodo.org/record/{self.zid}/files/{self.source.split("/")[-1]}'
+
+        # TODO: Should be a package function
+        zenodo_meta = zen.models.merge(
+            zen.models.Zenodo, self.paper, self.conf,
+            creators=zen.models.author_to_creators(self.paper['author']),
+            partof_pages=self.paper['pages'],
+            description=self.paper['abstract'])
+        self.zenodo_meta = zenodo_meta.dropna()
+
+        if self.deposition is not None:
+            self.file_changed = _file_changed(self.deposition, self.source,
+                                              resolve=self.local_source)
+            self.meta_changed = _metadata_changed(self.zenodo_meta,
+                                                  self.deposition.get('metadata'))
+            if self.file_changed and self.deposition.get('submitted'):
+                # Zenodo locks the files of published records; replacing one
+                # takes a new version, with a DOI of its own.
+                logger.warning('%s: %s differs from the published PDF, which cannot be '
+                               'replaced; create a new version to change it',
+                               self.zid, self.source)
+                self.file_changed = False
+            pending = self.deposition.get('state') != 'done'
+
+            if not (self.file_changed or self.meta_changed or pending):
+                self.record('published', zenodo_id=self.zid, ee=self.paper['ee'],
+                            doi=self.deposition['doi'], url=self.deposition['doi_url'])
+
+            elif self.deposition.get('state') == 'done':
+                self.client.edit(self.zid)
+
+        return self
+
+    def upload(self):
+        """Upload the PDF, unless it is already there."""
+        if self.file_changed and not zen.journal.completed(self.state, 'uploaded'):
+            local = self.local_source()
+            if local == self.source:
+                upload_response = self.client.upload_file(self.zid, self.source)
+            else:
+                # Keep the original file name on Zenodo.
+                with open(local, 'rb') as fp:
+                    upload_response = self.client.upload_file(self.zid, self.source, fp=fp)
+                self.cache.alias(local, 'zenodo:{}'.format(self.zid),
+                                 'url:{}'.format(self.paper['ee']))
+            self.record('uploaded', zenodo_id=self.zid,
+                        checksum=upload_response.get('checksum'))
+        return self
+
+    def metadata(self):
+        """Send the Zenodo metadata, unless it is unchanged."""
+        if self.meta_changed and not zen.journal.completed(self.state, 'metadata'):
+            self.client.update_metadata(self.zid, self.zenodo_meta)
+            self.record('metadata', zenodo_id=self.zid)
+        return self
+
+    def publish(self):
+        """Publish the deposition, unless nothing changed.
+
+        Returns
+        -------
+        updated_paper : zen.models.IsmirPaper
+            An updated ISMIR paper object.
+        """
+        if not zen.journal.completed(self.state, 'published'):
+            publish_response = self.client.publish(self.zid)
+            self.record('published', zenodo_id=self.zid, ee=self.paper['ee'],
+                        doi=publish_response['doi'], url=publish_response['doi_url'])
+
+        self.paper.update(doi=self.state['doi'], url=self.state['url'],
+                          zenodo_id=self.zid)
+        return self.paper
+
+
+def upload(ismir_paper, conferences, stage=zen.DEV, client=None, journal=None,
+           state=None, cache=None, rate_limit=None):
     """Upload a file / metadata pair to a Zenodo stage.
 
     Parameters
@@ -46,51 +301,253 @@ def upload(ismir_paper, conferences, stage=zen.DEV):
     stage : str
         One of [dev, prod]; defines the deployment area to use.
 
+    client : zen.api.ZenodoClient, default=None
+        Client to upload with; defaults to the shared client for `stage`.
+
+    journal : zen.journal.Journal, default=None
+        If given, each completed step is recorded here.
+
+    state : dict, default=None
+        Replayed journal state for this paper; steps it has already completed
+        are skipped.
+
+    cache : zen.pdfcache.PdfCache, default=None
+        If given, the PDF is read from, or fetched into, this local store.
+
+    rate_limit : float, default=None
+        If given, maximum requests per second of the client's rate
+        controller; set here so that it reaches joblib worker processes.
+
     Returns
     -------
     updated_paper : zen.models.IsmirPaper
         An updated ISMIR paper object.
     """
-    ismir_paper = zen.models.IsmirPaper(**ismir_paper)
-    conf = zen.models.IsmirConference(**conferences[ismir_paper['year']])
+    client = client or zen.api.get_client(stage)
+    if rate_limit is not None and client.rate_controller.max_rate != rate_limit:
+        client.rate_controller.set_rate(rate_limit)
+    job = UploadJob(ismir_paper, conferences, client, journal, state, cache)
+    return job.create().upload().metadata().publish()
+
+
+async def archive_async(proceedings, conferences, stage=zen.DEV, concurrency=8,
+                        journal=None, states=None, client=None, cache=None):
+    """Upload a collection of papers from an asyncio event loop.
+
+    Parameters
+    ----------
+    proceedings : list of zen.models.IsmirPaper
+        ISMIR paper records.
+
+    conferences : dict of zen.models.IsmirConference
+        Conference metadata.
+
+    stage : str
+        One of [dev, prod]; defines the deployment area to use.
+
+    concurrency : int, default=8
+        Maximum number of papers in flight at once; also the size of the
+        shared connection pool.
+
+    journal : zen.journal.Journal, default=None
+        If given, each completed step is recorded here.
+
+    states : dict, default=None
+        Replayed journal states, keyed by `zen.journal.paper_key`.
+
+    client : zen.api.ZenodoClient, default=None
+        Client to upload with; by default, a new one with a connection pool
+        of `concurrency` connections.
+
+    cache : zen.pdfcache.PdfCache, default=None
+        If given, PDFs are read from, or fetched into, this local store.
+
+    Returns
+    -------
+    updated_papers : list of zen.models.IsmirPaper
+        Updated ISMIR paper objects, in the order given.
+    """
+    states = states or dict()
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    owned = client is None
+    if owned:
+        client = zen.api.ZenodoClient(stage, pool_maxsize=concurrency)
 
-    if not ismir_paper['zenodo_id']:
-        # New submission
-        zid = zen.create_id(stage=stage)
-        upload_response = zen.upload_file(zid, ismir_paper['ee'], stage=stage)
-    else:
-        # Update mode
-        #  * If the checksum is different, re-upload the pdf
-        #  * Update the metadata regardless
-        zid = ismir_paper['zenodo_id']
+    # The client is closed only once the executor has shut down, that is
+    # once uploads still running after a failure have finished.
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            async def _upload(paper):
+                async with semaphore:
+                    fx = functools.partial(
+                        upload, paper, conferences, stage, client=client,
+                        journal=journal, state=states.get(zen.journal.paper_key(paper)),
+                        cache=cache)
+                    result = await loop.run_in_executor(executor, fx)
+                    logger.debug('uploaded %s', result['zenodo_id'])
+                    return result
 
-    ismir_paper['ee'] = f'https://zenodo.org/record/{zid}/files/{ismir_paper["ee"].split("/")[-1]}'
+            return await asyncio.gather(*[_upload(paper) for paper in proceedings])
+    finally:
+        if owned:
+            client.close()
 
-    # TODO: Should be a package function
-    zenodo_meta = zen.models.merge(
-        zen.models.Zenodo, ismir_paper, conf,
-        creators=zen.models.author_to_creators(ismir_paper['author']),
-        partof_pages=ismir_paper['pages'],
-        description=ismir_paper['abstract'])
 
-    zen.update_metadata(zid, zenodo_meta.dropna(), stage=stage)
-    publish_response = zen.publish(zid, stage=stage)
+def archive_pipeline(proceedings, conferences, stage=zen.DEV, concurrency=8,
+                     upload_workers=2, journal=None, states=None, client=None,
+                     cache=None):
+    """Upload a collection of papers through a pipeline of per-step worker pools.
 
-    ismir_paper.update(doi=publish_response['doi'],
-                       url=publish_response['doi_url'],
-                       zenodo_id=zid)
+    The cheap create, metadata and publish calls each get `concurrency`
+    workers, while the bandwidth-bound file uploads get `upload_workers`, so
+    large uploads no longer hold up the other steps of other papers.
 
-    return ismir_paper
+    Parameters
+    ----------
+    proceedings : list of zen.models.IsmirPaper
+        ISMIR paper records.
+
+    conferences : dict of zen.models.IsmirConference
+        Conference metadata.
+
+    stage : str
+        One of [dev, prod]; defines the deployment area to use.
+
+    concurrency : int, default=8
+        Workers for each of the create, metadata and publish steps.
 
+    upload_workers : int, default=2
+        Workers for the file upload step.
+
+    journal : zen.journal.Journal, default=None
+        If given, each completed step is recorded here.
+
+    states : dict, default=None
+        Replayed journal states, keyed by `zen.journal.paper_key`.
+
+    client : zen.api.ZenodoClient, default=None
+        Client to upload with; by default, a new one with a connection pool
+        large enough for all workers.
+
+    cache : zen.pdfcache.PdfCache, default=None
+        If given, PDFs are read from, or fetched into, this local store.
+
+    Returns
+    -------
+    updated_papers : list of zen.models.IsmirPaper
+        Updated ISMIR paper objects, in the order given.
+    """
+    states = states or dict()
+    owned = client is None
+    if owned:
+        client = zen.api.ZenodoClient(stage, pool_maxsize=3 * concurrency + upload_workers)
+
+    jobs = (UploadJob(paper, conferences, client, journal,
+                      states.get(zen.journal.paper_key(paper)), cache)
+            for paper in proceedings)
+    pipeline = zen.pipeline.Pipeline([
+        zen.pipeline.Stage('create', UploadJob.create, concurrency),
+        zen.pipeline.Stage('upload', UploadJob.upload, upload_workers),
+        zen.pipeline.Stage('metadata', UploadJob.metadata, concurrency),
+        zen.pipeline.Stage('publish', UploadJob.publish, concurrency)])
+
+    try:
+        return pipeline.run(jobs)
+    finally:
+        logger.info('pipeline finished in %.1fs\n%s', pipeline.elapsed, pipeline.report())
+        if owned:
+            client.close()
+
+
+def archive(proceedings, conferences, stage=zen.DEV, num_cpus=-2, verbose=0,
+            engine='joblib', concurrency=8, journal=None, resume=False,
+            upload_workers=2, cache=None, rate_limit=None):
+    """Upload a collection of papers to a Zenodo stage.
+
+    Parameters
+    ----------
+    proceedings : list of zen.models.IsmirPaper
+        ISMIR paper records.
+
+    conferences : dict of zen.models.IsmirConference
+        Conference metadata.
+
+    stage : str
+        One of [dev, prod]; defines the deployment area to use.
+
+    num_cpus : int, default=-2
+        Number of joblib workers; only used by the `joblib` engine.
+
+    verbose : int, default=0
+        Verbosity level for joblib.
+
+    engine : str, default='joblib'
+        One of ['joblib', 'async', 'pipeline'].
+
+    concurrency : int, default=8
+        Papers in flight at once with the `async` engine, or workers per
+        light step with the `pipeline` engine.
+
+    journal : zen.journal.Journal, default=None
+        If given, each completed step is recorded here.
+
+    resume : bool, default=False
+        If True, replay `journal` and continue each paper from its last
+        completed step.
+
+    upload_workers : int, default=2
+        Workers for file uploads; only used by the `pipeline` engine.
+
+    cache : zen.pdfcache.PdfCache, default=None
+        If given, PDFs are read from, or fetched into, this local store.
+
+    rate_limit : float, default=None
+        Maximum requests per second to Zenodo, over all workers. The
+        `joblib` engine splits it evenly between its worker processes.
+
+    Returns
+    -------
+    updated_papers : list of zen.models.IsmirPaper
+        Updated ISMIR paper objects, in the order given.
+
+    Raises
+    ------
+    ValueError
+        If `journal` is given and two papers have the same journal key.
+    """
+    if journal is not None:
+        # Fail before uploading anything if two papers would share a state.
+        zen.journal.paper_keys(proceedings)
+
+    if rate_limit is not None and engine != 'joblib':
+        zen.api.get_rate_controller(stage).set_rate(rate_limit)
+
+    states = journal.replay() if (journal is not None and resume) else dict()
+
+    if engine == 'async':
+        return asyncio.run(archive_async(proceedings, conferences, stage,
+                                         concurrency, journal, states, cache=cache))
+    elif engine == 'pipeline':
+        return archive_pipeline(proceedings, conferences, stage, concurrency,
+                                upload_workers, journal, states, cache=cache)
+    elif engine != 'joblib':
+        raise ValueError('engine must be one of {}, not {}'.format(ENGINES, engine))
+
+    # Every worker process has a rate controller of its own.
+    if rate_limit is not None:
+        rate_limit = rate_limit / min(zen.workers.num_workers(num_cpus),
+                                      max(1, len(proceedings)))
 
-def archive(proceedings, conferences, stage=zen.DEV, num_cpus=-2, verbose=0):
     pool = Parallel(n_jobs=num_cpus, verbose=verbose)
     fx = delayed(upload)
-    return pool(fx(paper, conferences, stage) for paper in proceedings)
+    return pool(fx(paper, conferences, stage, journal=journal,
+                   state=states.get(zen.journal.paper_key(paper)), cache=cache,
+                   rate_limit=rate_limit)
+                for paper in proceedings)
 
 
 if __name__ == '__main__':
-    import logging
     logging.basicConfig(level=logging.DEBUG)
     parser = argparse.ArgumentParser(description=__doc__)
 
@@ -116,6 +573,31 @@ if __name__ == '__main__':
     parser.add_argument("--max_items",
                         metavar="max_items", type=int, default=None,
                         help="Maximum number of items to upload.")
+    parser.add_argument("--engine",
+                        metavar="engine", type=str, default='joblib',
+                        choices=ENGINES,
+                        help="Execution engine, one of {}.".format(ENGINES))
+    parser.add_argument("--concurrency",
+                        metavar="concurrency", type=int, default=8,
+                        help="Papers in flight at once with the async engine, or "
+                             "workers per light step with the pipeline engine.")
+    parser.add_argument("--upload_workers",
+                        metavar="upload_workers", type=int, default=2,
+                        help="File upload workers with the pipeline engine.")
+    parser.add_argument("--rate_limit",
+                        metavar="rate_limit", type=float, default=None,
+                        help="Maximum requests per second to Zenodo, over all "
+                             "workers. Throttled (429) responses slow all workers "
+                             "down regardless.")
+    parser.add_argument("--resume",
+                        action='store_true',
+                        help="If given, continue from the journal of a previous run.")
+    parser.add_argument("--cache_dir",
+                        metavar="cache_dir", type=str, default=None,
+                        help="Local PDF store to read remote PDFs from, or fetch them into.")
+    parser.add_argument("--cache_max_mb",
+                        metavar="cache_max_mb", type=int, default=None,
+                        help="Size cap of the PDF store, in MB.")
     args = parser.parse_args()
     proceedings = json.load(open(args.proceedings)) # 'encoding' = 'utf-8' might need to be added based on the encoding
     conferences = json.load(open(args.conferences)) 
@@ -125,7 +607,21 @@ if __name__ == '__main__':
         random.shuffle(proceedings)
         proceedings = proceedings[:args.max_items]
 
-    results = archive(proceedings, conferences, args.stage, args.num_cpus, args.verbose)
+    journal = zen.journal.Journal.for_output(args.output_file)
+    if journal.exists() and not args.resume:
+        raise EnvironmentError('Journal {} exists from a previous run; pass --resume '
+                               'to continue it, or remove it.'.format(journal.path))
+
+    cache = None
+    if args.cache_dir is not None:
+        cache = zen.pdfcache.PdfCache(args.cache_dir, max_bytes=zen.pdfcache.megabytes(
+            args.cache_max_mb))
+
+    archive(proceedings, conferences, args.stage, args.num_cpus, args.verbose,
+            engine=args.engine, concurrency=args.concurrency, journal=journal,
+            resume=args.resume, upload_workers=args.upload_workers, cache=cache,
+            rate_limit=args.rate_limit)
+    results = journal.apply(proceedings)
 
     with open(args.output_file, 'w') as fp:
         json.dump(results, fp, indent=2)
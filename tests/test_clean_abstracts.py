@@ -0,0 +1,62 @@
+import pytest
+
+import json
+import os
+
+import clean_abstracts
+
+
+@pytest.fixture()
+def proceedings(tmpdir):
+    records = [dict(title='a', abstract='Signal pro-\ncessing  with ﬁlters. '),
+               dict(title='b', abstract='Already clean.'),
+               dict(title='c', Abstract='Capitalised\nfield'),
+               dict(title='d')]
+    filename = os.path.join(str(tmpdir), '2020.json')
+    with open(filename, 'w') as fp:
+        json.dump(records, fp, indent=2)
+    return filename
+
+
+def test_clean_records():
+    records = [dict(abstract='x  y'), dict(abstract='z')]
+    assert clean_abstracts.clean_records(records) == [(0, 'abstract', 'x  y', 'x y')]
+    assert records == [dict(abstract='x y'), dict(abstract='z')]
+
+
+def test_main_dry_run(proceedings, capsys):
+    with open(proceedings) as fp:
+        original = fp.read()
+
+    assert clean_abstracts.main([proceedings], dry_run=True) == 2
+    out = capsys.readouterr().out
+    assert '+[0].abstract: "Signal processing with filters."' in out
+    assert '-[2].Abstract: "Capitalised\\nfield"' in out
+    with open(proceedings) as fp:
+        assert fp.read() == original
+
+
+def test_main(proceedings):
+    assert clean_abstracts.main([proceedings]) == 2
+    with open(proceedings) as fp:
+        records = json.load(fp)
+    assert [r.get('abstract') or r.get('Abstract') for r in records] == [
+        'Signal processing with filters.', 'Already clean.', 'Capitalised field', None]
+
+    mtime = os.path.getmtime(proceedings)
+    assert clean_abstracts.main([proceedings]) == 0
+    assert os.path.getmtime(proceedings) == mtime
+
+
+def test_main_keeps_format(tmpdir):
+    # Four spaces, raw non-ASCII text and no final newline, as in 2025.json.
+    text = json.dumps([dict(title='Über', author=['Meinard Müller'], abstract='a\nb'),
+                       dict(title='x', abstract='c')], indent=4, ensure_ascii=False)
+    filename = os.path.join(str(tmpdir), '2025.json')
+    with open(filename, 'w', encoding='utf-8') as fp:
+        fp.write(text)
+
+    assert clean_abstracts.main([filename]) == 1
+    with open(filename, encoding='utf-8') as fp:
+        new_text = fp.read()
+    assert new_text == text.replace('"a\\nb"', '"a b"')
@@ -0,0 +1,169 @@
+import pytest
+
+import http.server
+import os
+import threading
+
+import download_proceedings
+import zen.pdfcache
+
+
+class PdfHandler(http.server.BaseHTTPRequestHandler):
+    '''Serves `server.content` with validators and range support.'''
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        etag = '"v{}"'.format(server.version)
+        content = server.content
+
+        if (self.headers.get('If-None-Match') == etag or
+                self.headers.get('If-Modified-Since') == server.modified):
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        start, status = 0, 200
+        byte_range = self.headers.get('Range')
+        if byte_range and self.headers.get('If-Range') == etag:
+            start = int(byte_range.split('=')[1].rstrip('-'))
+            status = 206
+
+        body = content[start:]
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', server.modified)
+        self.send_header('Content-Length', str(len(body)))
+        if status == 206:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(
+                start, len(content) - 1, len(content)))
+        self.end_headers()
+
+        if server.truncate_at is not None:
+            # Drop the connection part-way through the body, once.
+            body, server.truncate_at = body[:server.truncate_at], None
+            self.wfile.write(body)
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture()
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), PdfHandler)
+    httpd.content = b'%PDF-1.4 ' + os.urandom(200000)
+    httpd.version = 1
+    httpd.modified = 'Mon, 01 Oct 2018 12:00:00 GMT'
+    httpd.truncate_at = None
+    httpd.requests = []
+    httpd.url = 'http://{}:{}/paper.pdf'.format(*httpd.server_address)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def read(path):
+    with open(path, 'rb') as fp:
+        return fp.read()
+
+
+def test_download_pdf(server, tmpdir):
+    assert download_proceedings.download_pdf('paper', server.url, '2018', str(tmpdir))
+    fout = os.path.join(str(tmpdir), '2018', 'paper.pdf')
+    assert read(fout) == server.content
+    assert os.listdir(os.path.dirname(fout)) == ['paper.pdf']
+
+    # Finished files are skipped without a request.
+    assert download_proceedings.download_pdf('paper', server.url, '2018', str(tmpdir))
+    assert len(server.requests) == 1
+
+
+def test_download_pdf_resumes_partial(server, tmpdir):
+    server.truncate_at = 150000
+    assert not download_proceedings.download_pdf('paper', server.url, '2018', str(tmpdir))
+
+    fout = os.path.join(str(tmpdir), '2018', 'paper.pdf')
+    assert not os.path.exists(fout)
+    size = os.path.getsize(fout + '.part')
+    assert 0 < size <= 150000
+
+    assert download_proceedings.download_pdf('paper', server.url, '2018', str(tmpdir))
+    assert server.requests[-1]['Range'] == 'bytes={}-'.format(size)
+    assert read(fout) == server.content
+    # The validators of the partial file go with it.
+    assert os.listdir(os.path.dirname(fout)) == ['paper.pdf']
+
+
+def test_download_pdf_restarts_changed_partial(server, tmpdir):
+    server.truncate_at = 150000
+    download_proceedings.download_pdf('paper', server.url, '2018', str(tmpdir))
+
+    server.content, server.version = b'%PDF-1.5 ' + os.urandom(1000), 2
+    assert download_proceedings.download_pdf('paper', server.url, '2018', str(tmpdir))
+    fout = os.path.join(str(tmpdir), '2018', 'paper.pdf')
+    assert read(fout) == server.content
+
+
+def test_download_pdf_refresh(server, tmpdir):
+    fout = os.path.join(str(tmpdir), '2018', 'paper.pdf')
+    download_proceedings.download_pdf('paper', server.url, '2018', str(tmpdir))
+
+    assert download_proceedings.download_pdf('paper', server.url, '2018', str(tmpdir),
+                                             refresh=True)
+    assert server.requests[-1]['If-Modified-Since'] == server.modified
+    assert read(fout) == server.content
+
+    server.content, server.version = b'%PDF-1.5 new', 2
+    server.modified = 'Tue, 02 Oct 2018 12:00:00 GMT'
+    assert download_proceedings.download_pdf('paper', server.url, '2018', str(tmpdir),
+                                             refresh=True)
+    assert read(fout) == server.content
+
+
+def test_download_pdf_http_error(server, tmpdir):
+    url = server.url.replace('paper.pdf', 'missing.pdf')
+    fout = os.path.join(str(tmpdir), '2018', 'paper.pdf')
+
+    session = download_proceedings.make_session(max_retries=0)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(PdfHandler, 'do_GET', lambda self: self.send_error(404))
+        assert not download_proceedings.download_pdf('paper', url, '2018', str(tmpdir),
+                                                     session=session)
+    assert not os.path.exists(fout)
+
+
+def test_host_limiter():
+    limiter = download_proceedings.HostLimiter(2)
+    assert limiter('http://a.org/1.pdf') is limiter('http://a.org/2.pdf')
+    assert limiter('http://a.org/1.pdf') is not limiter('http://b.org/1.pdf')
+
+
+def test_main(server, tmpdir):
+    records = [dict(dblp_key='conf/ismir/Paper{}'.format(n), year=2018, ee=server.url)
+               for n in range(6)]
+    assert download_proceedings.main(records, str(tmpdir), num_workers=4, per_host=2)
+    for n in range(6):
+        fout = os.path.join(str(tmpdir), '2018', 'Paper{}.pdf'.format(n))
+        assert read(fout) == server.content
+
+
+def test_download_pdf_cache(server, tmpdir):
+    cache = zen.pdfcache.PdfCache(os.path.join(str(tmpdir), 'cache'))
+    key = 'conf/ismir/Paper18'
+    assert download_proceedings.download_pdf('paper', server.url, '2018',
+                                             os.path.join(str(tmpdir), 'a'),
+                                             cache=cache, key=key)
+    assert read(cache.lookup('dblp:' + key)) == server.content
+
+    # A second mirror is filled from the cache.
+    assert download_proceedings.download_pdf('paper', server.url, '2018',
+                                             os.path.join(str(tmpdir), 'b'),
+                                             cache=cache, key=key)
+    assert read(os.path.join(str(tmpdir), 'b', '2018', 'paper.pdf')) == server.content
+    assert len(server.requests) == 1
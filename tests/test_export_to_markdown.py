@@ -0,0 +1,90 @@
+import pytest
+
+import json
+import os
+
+import export_to_markdown
+import zen.corpus
+
+
+META = dict(partof_title='Proceedings', doi='10.5281/zenodo.1', conference_place='Here',
+            conference_dates='Today', imprint_isbn='123')
+
+
+@pytest.fixture()
+def database(tmpdir):
+    root = str(tmpdir.mkdir('database'))
+    os.makedirs(os.path.join(root, 'proceedings'))
+    with open(os.path.join(root, 'conferences.json'), 'w') as fp:
+        json.dump({'2019': META, '2020': dict(META, conference_place='There')}, fp)
+    for year in ('2019', '2020'):
+        write_year(root, year, [dict(title='Second', author=['B'], pages='9-12'),
+                                dict(title='First', author='Single Author', pages='1-8')])
+    return root
+
+
+def write_year(root, year, records):
+    with open(os.path.join(root, 'proceedings', year + '.json'), 'w') as fp:
+        json.dump([dict(record, year=year, url='u', ee='e') for record in records], fp)
+
+
+def test_render(database):
+    with open(os.path.join(database, 'proceedings', '2019.json')) as fp:
+        records = json.load(fp)
+    with open(os.path.join(database, 'conferences.json')) as fp:
+        conferences = json.load(fp)
+    text = export_to_markdown.render(records, conferences, page_sort=True, cache_dir=None)
+    assert 'title: ISMIR 2019' in text
+    assert text.index('[First]') < text.index('[Second]')
+
+
+def test_render_all(database, tmpdir):
+    output_dir = os.path.join(str(tmpdir), 'md')
+    cache_dir = os.path.join(str(tmpdir), 'jinja')
+    rendered, failed = export_to_markdown.render_all(
+        database, output_dir, page_sort=True, cache_dir=cache_dir)
+    assert rendered == ['2019', '2020'] and failed == {}
+    assert os.listdir(cache_dir)
+
+    with open(os.path.join(output_dir, 'ismir2020.md')) as fp:
+        text = fp.read()
+    # Authors are always a list, so a single name is not split into letters.
+    assert '|Single Author<br>**[First](u)** 1-8' in text
+    assert 'There' in text
+
+    assert export_to_markdown.render_all(database, output_dir, cache_dir=cache_dir) == (
+        ['2019', '2020'], {})
+    assert export_to_markdown.render_all(database, output_dir, cache_dir=cache_dir) == ([], {})
+
+    # Only the year whose inputs changed is rendered again.
+    write_year(database, '2019', [dict(title='Fixed', author=['B'], pages='1-2')])
+    assert export_to_markdown.render_all(database, output_dir, cache_dir=cache_dir) == (
+        ['2019'], {})
+    os.remove(os.path.join(output_dir, 'ismir2020.md'))
+    assert export_to_markdown.render_all(database, output_dir, cache_dir=cache_dir) == (
+        ['2020'], {})
+
+
+def test_render_all_failed(database, tmpdir):
+    with open(os.path.join(database, 'conferences.json'), 'w') as fp:
+        json.dump({'2019': META, '2020': dict(META, doi=5)}, fp)
+    output_dir = os.path.join(str(tmpdir), 'md')
+    rendered, failed = export_to_markdown.render_all(database, output_dir, cache_dir=None)
+    assert rendered == ['2019'] and list(failed) == ['2020']
+    assert export_to_markdown.render_all(database, output_dir, cache_dir=None)[1] == failed
+
+
+def test_render_all_database(tmpdir):
+    # Early years have no DOI, nor always an ISBN, and still get a page.
+    output_dir = os.path.join(str(tmpdir), 'md')
+    rendered, failed = export_to_markdown.render_all(
+        zen.corpus.DATABASE_DIR, output_dir, page_sort=True, cache_dir=None)
+    assert failed == {}
+    assert rendered == zen.corpus.Corpus(zen.corpus.DATABASE_DIR).years
+
+    with open(os.path.join(output_dir, 'ismir2000.md')) as fp:
+        text = fp.read()
+    assert '**Proceedings of the 1st International Symposium on Music Information Retrieval**,' in text
+    assert 'ISBN' not in text
+    # Papers without page numbers do not show a None.
+    assert 'None' not in text
@@ -6,17 +6,72 @@ import shutil
 import extract_pdf_abstract
 
 
+def make_pdf(lines):
+    """Single-page PDF drawing (x, y, text) lines in Helvetica."""
+    ops = ''.join('BT /F1 10 Tf {} {} Td ({}) Tj ET\n'.format(x, y, text)
+                  for x, y, text in lines)
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+        '/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>',
+        '<< /Length {} >>\nstream\n{}endstream'.format(len(ops), ops),
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+
+    pdf, offsets = '%PDF-1.4\n', []
+    for num, obj in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += '{} 0 obj\n{}\nendobj\n'.format(num, obj)
+    xref = len(pdf)
+    pdf += 'xref\n0 {}\n0000000000 65535 f \n'.format(len(objects) + 1)
+    pdf += ''.join('{:010d} 00000 n \n'.format(offset) for offset in offsets)
+    pdf += 'trailer\n<< /Size {} /Root 1 0 R >>\nstartxref\n{}\n%%EOF\n'.format(
+        len(objects) + 1, xref)
+    return pdf.encode('latin-1')
+
+
+@pytest.fixture()
+def paper_pdf():
+    return make_pdf([
+        (200, 740, 'A PAPER ON MUSIC'), (220, 720, 'Some Author'),
+        (60, 680, 'ABSTRACT'),
+        (60, 665, 'We study music with signal pro-'),
+        (60, 653, 'cessing and find things.'),
+        (60, 620, '1. INTRODUCTION'),
+        (60, 605, 'Music is everywhere.'),
+        (320, 680, 'Right column text about results.'),
+        (320, 600, 'More results.')])
+
+
 def test_extract_pdf_abstract_extract_first_page(pdf_file, tmpdir):
     tmp_file = extract_pdf_abstract.extract_first_page(pdf_file)
     assert os.path.exists(tmp_file)
     shutil.copy(tmp_file, str(tmpdir))
 
+    # Same file names from different years must not collide.
+    other = extract_pdf_abstract.extract_first_page(pdf_file)
+    assert other != tmp_file
+    os.unlink(tmp_file)
+    os.unlink(other)
+
 
 def test_extract_pdf_abstract_extract_text(pdf_file, tmpdir):
     all_text = extract_pdf_abstract.extract_text(pdf_file)
     assert len(all_text) > 1000
 
 
+def test_extract_pdf_abstract_extract_text_maxpages(pdf_file):
+    with open(pdf_file, 'rb') as fp:
+        data = fp.read()
+
+    first_page = extract_pdf_abstract.extract_text(data, maxpages=1)
+    assert 'ABSTRACT' in first_page and '1. INTRODUCTION' in first_page
+    assert len(first_page) < len(extract_pdf_abstract.extract_text(pdf_file))
+
+    with open(pdf_file, 'rb') as fp:
+        assert extract_pdf_abstract.extract_text(fp, maxpages=1) == first_page
+
+
 def test_extract_pdf_abstract_extract_abstract():
     raw_text = 'foo barr ABSTRACT here\nis the abst-\nract 1. INTRODUCTION and the rest'
     abstract = extract_pdf_abstract.extract_abstract(raw_text)
@@ -24,13 +79,105 @@ def test_extract_pdf_abstract_extract_abstract():
     assert extract_pdf_abstract.extract_abstract('there is no abstract') == ''
 
 
-def test_extract_pdf_abstract_extract_extract():
-    pass
+def test_extract_pdf_abstract_extract_abstract_early(paper_pdf):
+    oracle = extract_pdf_abstract.extract_abstract(extract_pdf_abstract.extract_text(paper_pdf))
+    assert oracle == 'We study music with signal processing and find things.'
+    assert extract_pdf_abstract.extract_abstract_early(paper_pdf) == oracle
 
 
-def test_extract_pdf_abstract_main():
-    pass
+def test_extract_pdf_abstract_extract_abstract_early_sample(pdf_file):
+    oracle = extract_pdf_abstract.extract_abstract(
+        extract_pdf_abstract.extract_text(pdf_file, maxpages=1))
+    abstract = ('The abstract should be placed at the top left column and should '
+                'contain about 150-200 words.')
+    # The full-page layout slots a right-column heading ('4. TYPESET TEXT')
+    # in before the abstract; the early path only lays out its column.
+    assert oracle.endswith(abstract)
+    assert extract_pdf_abstract.extract_abstract_tiered(pdf_file) == (abstract, 'fast')
+
+
+def test_extract_pdf_abstract_extract_abstract_early_no_intro():
+    pdf = make_pdf([(60, 680, 'ABSTRACT'), (60, 665, 'No introduction follows.')])
+    assert extract_pdf_abstract.extract_abstract_early(pdf) == ''
+    assert extract_pdf_abstract.extract_abstract(extract_pdf_abstract.extract_text(pdf)) == ''
+
+
+def test_extract_pdf_abstract_extract_extract(pdf_file):
+    out = extract_pdf_abstract.extract('conf/ismir/Sample17', pdf_file)
+    assert out['@key'] == 'conf/ismir/Sample17'
+    assert out['abstract'].endswith('should contain about 150-200 words.')
+
+
+def test_extract_pdf_abstract_extract_abstract_tiered(paper_pdf):
+    pdf = make_pdf([(60, 680, 'ABSTRACT'), (60, 665, 'No introduction follows.')])
+    assert extract_pdf_abstract.extract_abstract_tiered(paper_pdf)[1] == 'fast'
+    assert extract_pdf_abstract.extract_abstract_tiered(pdf) == ('', 'full')
+
+    # A right-column heading drawn before the introduction heading, level
+    # with the abstract heading, as in sample.pdf: the full layout slots it
+    # in, the fast tier leaves it out.
+    pdf = make_pdf([(144, 660, 'ABSTRACT'), (382, 660, '4. TYPESET TEXT'),
+                    (55, 630, 'Text of the abstract, on a long line.'),
+                    (55, 618, 'More of the abstract.'), (125, 585, '1. INTRODUCTION')])
+    assert extract_pdf_abstract.extract_abstract(extract_pdf_abstract.extract_text(pdf)) == (
+        '4. TYPESET TEXT Text of the abstract, on a long line. More of the abstract.')
+    assert extract_pdf_abstract.extract_abstract_tiered(pdf) == (
+        'Text of the abstract, on a long line. More of the abstract.', 'fast')
+
+
+def test_extract_pdf_abstract_main(pdf_file, paper_pdf, tmpdir):
+    shutil.copy(pdf_file, os.path.join(str(tmpdir), 'Sample17.pdf'))
+    with open(os.path.join(str(tmpdir), 'Paper17.pdf'), 'wb') as fp:
+        fp.write(paper_pdf)
+    records = [dict(dblp_key='conf/ismir/Sample17', abstract=''),
+               dict(dblp_key='conf/ismir/Paper17', abstract=''),
+               dict(dblp_key='conf/ismir/Missing17', abstract='kept')]
+
+    records, tiers = extract_pdf_abstract.main(records, str(tmpdir), num_cpus=2)
+    assert records[0]['abstract'].endswith('150-200 words.')
+    assert records[1]['abstract'] == 'We study music with signal processing and find things.'
+    assert records[2]['abstract'] == 'kept'
+    assert tiers == {'conf/ismir/Sample17': 'fast', 'conf/ismir/Paper17': 'fast',
+                     'conf/ismir/Missing17': 'error'}
 
 
 def test_extract_pdf_abstract_cli():
     pass
+
+
+def test_extract_pdf_abstract_main_abstract_cache(paper_pdf, tmpdir, monkeypatch):
+    pdf_dir = os.path.join(str(tmpdir), 'pdfs')
+    os.makedirs(pdf_dir)
+    for name in ('One17', 'Two17'):
+        with open(os.path.join(pdf_dir, name + '.pdf'), 'wb') as fp:
+            fp.write(paper_pdf)
+
+    processed = []
+    imap_isolated = extract_pdf_abstract.zen.workers.imap_isolated
+
+    def spy(func, items, **kwargs):
+        processed.append(sorted(item[0] for item in items))
+        return imap_isolated(func, items, **kwargs)
+
+    monkeypatch.setattr(extract_pdf_abstract.zen.workers, 'imap_isolated', spy)
+    abstracts = extract_pdf_abstract.AbstractCache(os.path.join(str(tmpdir), 'abstracts.sqlite'))
+
+    def run(**kwargs):
+        records = [dict(dblp_key='conf/ismir/One17'), dict(dblp_key='conf/ismir/Two17')]
+        records, tiers = extract_pdf_abstract.main(records, pdf_dir, num_cpus=1,
+                                                   abstracts=abstracts, **kwargs)
+        assert all(r['abstract'].startswith('We study music') for r in records)
+        return processed[-1]
+
+    assert run() == ['conf/ismir/One17', 'conf/ismir/Two17']
+    assert run() == []
+    assert run(force=True) == ['conf/ismir/One17', 'conf/ismir/Two17']
+
+    # A changed PDF is processed again, and so is everything for other settings.
+    with open(os.path.join(pdf_dir, 'Two17.pdf'), 'ab') as fp:
+        fp.write(b'\n% appended\n')
+    assert run() == ['conf/ismir/Two17']
+    assert run(max_pages=2) == ['conf/ismir/One17', 'conf/ismir/Two17']
+
+    monkeypatch.setattr(extract_pdf_abstract, 'EXTRACTOR_VERSION', -1)
+    assert run() == ['conf/ismir/One17', 'conf/ismir/Two17']
@@ -0,0 +1,66 @@
+import pytest
+
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import generate_dblp
+
+
+META = dict(partof_title='Proceedings of ISMIR', imprint_isbn='123', doi='10.5281/zenodo.1',
+            conference_acronym='ISMIR', conference_place='Here', editors=['E. Ditor'])
+
+
+@pytest.fixture()
+def database(tmpdir):
+    root = str(tmpdir.mkdir('database'))
+    os.makedirs(os.path.join(root, 'proceedings'))
+    with open(os.path.join(root, 'conferences.json'), 'w') as fp:
+        json.dump({'2004': META, '2005': META}, fp)
+    for year in ('2004', '2005'):
+        records = [dict(title='Beat & Tatum <Tracking>', author='Single Author', year=year),
+                   dict(title='Chords', author=['A', 'B'], pages='1-8', year=year)]
+        with open(os.path.join(root, 'proceedings', year + '.json'), 'w') as fp:
+            json.dump(records, fp)
+    return root
+
+
+def test_generate(database, tmpdir):
+    output_dir = os.path.join(str(tmpdir), 'dblp')
+    outputs = generate_dblp.generate(generate_dblp.year_range('2004-2005'), database,
+                                     output_dir)
+    assert sorted(outputs) == ['2004', '2005']
+    assert sorted(os.listdir(output_dir)) == ['dblp2004.xml', 'dblp2005.xml']
+
+    root = ET.parse(outputs['2005']).getroot()
+    publs = root.findall('proceedings/toc/publ')
+    assert [publ.find('title').text for publ in publs] == ['Beat & Tatum <Tracking>', 'Chords']
+    assert [author.text for author in publs[0].findall('author')] == ['Single Author']
+    assert publs[0].find('pages').text is None
+    assert root.find('proceedings/editor').text == 'E. Ditor'
+
+
+def test_write_submission_invalid(tmpdir):
+    output_file = os.path.join(str(tmpdir), 'dblp.xml')
+    with pytest.raises(ValueError, match='missing <author>'):
+        generate_dblp.write_submission(META, 2004, [dict(title='No authors')], output_file)
+    with pytest.raises(ValueError, match='missing <publ>'):
+        generate_dblp.write_submission(META, 2004, [], output_file)
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_validator_drops_papers():
+    validator = generate_dblp.SubmissionValidator()
+    validator.feed('<dblpsubmission><proceedings><key>k</key><title>t</title>'
+                   '<publisher>p</publisher><year>y</year><toc>')
+    for n in range(100):
+        validator.feed('<publ><author>a</author><title>{}</title></publ>'.format(n))
+    assert len(validator.stack[-1]) == 1
+    validator.feed('</toc></proceedings></dblpsubmission>')
+    validator.close()
+    assert validator.num_papers == 100
+
+
+def test_year_range():
+    assert generate_dblp.year_range('2019') == [2019]
+    assert generate_dblp.year_range('2018-2020') == [2018, 2019, 2020]
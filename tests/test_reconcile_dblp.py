@@ -0,0 +1,52 @@
+import pytest
+
+import json
+import os
+
+import reconcile_dblp
+
+
+def test_main_write(tmpdir):
+    root = str(tmpdir.mkdir('database'))
+    os.makedirs(os.path.join(root, 'proceedings'))
+    filename = os.path.join(root, 'proceedings', '2000.json')
+    with open(filename, 'w') as fp:
+        fp.write(json.dumps([dict(title='Chord Recognition', author=['A. One'], year='2000',
+                                  dblp_key=None),
+                             dict(title='Unrelated', author=['B. Two'], year='2000')],
+                            indent=2) + '\n')
+    harvested = os.path.join(str(tmpdir), 'dblp.json')
+    with open(harvested, 'w') as fp:
+        json.dump({'conf/ismir/One00': {'@key': 'conf/ismir/One00', 'author': 'A. One',
+                                        'title': 'Chord recognition.', 'year': '2000',
+                                        'pages': '1-8'}}, fp)
+
+    report = reconcile_dblp.main(root, [harvested])
+    assert report['2000']['keys'] == {'Chord Recognition': 'conf/ismir/One00'}
+    assert report['2000']['unmatched'] == ['Unrelated']
+    with open(filename) as fp:
+        assert json.load(fp)[0]['dblp_key'] is None
+
+    reconcile_dblp.main(root, [harvested], write=True)
+    with open(filename) as fp:
+        text = fp.read()
+    records = json.loads(text)
+    assert records[0]['dblp_key'] == 'conf/ismir/One00' and 'dblp_key' not in records[1]
+    assert text.endswith(']\n')
+
+
+def test_write_keys(tmpdir):
+    # Four spaces and raw non-ASCII text, as in 2025.json.
+    text = json.dumps([dict(title='Über', author=['Meinard Müller'], dblp_key=''),
+                       dict(title='Two', author=['B. Two'], dblp_key='')],
+                      indent=4, ensure_ascii=False)
+    filename = os.path.join(str(tmpdir), '2025.json')
+    with open(filename, 'w', encoding='utf-8') as fp:
+        fp.write(text)
+
+    reconcile_dblp.write_keys(filename, {1: 'conf/ismir/Two25'})
+    with open(filename, encoding='utf-8') as fp:
+        lines = fp.read().split('\n')
+    changed = [(a, b) for a, b in zip(text.split('\n'), lines) if a != b]
+    assert len(lines) == len(text.split('\n'))
+    assert changed == [('        "dblp_key": ""', '        "dblp_key": "conf/ismir/Two25"')]
@@ -1,10 +1,17 @@
 import pytest
 
+import asyncio
+import hashlib
 import json
 import os
+import threading
+import time
 
 import upload_to_zenodo
 import zen
+import zen.pdfcache
+import zen.testing
+import zen.workers
 
 
 OFFLINE = not zen.api._is_online()
@@ -57,3 +64,302 @@ def test_upload_to_zenodo_main(proceedings_file, conferences_file, scripts_dir,
     output_file = os.path.join(str(tmpdir), 'test_output.json')
 
     os.system('{} {} {} --stage dev'.format(script, proceedings_file, conferences_file, output_file))
+
+
+def test_upload_to_zenodo_archive_async(monkeypatch):
+    state = dict(active=0, peak=0)
+    lock = threading.Lock()
+
+    def fake_upload(paper, conferences, stage, client, **kwargs):
+        with lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+        time.sleep(0.01)
+        with lock:
+            state['active'] -= 1
+        return dict(paper, zenodo_id=paper['n'])
+
+    monkeypatch.setattr(upload_to_zenodo, 'upload', fake_upload)
+    proceedings = [dict(n=n, title=str(n)) for n in range(20)]
+    results = upload_to_zenodo.archive(proceedings, {}, stage=zen.DEV,
+                                       engine='async', concurrency=3)
+    assert [r['zenodo_id'] for r in results] == list(range(20))
+    assert 1 < state['peak'] <= 3
+
+
+def test_upload_to_zenodo_archive_async_closes_client_last(monkeypatch):
+    events = []
+
+    class Client(object):
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def close(self):
+            events.append('close')
+
+    def fake_upload(paper, conferences, stage, client, **kwargs):
+        if paper['n'] == 0:
+            raise zen.api.ZenodoApiError('failed')
+        time.sleep(0.05)
+        events.append(paper['n'])
+        return paper
+
+    monkeypatch.setattr(zen.api, 'ZenodoClient', Client)
+    monkeypatch.setattr(upload_to_zenodo, 'upload', fake_upload)
+    with pytest.raises(zen.api.ZenodoApiError):
+        asyncio.run(upload_to_zenodo.archive_async(
+            [dict(n=n, title=str(n)) for n in range(3)], {}, concurrency=3))
+    # Uploads still running after the failure finish with an open client.
+    assert sorted(events[:-1]) == [1, 2] and events[-1] == 'close'
+
+
+def test_upload_to_zenodo_archive_rate_limit(monkeypatch):
+    calls = []
+
+    def fake_upload(paper, conferences, stage, **kwargs):
+        calls.append(kwargs['rate_limit'])
+        return paper
+
+    monkeypatch.setattr(upload_to_zenodo, 'upload', fake_upload)
+    proceedings = [dict(title='Paper {}'.format(n)) for n in range(4)]
+    upload_to_zenodo.archive(proceedings, {}, num_cpus=1, rate_limit=10)
+    assert calls == [10] * 4
+
+    # Worker processes split the limit between them.
+    monkeypatch.setattr(zen.workers, 'num_workers', lambda n_jobs: 4)
+    monkeypatch.setattr(upload_to_zenodo, 'Parallel', lambda **kwargs: lambda jobs: [
+        fx(*args, **kwargs) for fx, args, kwargs in jobs])
+    upload_to_zenodo.archive(proceedings, {}, num_cpus=-2, rate_limit=10)
+    assert calls[4:] == [2.5] * 4
+
+
+def test_upload_to_zenodo_upload_sets_rate_limit(monkeypatch):
+    client = zen.api.ZenodoClient(stage=zen.DEV, token='secret',
+                                  rate_controller=zen.api.RateController())
+
+    class Job(object):
+        def __init__(self, *args):
+            pass
+
+        def create(self):
+            return self
+
+        upload = metadata = create
+
+        def publish(self):
+            return 'done'
+
+    monkeypatch.setattr(upload_to_zenodo, 'UploadJob', Job)
+    assert upload_to_zenodo.upload(dict(), {}, client=client, rate_limit=5) == 'done'
+    assert client.rate_controller.max_rate == 5
+    assert client.rate_controller.bucket.rate == 5
+
+
+def test_upload_to_zenodo_archive_bad_engine():
+    with pytest.raises(ValueError):
+        upload_to_zenodo.archive([], {}, engine='spark')
+
+
+class FakeClient(object):
+    '''Stand-in for zen.api.ZenodoClient recording the calls it receives.'''
+
+    def __init__(self, fail_on=None, deposition=None):
+        self.calls = []
+        self.fail_on = fail_on
+        self.deposition = deposition
+        self.metadata = None
+
+    def _call(self, name, *args):
+        self.calls.append(name)
+        if name == self.fail_on:
+            raise zen.api.ZenodoApiError('{} failed'.format(name))
+
+    def create_id(self):
+        self._call('create_id')
+        return 1234
+
+    def upload_file(self, zid, filepath):
+        self._call('upload_file', zid, filepath)
+        return dict(checksum='md5:abc')
+
+    def update_metadata(self, zid, metadata):
+        self._call('update_metadata', zid, metadata)
+        self.metadata = metadata
+        return dict(metadata=metadata)
+
+    def get(self, zid):
+        self._call('get', zid)
+        return self.deposition
+
+    def edit(self, zid):
+        self._call('edit', zid)
+        return self.deposition
+
+    def publish(self, zid):
+        self._call('publish', zid)
+        return dict(doi='10.5072/zenodo.{}'.format(zid),
+                    doi_url='https://doi.org/10.5072/zenodo.{}'.format(zid))
+
+
+def test_upload_to_zenodo_upload_resume(proceedings, conferences_file, tmpdir):
+    conferences = json.load(open(conferences_file, 'r'))
+    journal = zen.journal.Journal(os.path.join(str(tmpdir), 'out.journal.jsonl'))
+
+    client = FakeClient(fail_on='update_metadata')
+    with pytest.raises(zen.api.ZenodoApiError):
+        upload_to_zenodo.upload(proceedings[0], conferences, client=client,
+                                journal=journal)
+    state = journal.replay()[zen.journal.paper_key(proceedings[0])]
+    assert state['step'] == 'uploaded'
+    assert journal.apply(proceedings) == []
+
+    client = FakeClient()
+    results = asyncio.run(upload_to_zenodo.archive_async(
+        proceedings, conferences, journal=journal, states=journal.replay(),
+        client=client))
+    assert len(results) == 1
+    assert client.calls == ['update_metadata', 'publish']
+    results = journal.apply(proceedings)
+    assert results[0]['zenodo_id'] == 1234
+    assert results[0]['doi'] == '10.5072/zenodo.1234'
+    assert results[0]['ee'] == 'https://zenodo.org/record/1234/files/sample.pdf'
+
+
+@pytest.fixture()
+def published(proceedings, conferences_file, pdf_file):
+    conferences = json.load(open(conferences_file, 'r'))
+    client = FakeClient()
+    paper = upload_to_zenodo.upload(proceedings[0], conferences, client=client)
+
+    with open(pdf_file, 'rb') as fp:
+        checksum = hashlib.md5(fp.read()).hexdigest()
+    deposition = dict(
+        id=1234, state='done', submitted=True, doi=paper['doi'], doi_url=paper['url'],
+        metadata=dict(client.metadata, prereserve_doi=dict(doi=paper['doi'])),
+        files=[dict(filename='sample.pdf', checksum=checksum)])
+    return dict(proceedings[0], zenodo_id=1234), conferences, deposition
+
+
+def test_upload_to_zenodo_upload_unchanged(published):
+    paper, conferences, deposition = published
+    client = FakeClient(deposition=deposition)
+    result = upload_to_zenodo.upload(paper, conferences, client=client)
+    assert client.calls == ['get']
+    assert result['doi'] == deposition['doi']
+
+
+def test_upload_to_zenodo_upload_metadata_changed(published):
+    paper, conferences, deposition = published
+    client = FakeClient(deposition=deposition)
+    paper['title'] = 'A better title'
+    upload_to_zenodo.upload(paper, conferences, client=client)
+    assert client.calls == ['get', 'edit', 'update_metadata', 'publish']
+
+
+def test_upload_to_zenodo_upload_file_changed(published):
+    paper, conferences, deposition = published
+    deposition.update(state='unsubmitted', submitted=False)
+    deposition['files'][0]['checksum'] = 'abc'
+    client = FakeClient(deposition=deposition)
+    upload_to_zenodo.upload(paper, conferences, client=client)
+    assert client.calls == ['get', 'upload_file', 'publish']
+
+
+def test_upload_to_zenodo_upload_published_file_changed(published, caplog):
+    paper, conferences, deposition = published
+    deposition['files'][0]['checksum'] = 'abc'
+    client = FakeClient(deposition=deposition)
+    result = upload_to_zenodo.upload(paper, conferences, client=client)
+    assert client.calls == ['get']
+    assert result['doi'] == deposition['doi']
+    assert 'cannot be replaced' in caplog.text
+
+
+def test_upload_to_zenodo_update_fake(proceedings, conferences_file, tmpdir, monkeypatch):
+    conferences = json.load(open(conferences_file, 'r'))
+    with zen.testing.FakeZenodo() as fake:
+        monkeypatch.setitem(zen.api.HOSTS, zen.DEV, fake.host)
+        monkeypatch.setitem(zen.api.TOKENS, zen.DEV, fake.token)
+        paper = upload_to_zenodo.upload(proceedings[0], conferences)
+        files = list(fake.depositions[paper['zenodo_id']]['files'])
+
+        changed = os.path.join(str(tmpdir), 'sample.pdf')
+        with open(changed, 'wb') as fp:
+            fp.write(b'%PDF-1.4 changed')
+        result = upload_to_zenodo.upload(dict(paper, ee=changed, title='A better title'),
+                                         conferences)
+
+    deposition = fake.depositions[paper['zenodo_id']]
+    assert deposition['metadata']['title'] == 'A better title'
+    assert deposition['files'] == files
+    assert result['doi'] == paper['doi']
+    assert fake.stats[403] == 0
+
+
+def test_upload_to_zenodo_file_changed(pdf_file):
+    bucket = 'https://zenodo.org/api/files/eaecfb4b'
+    deposition = dict(id=1234, links=dict(bucket=bucket),
+                      files=[dict(filename='sample.pdf', checksum='md5:abc')])
+    assert upload_to_zenodo._file_changed(deposition, 'other.pdf')
+    assert upload_to_zenodo._file_changed(deposition, pdf_file)
+
+    # Copies held by the deposition, and other URLs, are never downloaded.
+    assert not upload_to_zenodo._file_changed(deposition, bucket + '/sample.pdf')
+    assert not upload_to_zenodo._file_changed(
+        deposition, 'https://zenodo.org/record/1234/files/sample.pdf')
+    assert not upload_to_zenodo._file_changed(
+        deposition, 'http://archives.invalid/sample.pdf')
+    assert upload_to_zenodo._file_changed(
+        deposition, 'http://archives.invalid/sample.pdf', resolve=lambda: pdf_file)
+
+
+def test_upload_to_zenodo_metadata_changed():
+    local = dict(title='a', creators=[dict(name='x')])
+    remote = dict(title='a', creators=[dict(name='x', affiliation=None)], doi='1')
+    assert not upload_to_zenodo._metadata_changed(local, remote)
+    assert upload_to_zenodo._metadata_changed(dict(local, title='b'), remote)
+    assert upload_to_zenodo._metadata_changed(
+        dict(local, creators=[dict(name='x'), dict(name='y')]), remote)
+    assert upload_to_zenodo._metadata_changed(local, None)
+
+    # Values as Zenodo echoes them back.
+    local = dict(title='A  title\n', license='CC-BY-4.0', partof_pages=12, doi='')
+    remote = dict(title='A title', license=dict(id='cc-by-4.0'), partof_pages='12')
+    assert not upload_to_zenodo._metadata_changed(local, remote)
+    assert upload_to_zenodo._metadata_changed(dict(local, title='a title'), remote)
+
+
+@pytest.mark.parametrize('engine', ['async', 'pipeline'])
+def test_upload_to_zenodo_archive_fake(proceedings, conferences_file, monkeypatch, engine):
+    conferences = json.load(open(conferences_file, 'r'))
+    with zen.testing.FakeZenodo() as fake:
+        monkeypatch.setitem(zen.api.HOSTS, zen.DEV, fake.host)
+        monkeypatch.setitem(zen.api.TOKENS, zen.DEV, fake.token)
+        papers = [dict(proceedings[0], dblp_key='conf/ismir/Sample{}'.format(n))
+                  for n in range(5)]
+        results = upload_to_zenodo.archive(papers, conferences, engine=engine,
+                                           concurrency=2, upload_workers=1)
+
+    assert [r['zenodo_id'] for r in sorted(results, key=lambda r: r['zenodo_id'])] == [1, 2, 3, 4, 5]
+    assert all(r['doi'].startswith('10.5072/zenodo.') for r in results)
+    assert fake.stats['publish'] == 5
+
+
+def test_upload_to_zenodo_archive_cache(proceedings, conferences_file, pdf_file,
+                                        monkeypatch, tmpdir):
+    conferences = json.load(open(conferences_file, 'r'))
+    url = 'http://archives.invalid/2018/sample.pdf'
+    cache = zen.pdfcache.PdfCache(str(tmpdir))
+    cached = cache.add(pdf_file, 'url:{}'.format(url))
+
+    with zen.testing.FakeZenodo() as fake:
+        monkeypatch.setitem(zen.api.HOSTS, zen.DEV, fake.host)
+        monkeypatch.setitem(zen.api.TOKENS, zen.DEV, fake.token)
+        paper = dict(proceedings[0], ee=url)
+        result, = upload_to_zenodo.archive([paper], conferences, engine='async',
+                                           cache=cache)
+
+    files = fake.depositions[result['zenodo_id']]['files']
+    assert [f['filename'] for f in files] == ['sample.pdf']
+    assert files[0]['checksum'] == zen.api.md5sum(pdf_file)
+    assert cache.lookup('zenodo:{}'.format(result['zenodo_id'])) == cached
@@ -1,6 +1,13 @@
 import pytest
 
+import hashlib
+import io
+import json
 import os
+import requests
+import threading
+import time
+import urllib3.exceptions
 
 import zen.api
 
@@ -67,3 +74,306 @@ def test_zen_api_get(dummy_metadata):
 def test_zen_api_list_items():
     results = zen.api.list_items(stage=zen.api.DEV)
     assert len(results) > 0
+
+
+class CannedAdapter(requests.adapters.BaseAdapter):
+    '''Transport adapter replaying a fixed sequence of status codes.'''
+
+    def __init__(self, statuses):
+        super().__init__()
+        self.statuses = list(statuses)
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        status = self.statuses.pop(0)
+        if status is None:
+            raise requests.ConnectionError('connection reset')
+        if isinstance(status, Exception):
+            raise status
+
+        resp = requests.models.Response()
+        resp.status_code = status
+        resp.request = request
+        resp.url = request.url
+        resp._content = json.dumps(dict(id=123, status=status)).encode('utf-8')
+        return resp
+
+    def close(self):
+        pass
+
+
+@pytest.fixture()
+def client():
+    client = zen.api.ZenodoClient(stage=zen.api.DEV, token='secret',
+                                  host='http://zenodo.test',
+                                  backoff_factor=0, jitter=0)
+    client._online = True
+    return client
+
+
+def test_zen_api_client_create_id(client):
+    adapter = CannedAdapter([201])
+    client.session.mount('http://', adapter)
+    assert client.create_id() == 123
+    assert len(adapter.requests) == 1
+    assert adapter.requests[0].url.startswith('http://zenodo.test/api/deposit/depositions')
+    assert 'access_token=secret' in adapter.requests[0].url
+
+
+def test_zen_api_client_retries(client):
+    adapter = CannedAdapter([503, None, 200])
+    client.session.mount('http://', adapter)
+    assert client.get(123)['status'] == 200
+    assert len(adapter.requests) == 3
+
+
+def test_zen_api_client_retries_exhausted(client):
+    adapter = CannedAdapter([502] * 4)
+    client.session.mount('http://', adapter)
+    with pytest.raises(zen.api.ZenodoApiError):
+        client.get(123)
+    assert len(adapter.requests) == client.max_retries + 1
+
+
+def test_zen_api_client_post_not_retried(client):
+    # The server may have published before failing, or dropping the connection.
+    for status in (502, None):
+        adapter = CannedAdapter([status, 200])
+        client.session.mount('http://', adapter)
+        with pytest.raises(zen.api.ZenodoApiError):
+            client.publish(123)
+        assert len(adapter.requests) == 1
+
+    # Requests that never reached the server are sent again.
+    refused = urllib3.exceptions.MaxRetryError(
+        None, '/', urllib3.exceptions.NewConnectionError(None, 'refused'))
+    adapter = CannedAdapter([requests.ConnectTimeout('connect timed out'),
+                             requests.ConnectionError(refused), 202])
+    client.session.mount('http://', adapter)
+    assert client.publish(123)['status'] == 202
+    assert len(adapter.requests) == 3
+
+
+def test_zen_api_client_no_retry_on_client_error(client):
+    adapter = CannedAdapter([400, 200])
+    client.session.mount('http://', adapter)
+    with pytest.raises(zen.api.ZenodoApiError):
+        client.update_metadata(123, dict(title='foo'))
+    assert len(adapter.requests) == 1
+
+
+def test_zen_api_client_releases_slot_on_timeout(client):
+    client.rate_controller = zen.api.RateController(max_concurrency=2)
+    adapter = CannedAdapter([requests.ReadTimeout('read timed out'),
+                             requests.exceptions.ChunkedEncodingError('broken'), 200])
+    client.session.mount('http://', adapter)
+    assert client.get(123)['status'] == 200
+    assert len(adapter.requests) == 3
+    assert client.rate_controller.in_flight == 0
+
+    adapter = CannedAdapter([requests.ReadTimeout('read timed out')] * 4)
+    client.session.mount('http://', adapter)
+    with pytest.raises(zen.api.ZenodoApiError):
+        client.get(123)
+    assert client.rate_controller.in_flight == 0
+
+
+def test_zen_api_client_is_online_cached(client):
+    client._online = None
+    adapter = CannedAdapter([200])
+    client.session.mount('http://', adapter)
+    assert client.is_online()
+    assert client.is_online()
+    assert len(adapter.requests) == 1
+
+
+def test_zen_api_get_client():
+    assert zen.api.get_client(zen.api.DEV) is zen.api.get_client(zen.api.DEV)
+    assert zen.api.get_client(zen.api.DEV) is not zen.api.get_client(zen.api.PROD)
+
+
+class BucketAdapter(requests.adapters.BaseAdapter):
+    '''Transport adapter emulating the deposition bucket API.'''
+
+    def __init__(self, corrupt=False):
+        super().__init__()
+        self.corrupt = corrupt
+        self.requests = []
+        self.uploads = dict()
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        content = dict(id=123, links=dict(bucket='http://zenodo.test/api/files/abc'))
+        if request.url.startswith('http://archives.test'):
+            resp = requests.models.Response()
+            resp.status_code = 404 if 'missing' in request.url else 200
+            resp.url = request.url
+            resp.raw = io.BytesIO(b'%PDF-remote')
+            return resp
+        elif request.method == 'PUT':
+            assert not isinstance(request.body, bytes)
+            data = b''.join(request.body)
+            self.uploads[request.path_url.split('?')[0]] = data
+            data += b'!' if self.corrupt else b''
+            content = dict(key='sample.pdf', size=len(data),
+                           checksum='md5:{}'.format(hashlib.md5(data).hexdigest()))
+
+        resp = requests.models.Response()
+        resp.status_code = 201 if request.method != 'GET' else 200
+        resp.request = request
+        resp._content = json.dumps(content).encode('utf-8')
+        return resp
+
+    def close(self):
+        pass
+
+
+def test_zen_api_client_upload_file_streams(client, pdf_file):
+    adapter = BucketAdapter()
+    client.session.mount('http://', adapter)
+    zid = client.create_id()
+    resp = client.upload_file(zid, pdf_file)
+
+    with open(pdf_file, 'rb') as fp:
+        data = fp.read()
+    assert resp['checksum'] == 'md5:{}'.format(hashlib.md5(data).hexdigest())
+    assert adapter.uploads['/api/files/abc/sample.pdf'] == data
+    assert adapter.requests[-1].headers['Content-Length'] == str(len(data))
+    # The bucket link is remembered from the create response.
+    assert [r.method for r in adapter.requests] == ['POST', 'PUT']
+
+
+def test_zen_api_client_upload_file_fetches_bucket(client):
+    adapter = BucketAdapter()
+    client.session.mount('http://', adapter)
+    client.upload_file(123, 'foo.pdf', fp=b'%PDF-1.4')
+    assert [r.method for r in adapter.requests] == ['GET', 'PUT']
+    assert adapter.uploads['/api/files/abc/foo.pdf'] == b'%PDF-1.4'
+
+
+def test_zen_api_client_upload_file_from_url(client):
+    adapter = BucketAdapter()
+    client.session.mount('http://', adapter)
+    client.upload_file(123, 'http://archives.test/ismir2000/000001.pdf')
+    assert adapter.uploads['/api/files/abc/000001.pdf'] == b'%PDF-remote'
+
+
+def test_zen_api_client_upload_file_missing_url(client):
+    adapter = BucketAdapter()
+    client.session.mount('http://', adapter)
+    with pytest.raises(zen.api.ZenodoApiError) as excinfo:
+        client.upload_file(123, 'http://archives.test/ismir2000/missing.pdf')
+    assert 'http://archives.test/ismir2000/missing.pdf' in str(excinfo.value)
+    assert '404' in str(excinfo.value)
+    # Nothing is sent to the bucket.
+    assert [r.method for r in adapter.requests] == ['GET', 'GET']
+    assert adapter.uploads == dict()
+
+
+def test_zen_api_client_upload_file_checksum_mismatch(client, pdf_file):
+    client.session.mount('http://', BucketAdapter(corrupt=True))
+    with pytest.raises(zen.api.ZenodoApiError):
+        client.upload_file(123, pdf_file)
+
+
+def test_zen_api_hashing_reader():
+    reader = zen.api.HashingReader(io.BytesIO(b'abcdef'), length=6, chunk_size=4)
+    assert list(reader) == [b'abcd', b'ef']
+    assert reader.checksum == 'md5:{}'.format(hashlib.md5(b'abcdef').hexdigest())
+
+
+def test_zen_api_md5sum(pdf_file):
+    with open(pdf_file, 'rb') as fp:
+        expected = hashlib.md5(fp.read()).hexdigest()
+    assert zen.api.md5sum(pdf_file, chunk_size=1000) == expected
+
+
+def _response(status, **headers):
+    resp = requests.models.Response()
+    resp.status_code = status
+    resp.headers.update({k.replace('_', '-'): str(v) for k, v in headers.items()})
+    return resp
+
+
+def test_zen_api_parse_retry_after():
+    assert zen.api._parse_retry_after(None) is None
+    assert zen.api._parse_retry_after('3') == 3
+    assert zen.api._parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert zen.api._parse_retry_after('Wed, 21 Oct 2015 07:28:10 GMT',
+                                      now=1445412480) == 10
+    assert zen.api._parse_retry_after('soon') is None
+
+
+def test_zen_api_parse_ratelimit_reset():
+    assert zen.api._parse_ratelimit_reset(None) is None
+    assert zen.api._parse_ratelimit_reset('') is None
+    assert zen.api._parse_ratelimit_reset('1445412490', now=1445412480) == 10
+    assert zen.api._parse_ratelimit_reset('1445412470', now=1445412480) == 0
+    assert zen.api._parse_ratelimit_reset('Wed, 21 Oct 2015 07:28:10 GMT',
+                                          now=1445412480) == 10
+    assert zen.api._parse_ratelimit_reset('soon') is None
+    assert zen.api._parse_ratelimit_reset('nan') is None
+
+
+def test_zen_api_TokenBucket():
+    bucket = zen.api.TokenBucket(rate=100, burst=1)
+    now = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - now >= 0.04
+
+
+def test_zen_api_RateController_aimd():
+    controller = zen.api.RateController(max_concurrency=8)
+    controller.acquire()
+    controller.acquire()
+    assert controller.in_flight == 2
+
+    assert controller.release(_response(429, Retry_After='0.2')) == 0.2
+    assert controller.limit == 4
+    # Requests already in flight don't shrink the limit again.
+    controller.release(_response(429, Retry_After='0.2'))
+    assert controller.limit == 4
+
+    now = time.monotonic()
+    controller.acquire()
+    assert time.monotonic() - now >= 0.15
+    controller.release(_response(200))
+    assert 4 < controller.limit < 5
+    assert controller.in_flight == 0
+
+
+def test_zen_api_RateController_concurrency():
+    controller = zen.api.RateController(max_concurrency=1)
+    controller.acquire()
+    released = threading.Timer(0.1, controller.release, args=(_response(200),))
+    released.start()
+    now = time.monotonic()
+    controller.acquire()
+    assert time.monotonic() - now >= 0.05
+    controller.release(_response(200))
+
+
+def test_zen_api_RateController_ratelimit_headers():
+    controller = zen.api.RateController()
+    controller.acquire()
+    controller.release(_response(200, X_RateLimit_Remaining=0,
+                                 X_RateLimit_Reset=time.time() + 0.2))
+    now = time.monotonic()
+    controller.acquire()
+    assert time.monotonic() - now >= 0.1
+    controller.release(_response(200))
+
+
+def test_zen_api_RateController_bad_ratelimit_reset():
+    controller = zen.api.RateController()
+    for reset in ('soon', '', 'inf'):
+        controller.acquire()
+        assert controller.release(_response(200, X_RateLimit_Remaining=0,
+                                            X_RateLimit_Reset=reset)) is None
+    assert controller.in_flight == 0
+    now = time.monotonic()
+    controller.acquire()
+    assert time.monotonic() - now < 0.1
+    controller.release(_response(200))
@@ -0,0 +1,79 @@
+import pytest
+
+import json
+import os
+
+import zen.authors
+import zen.corpus
+
+
+@pytest.fixture()
+def database(tmpdir):
+    root = str(tmpdir.mkdir('database'))
+    os.makedirs(os.path.join(root, 'proceedings'))
+    years = {
+        '2004': [dict(title='a', author=['Juan P. Bello', ' Mark  Sandler']),
+                 dict(title='b', author='E. Allamanche'),
+                 dict(title='c', author=['J. Kim', 'Gaël Richard'])],
+        '2010': [dict(title='d', author=['Juan Pablo Bello', 'Mark B. Sandler', 'Gael Richard']),
+                 dict(title='e', author=['Eric Allamanche', 'Jan Hajič, jr.']),
+                 dict(title='f', author=['Jaehun Kim', 'Jongpil Kim', 'Juan Bello'])]}
+    for year, records in years.items():
+        with open(os.path.join(root, 'proceedings', year + '.json'), 'w') as fp:
+            json.dump([dict(record, year=year) for record in records], fp)
+    return root
+
+
+@pytest.mark.parametrize('name,expected', [
+    (' Gaël  Richard', 'gael richard'),
+    ('Jan Hajič, jr.', 'jan hajic'),
+    ('Yu-Hua Chen', 'yuhua chen'),
+    ("Donncha O'Maidín", 'donncha omaidin'),
+    ('Masataka Goto (National Institute of Advanced Industrial Science and Technology (AIST))',
+     'masataka goto'),
+    ('Meinard Müller (International Audio Laboratories Erlangen)', 'meinard muller'),
+    ('Unbalanced (Affiliation', 'unbalanced affiliation')])
+def test_normalize_name(name, expected):
+    assert zen.authors.normalize_name(name) == expected
+
+
+def test_author_index(database):
+    index = zen.authors.AuthorIndex.build(zen.corpus.Corpus(database))
+
+    # The most frequent spelling names a person, the longest on ties.
+    assert index.find('juan bello') == index.find('J. Bello') == 'Juan Pablo Bello'
+    assert index.variants('Juan P. Bello') == ['Juan Bello', 'Juan P. Bello', 'Juan Pablo Bello']
+    assert index.papers('J. P. Bello') == [('2004', 0), ('2010', 0), ('2010', 2)]
+    assert index.collaborators('Juan Bello') == {
+        'Mark B. Sandler': 2, 'Gaël Richard': 1, 'Jaehun Kim': 1, 'Jongpil Kim': 1}
+
+    assert index.find('E. Allamanche') == index.find('Eric Allamanche')
+    assert index.find('Gael Richard') == index.find('Gaël Richard')
+    assert index.find('Jan Hajic') == 'Jan Hajič, jr.'
+
+    # 'J. Kim' could be either Kim, so it stays apart.
+    assert index.find('J. Kim') == 'J. Kim'
+    assert index.find('Jaehun Kim') != index.find('Jongpil Kim')
+    assert index.find('Nobody Here') is None
+    assert index.papers('Nobody Here') == [] and index.collaborators('Nobody Here') == {}
+
+
+def test_load_cached(database, tmpdir, monkeypatch):
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    index = zen.authors.load(database, cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    def fail(corpus):
+        raise AssertionError('rebuilt')
+
+    monkeypatch.setattr(zen.authors.AuthorIndex, 'build', fail)
+    cached = zen.authors.load(database, cache_dir)
+    assert cached.to_json() == index.to_json()
+    assert cached.papers('Juan Bello') == index.papers('Juan Bello')
+    monkeypatch.undo()
+
+    # A changed year invalidates the cache.
+    with open(os.path.join(database, 'proceedings', '2011.json'), 'w') as fp:
+        json.dump([dict(title='g', author=['Juan Bello'], year='2011')], fp)
+    assert len(zen.authors.load(database, cache_dir).papers('Juan Bello')) == 4
+    assert len(os.listdir(cache_dir)) == 1
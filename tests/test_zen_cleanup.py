@@ -0,0 +1,41 @@
+import pytest
+
+import zen.cleanup
+
+
+@pytest.mark.parametrize('raw,expected', [
+    (' We pro-\ncess ﬁles\nand ﬂows.\n', 'We process files and flows.'),
+    ('three   spaces\n\n and  more', 'three spaces and more'),
+    ('soft­hyphen​ and ’quotes’', 'softhyphen and ’quotes’'),
+    ('', '')])
+def test_clean(raw, expected):
+    assert zen.cleanup.clean(raw) == expected
+
+
+def test_cleaner_rules():
+    clean = zen.cleanup.Cleaner(
+        translations={' ': ' ', ord('ß'): 'ss'},
+        rules=[(r'\s+([,.;:])', r'\1'), (r'(\w+)-\n(\w+)', r'\1\2')] + zen.cleanup.RULES)
+    assert clean('Straße , with a non-\nbreaking space .') == \
+        'Strasse, with a nonbreaking space.'
+
+
+def test_cleaner_whitespace():
+    clean = zen.cleanup.Cleaner(
+        translations=dict(zen.cleanup.LIGATURES, **zen.cleanup.WHITESPACE))
+    assert clean('tab\tand\x0cpage  ﬁ\r\nbreak\n') == 'tab and page fi break'
+
+
+def test_cleaner_replacements():
+    clean = zen.cleanup.Cleaner(replacements=[('--', '-')] + zen.cleanup.REPLACEMENTS)
+    assert clean('pre---  and post--\nprocessing') == 'pre- and postprocessing'
+
+    with pytest.raises(ValueError):
+        zen.cleanup.Cleaner(replacements=[(' ', '  ')])
+    with pytest.raises(ValueError):
+        zen.cleanup.Cleaner(replacements=[('', ' ')])
+
+
+def test_cleaner_empty():
+    clean = zen.cleanup.Cleaner(translations={}, replacements=[], rules=[])
+    assert clean(' ﬁ  x\n') == 'ﬁ  x'
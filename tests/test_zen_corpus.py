@@ -0,0 +1,91 @@
+import pytest
+
+import json
+import os
+
+import zen.corpus
+
+
+@pytest.fixture()
+def database(tmpdir):
+    root = str(tmpdir)
+    years = {
+        '2017': [dict(title='Über Music!', author='Solo Author', year='2017',
+                      doi='10.5281/ZENODO.1', url='u1', ee='http://a.org/1.pdf',
+                      abstract='', zenodo_id=1, dblp_key='conf/ismir/Solo17')],
+        '2020': [dict(title='Deep   Music', author=['A', 'B'], year=2020,
+                      doi='10.5281/zenodo.2', url='u2', ee='http://a.org/2.pdf',
+                      pages='1-7', Abstract='Text.', zenodo_id='2', dblp_key=None,
+                      extra={}),
+                 dict(title='uber music', author=['C'], year=2020, doi=None, url='u3',
+                      ee=None, pages='8-9', Abstract=None, zenodo_id=None, dblp_key=None)]}
+    os.makedirs(os.path.join(root, 'proceedings'))
+    for year, records in years.items():
+        with open(os.path.join(root, 'proceedings', year + '.json'), 'w') as fp:
+            json.dump(records, fp)
+    with open(os.path.join(root, 'conferences.json'), 'w') as fp:
+        json.dump(dict((year, dict(conference_acronym='ISMIR ' + year)) for year in years), fp)
+    return root
+
+
+def test_normalize_title():
+    assert zen.corpus.normalize_title(' Über-Music:  a_Study ') == 'uber music a study'
+
+
+def test_normalize_paper():
+    paper = zen.corpus.normalize_paper(
+        dict(title='t', author='X', year=2020, Abstract='a', zenodo_id='12'))
+    assert paper == dict(title='t', author=['X'], year='2020', abstract='a', pages=None,
+                         doi=None, url=None, ee=None, zenodo_id=12, dblp_key=None)
+
+
+def test_corpus_lazy(database):
+    corpus = zen.corpus.Corpus(database)
+    assert corpus.years == ['2017', '2020']
+    assert corpus.conferences['2020']['conference_acronym'] == 'ISMIR 2020'
+
+    assert corpus.get('dblp_key', 'conf/ismir/Solo17')['author'] == ['Solo Author']
+    assert list(corpus._papers) == ['2017']
+
+    assert corpus.papers(2020)[0]['abstract'] == 'Text.'
+    assert [p['pages'] for p in corpus] == [None, '1-7', '8-9']
+    assert len(corpus) == 3
+
+
+@pytest.mark.parametrize('field,value,titles', [
+    ('doi', '10.5281/zenodo.1', ['Über Music!']),
+    ('zenodo_id', 2, ['Deep   Music']),
+    ('zenodo_id', '2', ['Deep   Music']),
+    ('ee', 'http://a.org/2.pdf', ['Deep   Music']),
+    ('title', 'Uber music', ['Über Music!', 'uber music']),
+    ('title', 'deep music', ['Deep   Music']),
+    ('dblp_key', 'conf/ismir/Nobody', []),
+    ('doi', None, [])])
+def test_corpus_lookup(database, field, value, titles):
+    corpus = zen.corpus.Corpus(database)
+    assert [p['title'] for p in corpus.lookup(field, value)] == titles
+    assert corpus.get(field, value, default='missing') == (
+        corpus.lookup(field, value)[0] if titles else 'missing')
+
+
+def test_corpus_database(root_dir):
+    corpus = zen.corpus.Corpus(os.path.join(root_dir, 'database'))
+    papers = list(corpus)
+    assert len(papers) > 2000
+    assert all(isinstance(p['author'], list) and 'Abstract' not in p for p in papers)
+    assert set(corpus.years) <= set(corpus.conferences)
+
+
+def test_dumps_like():
+    # Upper-case escapes, as in 2020.json, survive on unchanged lines.
+    text = '[\n  {\n    "author": "M\\u00FCller",\n    "abstract": "x  y"\n  }\n]\n'
+    records = json.loads(text)
+    assert zen.corpus.dumps_like(records, text) == text
+
+    records[0]['abstract'] = 'x y'
+    assert zen.corpus.dumps_like(records, text) == text.replace('x  y', 'x y')
+
+    records[0]['author'] = 'Mueller'
+    assert zen.corpus.dumps_like(records, text) == text.replace(
+        'x  y', 'x y').replace('\\u00FC', 'ue')
+    assert zen.corpus.dumps_like([1, 2], '[1, 3]') == '[1, 2]'
@@ -0,0 +1,123 @@
+import pytest
+
+import json
+import os
+import sqlite3
+
+import zen.db
+import zen.models
+
+
+def write_year(root, year, records):
+    with open(os.path.join(root, 'proceedings', year + '.json'), 'w') as fp:
+        json.dump(records, fp)
+
+
+@pytest.fixture()
+def database(tmpdir):
+    root = str(tmpdir.mkdir('database'))
+    os.makedirs(os.path.join(root, 'proceedings'))
+    write_year(root, '2017', [
+        dict(title='Chord Recognition', author='Solo Author', year='2017',
+             doi='10.5281/zenodo.1', url='u1', ee='http://a.org/1.pdf', abstract='Chords.',
+             zenodo_id=1, dblp_key='conf/ismir/Solo17')])
+    write_year(root, '2020', [
+        dict(title='Beat Tracking', author=['A. Writer', 'Solo Author'], year=2020,
+             doi='10.5281/zenodo.2', url='u2', ee='http://a.org/2.pdf', pages='1-7',
+             Abstract='Beats and chords.', zenodo_id='2', dblp_key=None, extra={})])
+    with open(os.path.join(root, 'conferences.json'), 'w') as fp:
+        json.dump({'2017': dict(conference_acronym='ISMIR 2017'),
+                   '2020': dict(conference_acronym='ISMIR 2020')}, fp)
+    return root
+
+
+def test_build_read(database, tmpdir):
+    path = os.path.join(str(tmpdir), 'ismir.sqlite')
+    assert zen.db.build(database, path) == [
+        'conferences.json', 'proceedings/2017.json', 'proceedings/2020.json']
+
+    db = zen.db.Database(path)
+    assert db.years == ['2017', '2020']
+    assert db.conference(2020) == dict(conference_acronym='ISMIR 2020')
+
+    paper = db.get('doi', '10.5281/ZENODO.2')
+    assert isinstance(paper, zen.models.IsmirPaper)
+    assert paper == dict(title='Beat Tracking', author=['A. Writer', 'Solo Author'],
+                         year='2020', doi='10.5281/zenodo.2', url='u2',
+                         ee='http://a.org/2.pdf', pages='1-7', abstract='Beats and chords.',
+                         zenodo_id=2, dblp_key=None)
+    assert db.get('zenodo_id', '1')['title'] == 'Chord Recognition'
+    assert db.get('title', 'beat tracking!')['year'] == '2020'
+    assert db.get('dblp_key', 'conf/ismir/None') is None
+
+    assert [p['year'] for p in db.by_author('Solo Author')] == ['2017', '2020']
+    assert [p['title'] for p in db.search('chords')] == ['Chord Recognition', 'Beat Tracking']
+    assert [p['title'] for p in db.search('authors:writer')] == ['Beat Tracking']
+    assert len(db.papers()) == 2
+
+
+def test_build_incremental(database, tmpdir):
+    path = os.path.join(str(tmpdir), 'ismir.sqlite')
+    zen.db.build(database, path)
+    assert zen.db.build(database, path) == []
+
+    write_year(database, '2020', [
+        dict(title='Onset Detection', author=['B. Writer'], year='2020', doi=None, url='u3',
+             ee=None, pages='1-2', abstract='Onsets.', zenodo_id=None, dblp_key=None)])
+    os.remove(os.path.join(database, 'proceedings', '2017.json'))
+    assert zen.db.build(database, path) == ['proceedings/2017.json', 'proceedings/2020.json']
+
+    db = zen.db.Database(path)
+    assert [p['title'] for p in db.papers()] == ['Onset Detection']
+    assert db.by_author('Solo Author') == []
+    assert db.search('chords') == []
+    assert [p['title'] for p in db.search('onsets')] == ['Onset Detection']
+    assert db._db.execute('SELECT name FROM authors').fetchall() == [('B. Writer',)]
+
+
+def test_lookups_use_indexes(database, tmpdir):
+    path = os.path.join(str(tmpdir), 'ismir.sqlite')
+    zen.db.build(database, path)
+    db = zen.db.Database(path)
+    for column in zen.db.COLUMNS.values():
+        plan = db._db.execute('EXPLAIN QUERY PLAN SELECT id FROM papers WHERE {} = 1'.format(
+            column)).fetchall()
+        assert plan[0][-1].startswith('SEARCH papers USING')
+
+
+def test_build_older_schema(database, tmpdir, monkeypatch):
+    path = os.path.join(str(tmpdir), 'ismir.sqlite')
+    zen.db.build(database, path)
+
+    monkeypatch.setattr(zen.db, 'SCHEMA_VERSION', zen.db.SCHEMA_VERSION + 1)
+    assert zen.db.build(database, path) == [
+        'conferences.json', 'proceedings/2017.json', 'proceedings/2020.json']
+    db = zen.db.Database(path)
+    assert [p['title'] for p in db.papers()] == ['Chord Recognition', 'Beat Tracking']
+    assert db._db.execute('PRAGMA user_version').fetchone()[0] == zen.db.SCHEMA_VERSION
+
+
+def test_build_foreign_file(database, tmpdir):
+    path = os.path.join(str(tmpdir), 'other.sqlite')
+    other = sqlite3.connect(path)
+    other.execute('CREATE TABLE notes (text TEXT)')
+    other.execute("INSERT INTO notes VALUES ('keep me')")
+    other.execute('PRAGMA user_version = 7')
+    other.commit()
+    other.close()
+
+    with pytest.raises(ValueError):
+        zen.db.build(database, path)
+    other = sqlite3.connect(path)
+    assert other.execute('SELECT text FROM notes').fetchall() == [('keep me',)]
+    assert other.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall() == [
+        ('notes',)]
+    other.close()
+
+    path = os.path.join(str(tmpdir), 'notes.txt')
+    with open(path, 'w') as fp:
+        fp.write('not a database, ' * 100)
+    with pytest.raises(ValueError):
+        zen.db.build(database, path)
+    with open(path) as fp:
+        assert fp.read() == 'not a database, ' * 100
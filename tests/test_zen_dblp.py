@@ -0,0 +1,149 @@
+import pytest
+
+import gzip
+import http.server
+import os
+import threading
+
+import zen.dblp
+
+
+def record_xml(key, title):
+    return ('<inproceedings key="{}" mdate="2020-01-01"><author>A. One</author>'
+            '<author>B. Two</author><title>{}</title><pages>1-8</pages>'
+            '<year>2004</year><booktitle>ISMIR</booktitle></inproceedings>').format(key, title)
+
+
+PAGES = {
+    '/db/conf/ismir/ismir2004.xml': (
+        '<bht key="db/conf/ismir/ismir2004.bht"><dblpcites>'
+        '<r><proceedings key="conf/ismir/2004"><title>Proceedings</title></proceedings></r>'
+        '<r>{}</r><r>{}</r></dblpcites></bht>').format(
+            record_xml('conf/ismir/OneT04', 'First'), record_xml('conf/ismir/TwoO04', 'Second')),
+    '/db/conf/ismir/ismir2005.html': (
+        '<ul><li class="entry inproceedings" id="conf/ismir/OneT05">x</li>'
+        '<li class="entry inproceedings" id="conf/ismir/TwoO05">y</li></ul>'),
+    '/rec/xml/conf/ismir/OneT05.xml': '<dblp>\n{}\n</dblp>'.format(
+        record_xml('conf/ismir/OneT05', 'Third')),
+    '/rec/xml/conf/ismir/TwoO05.xml': '<dblp>{}</dblp>'.format(
+        record_xml('conf/ismir/TwoO05', 'Fourth')),
+    # An HTML page instead of the export, and a listed record that is gone.
+    '/db/conf/ismir/ismir2006.xml': '<html><body>Maintenance<br></body></html>',
+    '/db/conf/ismir/ismir2006.html': (
+        '<ul><li class="entry inproceedings" id="conf/ismir/OneT06">x</li>'
+        '<li class="entry inproceedings" id="conf/ismir/GoneG06">y</li></ul>'),
+    '/rec/xml/conf/ismir/OneT06.xml': '<dblp>{}</dblp>'.format(
+        record_xml('conf/ismir/OneT06', 'Fifth')),
+}
+
+
+class DblpHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path not in PAGES:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        etag = '"{}"'.format(hash(PAGES[self.path]))
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = PAGES[self.path].encode('utf-8')
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture()
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), DblpHandler)
+    httpd.requests = []
+    httpd.url = 'http://{}:{}'.format(*httpd.server_address)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_parse_volume():
+    records = zen.dblp.parse_volume(PAGES['/db/conf/ismir/ismir2004.xml'])
+    assert sorted(records) == ['conf/ismir/2004', 'conf/ismir/OneT04', 'conf/ismir/TwoO04']
+    record = records['conf/ismir/OneT04']
+    assert record == zen.dblp.parse_record('<dblp>{}</dblp>'.format(
+        record_xml('conf/ismir/OneT04', 'First')))
+    assert record['author'] == ['A. One', 'B. Two'] and record['title'] == 'First'
+
+
+def test_harvest(server, tmpdir):
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    harvester = zen.dblp.Harvester(cache_dir, rate=100, host=server.url)
+    records = harvester.harvest([2004, 2005])
+    assert sorted(records) == ['conf/ismir/OneT04', 'conf/ismir/OneT05',
+                               'conf/ismir/TwoO04', 'conf/ismir/TwoO05']
+    assert records['conf/ismir/TwoO05']['title'] == 'Fourth'
+    # One request for 2004; a missing export, a listing and two records for 2005.
+    assert harvester.requests == len(server.requests) == 5
+
+    # Fresh responses come from the cache...
+    harvester = zen.dblp.Harvester(cache_dir, rate=100, host=server.url)
+    assert harvester.harvest([2004, 2005]) == records
+    assert harvester.requests == 1 and server.requests[-1].endswith('ismir2005.xml')
+
+    # ... stale ones are revalidated.
+    harvester = zen.dblp.Harvester(cache_dir, ttl=0, rate=100, host=server.url)
+    assert harvester.harvest([2005], bulk=False) == dict(
+        (key, record) for key, record in records.items() if key.endswith('05'))
+    assert harvester.requests == 3
+
+
+def test_harvest_bad_responses(server, tmpdir, caplog):
+    harvester = zen.dblp.Harvester(str(tmpdir), rate=100, host=server.url)
+    with caplog.at_level('WARNING', logger='zen.dblp'):
+        records = harvester.harvest([2004, 2006])
+    assert sorted(records) == ['conf/ismir/OneT04', 'conf/ismir/OneT06', 'conf/ismir/TwoO04']
+    assert records['conf/ismir/OneT06']['title'] == 'Fifth'
+    assert '/rec/xml/conf/ismir/GoneG06.xml' in server.requests
+    assert 'ismir2006.xml is not a TOC export' in caplog.text
+    assert 'GoneG06.xml: no such record' in caplog.text
+
+
+def test_harvest_resume(server, tmpdir):
+    harvester = zen.dblp.Harvester(str(tmpdir), rate=100, host=server.url)
+    records = dict((key, 'done') for key in ['conf/ismir/OneT05', 'conf/ismir/TwoO05'])
+    assert harvester.harvest([2005], records, bulk=False) is records
+    assert records['conf/ismir/OneT05'] == 'done'
+    assert server.requests == ['/db/conf/ismir/ismir2005.html']
+
+
+def test_rate_limited(server, tmpdir):
+    harvester = zen.dblp.Harvester(str(tmpdir), rate=20, num_workers=4, host=server.url)
+    harvester.bucket.acquire()
+    now = harvester.bucket._updated
+    harvester.harvest([2005], bulk=False)
+    # Three requests at 20 per second, whatever the number of workers.
+    assert harvester.bucket._updated - now >= 0.14
+
+
+def test_iter_dump(tmpdir):
+    path = os.path.join(str(tmpdir), 'dblp.xml.gz')
+    with gzip.open(path, 'wt', encoding='latin-1') as fp:
+        fp.write('<?xml version="1.0" encoding="ISO-8859-1"?>\n'
+                 '<!DOCTYPE dblp SYSTEM "dblp.dtd">\n<dblp>\n'
+                 '<article key="journals/x/A"><author>A</author><title>t</title></article>\n'
+                 '<proceedings key="conf/ismir/2004"><title>Proceedings</title></proceedings>\n'
+                 '{}\n<www key="conf/ismir/home"><title>ISMIR</title></www>\n'
+                 '<inproceedings key="conf/icassp/B"><title>u</title></inproceedings>\n'
+                 '</dblp>\n'.format(record_xml('conf/ismir/MullerG04', 'M&uuml;sic &amp; Signal')))
+
+    records = dict(zen.dblp.iter_dump(path))
+    assert sorted(records) == ['conf/ismir/2004', 'conf/ismir/MullerG04']
+    assert records['conf/ismir/MullerG04']['title'] == 'Müsic & Signal'
+    assert records['conf/ismir/MullerG04'] == zen.dblp.parse_record('<dblp>{}</dblp>'.format(
+        record_xml('conf/ismir/MullerG04', 'Müsic &amp; Signal')))
@@ -0,0 +1,109 @@
+import pytest
+
+import json
+import os
+
+import zen.dedup
+
+
+ABSTRACT = ('We present a method for automatic chord recognition from audio '
+            'recordings using a hidden Markov model trained on annotated pop songs, '
+            'and evaluate it on a large collection of Beatles recordings.')
+
+PAPERS = {
+    '2004': [dict(title='Chord Recognition with Hidden Markov Models', abstract=ABSTRACT,
+                  author=['A. One', 'B. Two']),
+             dict(title='Beat Tracking of Dance Music', abstract='Tempo and beats.',
+                  author=['C. Three'])],
+    '2005': [
+        # Same title, another abstract.
+        dict(title='Chord recognition with hidden Markov models.',
+             abstract='A completely different summary of the work.', author=['A. One']),
+        # Reprint: reworded abstract, another title and author order.
+        dict(title='HMM-based Chord Recognition', abstract=ABSTRACT.replace(
+            'large collection', 'big collection'), author=['B. Two', 'A. One']),
+        dict(title='Chord Estimation with Deep Networks', abstract='Chord labels.',
+             author=['D. Four'])]}
+
+
+@pytest.fixture()
+def sources(tmpdir):
+    root = str(tmpdir.mkdir('proceedings'))
+    paths = dict()
+    for year, records in PAPERS.items():
+        paths[year] = os.path.join(root, year + '.json')
+        with open(paths[year], 'w') as fp:
+            json.dump([dict(record, year=year) for record in records], fp)
+    return paths
+
+
+def test_signature_similarity():
+    a = set('shingle {}'.format(n) for n in range(300))
+    b = set('shingle {}'.format(n) for n in range(100, 400))
+    # True Jaccard similarity 0.5.
+    assert zen.dedup.similarity(zen.dedup.signature(a), zen.dedup.signature(b)) == \
+        pytest.approx(0.5, abs=0.15)
+    assert zen.dedup.similarity(zen.dedup.signature(a), zen.dedup.signature(set(a))) == 1
+    assert zen.dedup.signature(set()) is None
+    assert zen.dedup.similarity(None, zen.dedup.signature(a)) == 0
+
+    # Fewer shingles than bins still fill every bin.
+    assert None not in zen.dedup.signature(set(['one', 'two']))
+
+
+def test_shingles():
+    paper = dict(title='The  Über Chord', abstract=None)
+    assert zen.dedup.title_shingles(paper) == zen.dedup.title_shingles(
+        dict(title='the uber chord'))
+    assert zen.dedup.text_shingles(paper) == set()
+    assert zen.dedup.text_shingles(dict(title='A b', abstract='c')) == set(['a b', 'b c'])
+
+
+def test_find_duplicates(sources):
+    signatures, papers = zen.dedup.load_signatures(sources)
+    assert len(signatures) == len(papers) == 5
+
+    clusters = zen.dedup.find_duplicates(signatures)
+    assert len(clusters) == 1
+    assert clusters[0]['keys'] == [('2004', 0), ('2005', 0), ('2005', 1)]
+
+    pairs = dict(((a, b), (title, text)) for a, b, title, text in clusters[0]['pairs'])
+    assert pairs[('2004', 0), ('2005', 0)][0] == 1
+    assert pairs[('2004', 0), ('2005', 1)][1] >= zen.dedup.TEXT_THRESHOLD
+
+
+def test_load_signatures_cached(sources, tmpdir, monkeypatch):
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    signatures, _ = zen.dedup.load_signatures(sources, cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
+
+    def fail(paper):
+        raise AssertionError('hashed')
+
+    monkeypatch.setattr(zen.dedup, 'paper_signatures', fail)
+    assert zen.dedup.load_signatures(sources, cache_dir)[0] == signatures
+
+    # Only the changed year is hashed again.
+    with open(sources['2005'], 'w') as fp:
+        json.dump([dict(title='New paper', abstract='', year='2005')], fp)
+    with pytest.raises(AssertionError):
+        zen.dedup.load_signatures(sources, cache_dir)
+    monkeypatch.undo()
+
+    signatures, _ = zen.dedup.load_signatures(sources, cache_dir)
+    assert len(signatures) == 3
+    assert sorted(fn.split('.')[0] for fn in os.listdir(cache_dir)) == ['2004', '2005']
+    assert zen.dedup.find_duplicates(signatures) == []
+
+
+def test_load_signatures_truncated_cache(sources, tmpdir):
+    cache_dir = os.path.join(str(tmpdir), 'cache')
+    signatures, _ = zen.dedup.load_signatures(sources, cache_dir)
+    for fn in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, fn)
+        with open(path, 'r+b') as fp:
+            fp.truncate(os.path.getsize(path) // 2)
+
+    # Read as a miss: hashed again, and the cache rewritten.
+    assert zen.dedup.load_signatures(sources, cache_dir)[0] == signatures
+    assert zen.dedup.load_signatures(sources, cache_dir)[0] == signatures
@@ -0,0 +1,97 @@
+import pytest
+
+import os
+
+import zen.journal
+
+
+@pytest.fixture()
+def journal(tmpdir):
+    return zen.journal.Journal(os.path.join(str(tmpdir), 'out.journal.jsonl'))
+
+
+def test_paper_key():
+    assert zen.journal.paper_key(dict(dblp_key='conf/ismir/Foo00', ee='a.pdf',
+                                      title='foo')) == 'conf/ismir/Foo00|foo'
+    assert zen.journal.paper_key(dict(dblp_key=None, ee='a.pdf', title='foo')) == 'a.pdf|foo'
+    assert zen.journal.paper_key(dict(title='foo')) == 'foo'
+
+
+def test_paper_keys():
+    # DBLP gave these two papers of 2018 the same key.
+    papers = [dict(dblp_key='conf/ismir/LattnerGW18',
+                   title='A Predictive Model for Music based on Learned Interval Representations'),
+              dict(dblp_key='conf/ismir/LattnerGW18',
+                   title='Learning Interval Representations from Polyphonic Music Sequences')]
+    keys = zen.journal.paper_keys(papers)
+    assert len(set(keys)) == 2
+
+    with pytest.raises(ValueError):
+        zen.journal.paper_keys(papers + papers[:1])
+
+
+def test_completed():
+    assert not zen.journal.completed(dict(), 'created')
+    assert zen.journal.completed(dict(step='uploaded'), 'created')
+    assert zen.journal.completed(dict(step='uploaded'), 'uploaded')
+    assert not zen.journal.completed(dict(step='uploaded'), 'metadata')
+
+
+def test_Journal_for_output():
+    journal = zen.journal.Journal.for_output('/tmp/2019.json')
+    assert journal.path == '/tmp/2019.journal.jsonl'
+
+
+def test_Journal_record_replay(journal):
+    assert journal.replay() == dict()
+    journal.record('a', 'created', zenodo_id=1)
+    journal.record('b', 'created', zenodo_id=2)
+    journal.record('a', 'uploaded', zenodo_id=1, checksum='md5:abc')
+
+    states = journal.replay()
+    assert states['a'] == dict(step='uploaded', zenodo_id=1, checksum='md5:abc')
+    assert states['b'] == dict(step='created', zenodo_id=2)
+
+    with pytest.raises(ValueError):
+        journal.record('a', 'deleted')
+
+
+def test_Journal_replay_torn_line(journal):
+    journal.record('a', 'created', zenodo_id=1)
+    with open(journal.path, 'a') as fp:
+        fp.write('{"key": "a", "step": "uplo')
+    assert journal.replay()['a']['step'] == 'created'
+
+
+def test_Journal_apply(journal):
+    papers = [dict(title='x', author='y', year='2000', ee='x.pdf', pages='1-2',
+                   dblp_key='conf/ismir/X00', extra=dict(foo='bar')),
+              dict(title='z', author='y', year='2000', ee='z.pdf', pages='3-4',
+                   dblp_key='conf/ismir/Z00')]
+    journal.record('conf/ismir/X00|x', 'created', zenodo_id=1)
+    journal.record('conf/ismir/Z00|z', 'created', zenodo_id=2)
+    journal.record('conf/ismir/X00|x', 'published', zenodo_id=1, ee='http://x.pdf',
+                   doi='10.5072/zenodo.1', url='https://doi.org/10.5072/zenodo.1')
+
+    results = journal.apply(papers)
+    assert len(results) == 1
+    assert results[0]['zenodo_id'] == 1
+    assert results[0]['ee'] == 'http://x.pdf'
+    assert 'extra' not in results[0]
+
+
+def test_Journal_apply_shared_dblp_key(journal):
+    papers = [dict(title='x', author='y', year='2018', ee='x.pdf', pages='1-2',
+                   dblp_key='conf/ismir/X18'),
+              dict(title='z', author='y', year='2018', ee='z.pdf', pages='3-4',
+                   dblp_key='conf/ismir/X18')]
+    for zid, paper in enumerate(papers):
+        journal.record(zen.journal.paper_key(paper), 'published', zenodo_id=zid,
+                       ee='http://{}.pdf'.format(zid), doi='10.5072/zenodo.{}'.format(zid),
+                       url='https://doi.org/10.5072/zenodo.{}'.format(zid))
+
+    results = journal.apply(papers)
+    assert [paper['zenodo_id'] for paper in results] == [0, 1]
+
+    with pytest.raises(ValueError):
+        journal.apply(papers + papers[:1])
@@ -0,0 +1,115 @@
+import pytest
+
+import functools
+import hashlib
+import http.server
+import os
+import pickle
+import threading
+
+import zen.pdfcache
+
+
+@pytest.fixture()
+def cache(tmpdir):
+    return zen.pdfcache.PdfCache(os.path.join(str(tmpdir), 'cache'))
+
+
+class CountingHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests += 1
+        super().do_GET()
+
+
+@pytest.fixture()
+def pdf_server(resources_dir):
+    handler = functools.partial(CountingHandler, directory=resources_dir)
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    httpd.requests = 0
+    httpd.url = 'http://{}:{}'.format(*httpd.server_address)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def sha256(path):
+    with open(path, 'rb') as fp:
+        return hashlib.sha256(fp.read()).hexdigest()
+
+
+def test_pdf_url():
+    assert zen.pdfcache.pdf_url('http://a.org/x.pdf') == 'http://a.org/x.pdf'
+    assert zen.pdfcache.pdf_url(['http://doi.org/1', 'http://a.org/x.pdf']) == 'http://a.org/x.pdf'
+    assert zen.pdfcache.pdf_url(None) is None
+
+
+def test_aliases():
+    paper = dict(dblp_key='conf/ismir/Foo18', zenodo_id=123, ee='http://a.org/x.pdf')
+    assert zen.pdfcache.aliases(paper) == [
+        'dblp:conf/ismir/Foo18', 'zenodo:123', 'url:http://a.org/x.pdf']
+    assert zen.pdfcache.aliases(dict(title='foo')) == []
+
+
+def test_add_lookup_alias(cache, pdf_file):
+    path = cache.add(pdf_file, 'dblp:conf/ismir/Foo18')
+    assert os.path.basename(path) == sha256(pdf_file) + '.pdf'
+    assert sha256(path) == sha256(pdf_file)
+
+    assert cache.lookup('zenodo:1', 'dblp:conf/ismir/Foo18') == path
+    assert cache.lookup('zenodo:1') is None
+
+    cache.alias(path, 'zenodo:1')
+    assert cache.lookup('zenodo:1') == path
+
+    # Identical content is stored once.
+    assert cache.add(pdf_file, 'dblp:conf/ismir/Bar18') == path
+    assert cache.size() == os.path.getsize(pdf_file)
+
+
+def test_fetch_once(cache, pdf_server, pdf_file):
+    url = pdf_server.url + '/sample.pdf'
+    path = cache.resolve(dict(dblp_key='conf/ismir/Foo18', ee=url))
+    assert sha256(path) == sha256(pdf_file)
+    assert cache.resolve(dict(dblp_key='conf/ismir/Foo18', ee=url)) == path
+    assert pdf_server.requests == 1
+
+    # Without a URL, the other aliases find it.
+    assert cache.resolve(dict(dblp_key='conf/ismir/Foo18')) == path
+
+    # Another process sees the same store.
+    other = pickle.loads(pickle.dumps(cache))
+    assert other.resolve(dict(ee=url)) == path
+    assert pdf_server.requests == 1
+
+
+def test_fetch_error(cache, pdf_server):
+    with pytest.raises(zen.pdfcache.requests.HTTPError):
+        cache.fetch(pdf_server.url + '/missing.pdf')
+    assert os.listdir(os.path.join(cache.root, 'tmp')) == []
+
+
+def test_resolve_local(cache, pdf_file):
+    assert cache.resolve(dict(ee=pdf_file)) == pdf_file
+    assert cache.resolve(dict(title='no pdf')) is None
+
+
+def test_evict_lru(tmpdir):
+    cache = zen.pdfcache.PdfCache(str(tmpdir), max_bytes=250)
+    paths = []
+    for n in range(3):
+        src = os.path.join(str(tmpdir), '{}.pdf'.format(n))
+        with open(src, 'wb') as fp:
+            fp.write(bytes([n]) * 100)
+        paths.append(cache.add(src, 'key:{}'.format(n)))
+        if n == 1:
+            # Use the first one again, so the second is least recently used.
+            cache.lookup('key:0')
+
+    assert cache.size() == 200
+    assert cache.lookup('key:1') is None and not os.path.exists(paths[1])
+    assert cache.lookup('key:0') == paths[0]
+    assert cache.lookup('key:2') == paths[2]
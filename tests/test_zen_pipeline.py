@@ -0,0 +1,59 @@
+import pytest
+
+import threading
+import time
+
+import zen.pipeline
+
+
+def test_Pipeline_run():
+    pipeline = zen.pipeline.Pipeline([
+        zen.pipeline.Stage('double', lambda x: 2 * x, workers=3),
+        zen.pipeline.Stage('inc', lambda x: x + 1, workers=2)])
+    assert pipeline.run(range(50)) == [2 * x + 1 for x in range(50)]
+
+    stats = pipeline.stats()
+    assert stats['double']['processed'] == 50
+    assert stats['inc']['workers'] == 2
+    assert 0 <= stats['inc']['utilisation'] <= 1
+    assert 'double' in pipeline.report()
+
+
+def test_Pipeline_stage_workers():
+    state = dict(active=0, peak=0)
+    lock = threading.Lock()
+
+    def slow(x):
+        with lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+        time.sleep(0.01)
+        with lock:
+            state['active'] -= 1
+        return x
+
+    pipeline = zen.pipeline.Pipeline([
+        zen.pipeline.Stage('fast', lambda x: x, workers=4),
+        zen.pipeline.Stage('slow', slow, workers=2)], sample_interval=0.005)
+    pipeline.run(range(20))
+    assert state['peak'] == 2
+    assert pipeline.stats()['slow']['queue_max'] > 0
+    assert pipeline.stats()['slow']['utilisation'] > pipeline.stats()['fast']['utilisation']
+
+
+def test_Pipeline_errors():
+    def fail_on_three(x):
+        if x == 3:
+            raise ValueError(x)
+        return x
+
+    later = []
+    pipeline = zen.pipeline.Pipeline([
+        zen.pipeline.Stage('check', fail_on_three, workers=2),
+        zen.pipeline.Stage('keep', later.append)])
+    with pytest.raises(ValueError):
+        pipeline.run(range(10))
+
+    # Other items still went all the way through.
+    assert sorted(later) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+    assert pipeline.stats()['check']['failed'] == 1
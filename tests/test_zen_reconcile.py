@@ -0,0 +1,106 @@
+import pytest
+
+import json
+import os
+
+import zen.reconcile
+
+
+TEXT = '''<h2>Papers</h2>
+<ul>
+<li>Alexander Pacha, Jan Hajič, jr.:
+Learning Notation Graphs &amp; More.
+1-8
+<ee>https://example.org/1.pdf</ee>
+<li>Jonathan Donier:
+Cover Song Detection.
+
+<ee>https://example.org/2.pdf</ee>
+'''
+
+SUBMISSION = '''<?xml version="1.0" encoding="UTF-8" ?>
+<dblpsubmission><proceedings><toc>
+<publ><author>A. One</author><title>Augment, Drop & Swap</title><pages>9-12</pages>
+<doi>10.5281/zenodo.2</doi></publ>
+</toc></proceedings></dblpsubmission>'''
+
+RECORDS = '''<?xml version="1.0" encoding="UTF-8"?>
+<dblp>
+<proceedings key="conf/ismir/2025"><title>Proceedings</title></proceedings>
+<inproceedings key="conf/ismir/2025/one001"><author>A. One</author><author>B. Two</author>
+<title>Chord Recognition</title><pages>1-8</pages><year>2025</year>
+<ee>https://zenodo.org/record/1/files/1.pdf</ee><url>https://doi.org/10.5281/zenodo.1</url>
+</inproceedings>
+</dblp>'''
+
+
+def paper(title, author, pages=None, doi=None, dblp_key=None):
+    return dict(title=title, author=author, pages=pages, doi=doi, dblp_key=dblp_key)
+
+
+def test_parse_exports():
+    records = zen.reconcile.parse_text_export(TEXT, '2019')
+    assert [r['title'] for r in records] == ['Learning Notation Graphs & More',
+                                             'Cover Song Detection']
+    assert records[0]['author'] == ['Alexander Pacha', 'Jan Hajič, jr.']
+    assert [r['pages'] for r in records] == ['1-8', None]
+
+    record, = zen.reconcile.parse_xml_export(SUBMISSION, '2024')
+    assert record['title'] == 'Augment, Drop & Swap' and record['doi'] == '10.5281/zenodo.2'
+    assert record['dblp_key'] is None
+
+    record, = zen.reconcile.parse_xml_export(RECORDS, '2025')
+    assert record == dict(year='2025', title='Chord Recognition', author=['A. One', 'B. Two'],
+                          pages='1-8', doi='10.5281/zenodo.1', dblp_key='conf/ismir/2025/one001',
+                          ee='https://zenodo.org/record/1/files/1.pdf')
+
+
+def test_match():
+    papers = [paper('Chord Recognition', ['A. One', 'B. Two']),
+              paper('Beat Tracking', ['C. Three']),
+              paper('Chord Recognition Revisited', ['A. One']),
+              paper('Nothing Alike', ['D. Four'])]
+    records = [zen.reconcile.export_record('2020', title, author) for title, author in [
+        ('Chord recognition revisited.', ['A. One']),
+        ('Beat tracking', ['C. Three']),
+        ('Chord Recognition', ['B. Two', 'A. One']),
+        ('Something Else', ['E. Five'])]]
+    matches = zen.reconcile.match(papers, records)
+    assert [(position, index) for position, index, _ in matches] == [(0, 2), (1, 1), (2, 0)]
+    assert all(score >= zen.reconcile.MIN_SCORE for _, _, score in matches)
+
+
+def test_compare():
+    ours = paper('Chord Recognition', ['Gaël Richard', 'A. One'], '1 – 8', '10.5281/ZENODO.1')
+    theirs = zen.reconcile.export_record('2020', 'Chord recognition.', ['Gael Richard'],
+                                         '1-8', '10.5281/zenodo.1', 'conf/ismir/X20')
+    assert zen.reconcile.compare(ours, theirs) == dict(
+        author=(['Gaël Richard', 'A. One'], ['Gael Richard']))
+    theirs = dict(theirs, pages='2-9', doi='10.5281/zenodo.2', author=['Gael Richard', 'A One'])
+    assert sorted(zen.reconcile.compare(dict(ours, dblp_key='conf/ismir/Y20'), theirs)) == [
+        'dblp_key', 'doi', 'pages']
+
+
+def test_load_reconcile(tmpdir):
+    root = str(tmpdir.mkdir('database'))
+    os.makedirs(os.path.join(root, 'proceedings'))
+    for year, records in [('2019', [paper('Learning Notation Graphs & More',
+                                          ['Alexander Pacha', 'Jan Hajič, jr.'], '1-8'),
+                                    paper('Cover Song Detection', ['M. Sarfati', 'J. Donier'])]),
+                          ('2025', [paper('Chord Recognition', ['A. One', 'B. Two'], '1-8')]),
+                          ('2020', [paper('No export', ['A'])])]:
+        with open(os.path.join(root, 'proceedings', year + '.json'), 'w') as fp:
+            json.dump([dict(record, year=year) for record in records], fp)
+    for name, text in [('2019_dblp.html', TEXT), ('2025_dblp.html', ''),
+                       ('2025_dblp.xml', RECORDS)]:
+        with open(os.path.join(root, 'proceedings', name), 'w') as fp:
+            fp.write(text)
+
+    papers, exports = zen.reconcile.load(root)
+    assert sorted(papers) == sorted(exports) == ['2019', '2025']
+    results = zen.reconcile.reconcile(papers, exports)
+    assert results['2019']['mismatches'] == [
+        (1, 1, dict(author=(['M. Sarfati', 'J. Donier'], ['Jonathan Donier'])))]
+    assert results['2019']['keys'] == {}
+    assert results['2025']['keys'] == {0: 'conf/ismir/2025/one001'}
+    assert results['2025']['unmatched'] == results['2025']['unmatched_exports'] == []
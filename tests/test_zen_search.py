@@ -0,0 +1,112 @@
+import pytest
+
+import json
+import os
+
+import zen.search
+
+
+PAPERS = {
+    '2017': [dict(title='Chord Recognition', abstract='We recognise chords in audio.'),
+             dict(title='Beat Tracking', abstract='Beats, tempo and downbeats.')],
+    '2020': [dict(title='Chord Estimation with Deep Networks', abstract='Chord labels.'),
+             dict(title='Über Lyrics', abstract=None)]}
+
+
+def write_year(root, year, records):
+    with open(os.path.join(root, 'proceedings', year + '.json'), 'w') as fp:
+        json.dump([dict(record, author=['X'], year=year) for record in records], fp)
+
+
+@pytest.fixture()
+def database(tmpdir):
+    root = str(tmpdir.mkdir('database'))
+    os.makedirs(os.path.join(root, 'proceedings'))
+    for year, records in PAPERS.items():
+        write_year(root, year, records)
+    return root
+
+
+def test_tokenize():
+    assert zen.search.tokenize('The Über-Chord of music, 2nd') == [
+        'uber', 'chord', 'music', '2nd']
+    assert zen.search.tokenize(None) == []
+
+
+def test_build_search(database, tmpdir):
+    index_dir = os.path.join(str(tmpdir), 'index')
+    assert zen.search.build(database, index_dir) == ['2017', '2020']
+
+    with zen.search.Index(index_dir) as index:
+        assert index.num_docs == 4
+        results = index.search('chord')
+        # Unstemmed: 'chords' does not count, the second 'Chord' does.
+        assert [(r['year'], r['position']) for r in results] == [('2020', 0), ('2017', 0)]
+        assert results[1]['title'] == 'Chord Recognition'
+        assert results[0]['score'] > results[1]['score'] > 0
+
+        assert [r['title'] for r in index.search('uber')] == ['Über Lyrics']
+        assert index.search('the') == []
+        assert len(index.search('chord beat lyrics', limit=2)) == 2
+
+
+def test_build_incremental(database, tmpdir):
+    index_dir = os.path.join(str(tmpdir), 'index')
+    zen.search.build(database, index_dir)
+    assert zen.search.build(database, index_dir) == []
+
+    write_year(database, '2021', [dict(title='Chord Transcription', abstract='')])
+    os.remove(os.path.join(database, 'proceedings', '2017.json'))
+    assert zen.search.build(database, index_dir) == ['2017', '2021']
+    assert sorted(fn for fn in os.listdir(index_dir) if fn.endswith('.json')) == [
+        '.manifest.json', '2020.json', '2021.json']
+    assert len([fn for fn in os.listdir(index_dir) if fn.endswith('.bin')]) == 2
+
+    with zen.search.Index(index_dir) as index:
+        assert sorted(r['year'] for r in index.search('chord')) == ['2020', '2021']
+
+
+def test_scores_independent_of_segments(database, tmpdir):
+    index_dir = os.path.join(str(tmpdir), 'index')
+    zen.search.build(database, index_dir)
+    with zen.search.Index(index_dir) as index:
+        split = index.search('chord audio')
+
+    # The same papers as a single segment.
+    write_year(database, '2017', PAPERS['2017'] + PAPERS['2020'])
+    os.remove(os.path.join(database, 'proceedings', '2020.json'))
+    zen.search.build(database, index_dir)
+    with zen.search.Index(index_dir) as index:
+        merged = index.search('chord audio')
+
+    assert [r['title'] for r in split] == [r['title'] for r in merged]
+    assert [r['score'] for r in split] == pytest.approx([r['score'] for r in merged])
+
+
+def test_build_keeps_other_files(database, tmpdir):
+    index_dir = str(tmpdir.mkdir('index'))
+    for fn in ('notes.json', 'other.bin'):
+        with open(os.path.join(index_dir, fn), 'w') as fp:
+            fp.write('{}')
+    zen.search.build(database, index_dir)
+    os.remove(os.path.join(database, 'proceedings', '2017.json'))
+    assert zen.search.build(database, index_dir) == ['2017']
+
+    assert sorted(fn for fn in os.listdir(index_dir) if not fn.startswith('2020')) == [
+        '.manifest.json', 'notes.json', 'other.bin']
+    with zen.search.Index(index_dir) as index:
+        assert [segment.year for segment in index.segments] == ['2020']
+
+
+def test_search_empty(database, tmpdir):
+    with zen.search.Index(str(tmpdir.mkdir('empty'))) as index:
+        assert index.num_docs == 0
+        assert index.search('chord') == []
+
+    # Papers without any indexed term.
+    write_year(database, '2017', [dict(title='The', abstract=None)])
+    os.remove(os.path.join(database, 'proceedings', '2020.json'))
+    index_dir = os.path.join(str(tmpdir), 'index')
+    zen.search.build(database, index_dir)
+    with zen.search.Index(index_dir) as index:
+        assert index.search('the chord') == []
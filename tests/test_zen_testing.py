@@ -0,0 +1,99 @@
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+import zen.api
+import zen.testing
+
+
+@pytest.fixture()
+def fake():
+    with zen.testing.FakeZenodo(seed=0) as fake:
+        yield fake
+
+
+@pytest.fixture()
+def client(fake):
+    with zen.api.ZenodoClient(host=fake.host, token=fake.token,
+                              backoff_factor=0, jitter=0, max_throttled=2,
+                              rate_controller=zen.api.RateController()) as client:
+        yield client
+
+
+def test_FakeZenodo_roundtrip(fake, client, pdf_file):
+    zid = client.create_id()
+    resp = client.upload_file(zid, pdf_file)
+    assert resp['key'] == 'sample.pdf'
+
+    client.update_metadata(zid, dict(title='foo'))
+    resp = client.publish(zid)
+    assert resp['doi'] == '10.5072/zenodo.{}'.format(zid)
+    assert resp['doi_url'].endswith(resp['doi'])
+
+    deposition = client.get(zid)
+    assert deposition['metadata'] == dict(title='foo')
+    assert deposition['files'][0]['checksum'] == zen.api.md5sum(pdf_file)
+    assert len(client.list_items()) == 1
+
+    # Published depositions must be unlocked first.
+    with pytest.raises(zen.api.ZenodoApiError):
+        client.update_metadata(zid, dict(title='bar'))
+    client.edit(zid)
+    client.update_metadata(zid, dict(title='bar'))
+
+    # Their files stay locked.
+    with pytest.raises(zen.api.ZenodoApiError):
+        client.upload_file(zid, pdf_file)
+
+    assert fake.stats['create'] == 1
+    assert fake.stats['connections'] == 1
+
+
+def test_FakeZenodo_unauthorized(fake):
+    client = zen.api.ZenodoClient(host=fake.host, token='wrong')
+    with pytest.raises(zen.api.ZenodoApiError):
+        client.create_id()
+    assert fake.stats[401] == 1
+
+
+def test_FakeZenodo_not_found(client):
+    with pytest.raises(zen.api.ZenodoApiError):
+        client.get(999)
+
+
+def test_FakeZenodo_errors_are_retried(fake, client):
+    zids = [client.create_id() for _ in range(10)]
+    fake.error_rate, ok = 0.5, fake.stats[200]
+    for zid in zids:
+        client.get(zid)
+    assert fake.stats[503] > 0
+    assert fake.stats[200] == ok + 10
+
+    # A POST may have been acted on; it is not sent twice.
+    fake.error_rate = 1.0
+    with pytest.raises(zen.api.ZenodoApiError):
+        client.create_id()
+    assert fake.stats[201] == 10
+
+
+def test_FakeZenodo_throttle(fake, client):
+    fake.throttle_rate = 1.0
+    fake.retry_after = 0
+    with pytest.raises(zen.api.ZenodoApiError):
+        client.create_id()
+    assert fake.stats[429] == 1 + client.max_throttled
+
+
+def test_FakeZenodo_rate_limit(fake):
+    fake.rate_limit = 50
+    fake.retry_after = 0.1
+    controller = zen.api.RateController(max_concurrency=8)
+    client = zen.api.ZenodoClient(host=fake.host, token=fake.token,
+                                  rate_controller=controller)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        zids = list(pool.map(lambda _: client.create_id(), range(100)))
+
+    # Throttled requests are retried rather than failed.
+    assert sorted(zids) == list(range(1, 101))
+    assert fake.stats[429] > 0
+    assert controller.throttled == fake.stats[429]
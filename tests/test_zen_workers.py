@@ -0,0 +1,57 @@
+import pytest
+
+import os
+import time
+
+import zen.workers
+
+
+def square(x):
+    return x * x
+
+
+def misbehave(kind):
+    if kind == 'sleep':
+        time.sleep(60)
+    elif kind == 'raise':
+        raise ValueError('bad input')
+    elif kind == 'allocate':
+        return len(bytearray(1 << 34))
+    elif kind == 'exit':
+        os._exit(3)
+    return os.getpid()
+
+
+def test_num_workers():
+    assert zen.workers.num_workers(3) == 3
+    assert zen.workers.num_workers(-1) == os.cpu_count()
+    assert zen.workers.num_workers(-1000) == 1
+
+
+def test_imap_isolated():
+    results = list(zen.workers.imap_isolated(square, [(n,) for n in range(10)],
+                                             num_workers=3))
+    assert sorted(results) == [(n, zen.workers.OK, n * n) for n in range(10)]
+
+
+@pytest.mark.parametrize('kind,status', [
+    ('sleep', zen.workers.TIMEOUT),
+    ('raise', zen.workers.ERROR),
+    ('allocate', zen.workers.MEMORY),
+    ('exit', zen.workers.CRASHED)])
+def test_imap_isolated_failures(kind, status):
+    items = [('ok',), (kind,), ('ok',), ('ok',)]
+    now = time.monotonic()
+    results = dict((index, (s, value)) for index, s, value in zen.workers.imap_isolated(
+        misbehave, items, num_workers=1, timeout=1, max_memory=1 << 30))
+    assert time.monotonic() - now < 30
+
+    assert results[1][0] == status
+    assert all(results[n][0] == zen.workers.OK for n in (0, 2, 3))
+    if status == zen.workers.ERROR:
+        assert 'bad input' in results[1][1]
+        # The worker survives exceptions.
+        assert results[0][1] == results[2][1]
+    else:
+        # The worker was replaced.
+        assert results[0][1] != results[2][1] == results[3][1]
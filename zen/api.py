@@ -1,9 +1,17 @@
+import email.utils
 import functools
+import hashlib
 import io
 import json
 import logging
+import math
+import random
 import requests
+import requests.adapters
+import urllib3.exceptions
 import os
+import threading
+import time
 
 logger = logging.getLogger("zen.api")
 
@@ -13,8 +21,8 @@ PREFIX = dict(
     dev="10.5072",
     prod="10.5281")
 HOSTS = dict(
-    dev='https://sandbox.zenodo.org',
-    prod='https://zenodo.org')
+    dev=os.environ.get("ZENODO_HOST_DEV", 'https://sandbox.zenodo.org'),
+    prod=os.environ.get("ZENODO_HOST_PROD", 'https://zenodo.org'))
 TOKENS = dict(
     prod=os.environ.get("ZENODO_TOKEN_PROD"),
     dev=os.environ.get("ZENODO_TOKEN_DEV"))
@@ -23,15 +31,30 @@ HEADERS = {"Content-Type": "application/json"}
 UPLOAD_TYPES = ['publication', 'poster', 'presentation', 'dataset',
                 'image', 'video/audio', 'software', 'lesson']
 
+# Transient failures worth another attempt.
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Throttled responses; retried once the server says so.
+THROTTLE_STATUS = 429
+
+# Methods safe to send twice. Others (POST creates a deposition or publishes
+# it) are only retried when they never reached the server.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# Bytes read at a time when streaming uploads.
+CHUNK_SIZE = 1 << 20
+
 
 __ALL__ = ['create_id', 'upload_file', 'update_metadata',
-           'publish', 'list_items', 'ZenodoApiError']
+           'publish', 'edit', 'get', 'list_items', 'md5sum',
+           'ZenodoApiError', 'ZenodoClient', 'get_client', 'RateController',
+           'get_rate_controller']
 
 
-def _is_online():
+def _is_online(url='http://google.com'):
     online = True
     try:
-        requests.get('http://google.com')
+        requests.head(url, timeout=10)
     except requests.ConnectionError:
         online = False
     finally:
@@ -42,6 +65,704 @@ class ZenodoApiError(BaseException):
     pass
 
 
+class HashingReader(object):
+    '''File-like wrapper computing the MD5 of everything read through it.
+
+    Passing one of these as a request body makes `requests` stream it chunk by
+    chunk; `len` is the expected size, or None to use chunked encoding.
+
+    Parameters
+    ----------
+    fp : file-like
+        Open binary stream to read from.
+
+    length : int, default=None
+        Number of bytes remaining in `fp`, if known.
+
+    chunk_size : int, default=CHUNK_SIZE
+        Bytes per chunk when iterated.
+    '''
+
+    def __init__(self, fp, length=None, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.len = length
+        self.chunk_size = chunk_size
+        self.md5 = hashlib.md5()
+
+    def read(self, size=-1):
+        chunk = self.fp.read(size)
+        self.md5.update(chunk)
+        return chunk
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    @property
+    def checksum(self):
+        return 'md5:{}'.format(self.md5.hexdigest())
+
+
+def _never_sent(error):
+    '''Whether a request failed before a connection to the server was made.'''
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+def _parse_retry_after(value, now=None):
+    '''Seconds to wait given a `Retry-After` header (delay or HTTP date).'''
+    if value is None:
+        return None
+    try:
+        return max(0., float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0., when - (now or time.time()))
+
+
+def _parse_ratelimit_reset(value, now=None):
+    '''Seconds to wait given an `X-RateLimit-Reset` header (epoch seconds or
+    HTTP date); None if it cannot be parsed.'''
+    if not value:
+        return None
+    now = now or time.time()
+    try:
+        when = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError):
+            return None
+    if not math.isfinite(when):
+        return None
+    return max(0., when - now)
+
+
+class TokenBucket(object):
+    '''Thread-safe token bucket.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second.
+
+    burst : float, default=None
+        Maximum number of stored tokens; defaults to one second's worth.
+    '''
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1., rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        '''Take one token, sleeping until one is available.
+
+        Returns
+        -------
+        waited : float
+            Seconds spent waiting.
+        '''
+        waited = 0.
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateController(object):
+    '''Adaptive limit on requests to Zenodo, shared by all workers of a process.
+
+    Combines a token bucket, bounding the request rate, with an additive
+    increase / multiplicative decrease (AIMD) limit on requests in flight.
+    A throttled response (429) shrinks both and, following `Retry-After` or
+    an exhausted `X-RateLimit-Remaining`, pauses every worker until the given
+    time; each successful response grows them back towards their maxima.
+
+    Parameters
+    ----------
+    rate : float, default=None
+        Maximum requests per second; None for no rate limit.
+
+    burst : float, default=None
+        Token bucket size; defaults to one second's worth of `rate`.
+
+    max_concurrency : int, default=32
+        Maximum requests in flight.
+
+    min_concurrency : int, default=1
+        The in-flight limit never shrinks below this.
+
+    decrease : float, default=0.5
+        Factor applied to the limits on a throttled response.
+
+    default_retry_after : float, default=1
+        Pause, in seconds, when a 429 carries no `Retry-After`.
+    '''
+
+    def __init__(self, rate=None, burst=None, max_concurrency=32, min_concurrency=1,
+                 decrease=0.5, default_retry_after=1.):
+        self.max_rate = rate
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.decrease = decrease
+        self.default_retry_after = default_retry_after
+
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.throttled = 0
+        self._paused_until = 0.
+        self._cond = threading.Condition()
+
+    def set_rate(self, rate, burst=None):
+        '''Change the maximum requests per second (None to remove the limit).'''
+        with self._cond:
+            self.max_rate = rate
+            self.bucket = TokenBucket(rate, burst) if rate else None
+
+    def acquire(self):
+        '''Wait for a slot to send a request.'''
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    self._cond.wait(self._paused_until - now)
+                elif self.in_flight >= int(self.limit):
+                    self._cond.wait()
+                else:
+                    break
+            self.in_flight += 1
+            bucket = self.bucket
+
+        if bucket is not None:
+            bucket.acquire()
+
+    def release(self, response=None):
+        '''Return a slot, adapting the limits to the response received.
+
+        Parameters
+        ----------
+        response : requests.Response, default=None
+            Response to the request; None if it failed without one.
+
+        Returns
+        -------
+        delay : float or None
+            For throttled responses, seconds the server asked to wait.
+        '''
+        delay = None
+        headers = response.headers if response is not None else dict()
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            if response is not None and response.status_code == THROTTLE_STATUS:
+                self.throttled += 1
+                delay = _parse_retry_after(headers.get('Retry-After'))
+                if delay is None:
+                    delay = self.default_retry_after
+
+                # Requests already in flight will be throttled as well; only
+                # back off once per pause.
+                if now >= self._paused_until:
+                    self.limit = max(self.min_concurrency, self.limit * self.decrease)
+                    if self.bucket is not None:
+                        self.bucket.rate = max(1e-3, self.bucket.rate * self.decrease)
+                self._paused_until = max(self._paused_until, now + delay)
+
+            elif response is not None:
+                self.limit = min(self.max_concurrency, self.limit + 1. / self.limit)
+                if self.bucket is not None:
+                    self.bucket.rate = min(self.max_rate,
+                                           self.bucket.rate + self.max_rate / 100.)
+
+            if headers.get('X-RateLimit-Remaining') == '0':
+                wait = _parse_ratelimit_reset(headers.get('X-RateLimit-Reset'))
+                if wait is not None:
+                    self._paused_until = max(self._paused_until, now + min(60., wait))
+
+            self._cond.notify_all()
+
+        return delay
+
+
+_CONTROLLERS = dict()
+_CONTROLLERS_LOCK = threading.Lock()
+
+
+def get_rate_controller(stage=DEV):
+    '''Get the rate controller shared by all clients of a stage.
+
+    Parameters
+    ----------
+    stage : str
+        One of [dev, prod]; defines the deployment area to use.
+
+    Returns
+    -------
+    controller : RateController
+        Controller shared by every client of `stage` in this process.
+    '''
+    with _CONTROLLERS_LOCK:
+        if stage not in _CONTROLLERS:
+            _CONTROLLERS[stage] = RateController()
+        return _CONTROLLERS[stage]
+
+
+def md5sum(filepath, session=None, chunk_size=CHUNK_SIZE):
+    '''Compute the MD5 of a local file or URL without loading it in memory.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to a local file or a URL.
+
+    session : requests.Session, default=None
+        Session used to fetch URLs.
+
+    chunk_size : int, default=CHUNK_SIZE
+        Bytes read at a time.
+
+    Returns
+    -------
+    checksum : str
+        Hex digest, as reported in a deposition's file list.
+    '''
+    md5 = hashlib.md5()
+    if filepath.startswith('http'):
+        res = (session or requests).get(filepath, stream=True, timeout=60)
+        res.raise_for_status()
+        with res:
+            for chunk in res.iter_content(chunk_size):
+                md5.update(chunk)
+    else:
+        with open(filepath, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(chunk_size), b''):
+                md5.update(chunk)
+
+    return md5.hexdigest()
+
+
+def _remaining_length(fp):
+    try:
+        pos = fp.tell()
+        end = fp.seek(0, io.SEEK_END)
+        fp.seek(pos)
+        return end - pos
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class ZenodoClient(object):
+    '''Pooled, retrying client for the Zenodo deposition API.
+
+    One client holds a single keep-alive session for a given stage, so
+    consecutive calls reuse the same TCP / TLS connection. Connectivity is
+    checked once, against the Zenodo host itself, and the result is cached.
+
+    Parameters
+    ----------
+    stage : str
+        One of [dev, prod]; defines the deployment area to use.
+
+    token : str, default=None
+        Access token; defaults to the one configured for `stage`.
+
+    host : str, default=None
+        Base URL of the service; defaults to the one configured for `stage`.
+
+    pool_maxsize : int, default=10
+        Maximum number of connections kept alive in the pool.
+
+    max_retries : int, default=3
+        Number of retries for connection errors and transient 5xx responses;
+        POST requests are only retried if they could not connect.
+
+    backoff_factor : float, default=0.5
+        Base delay (seconds) of the exponential backoff between retries.
+
+    jitter : float, default=0.5
+        Upper bound (seconds) of the uniform random delay added to backoff.
+
+    timeout : float, default=60
+        Timeout (seconds) applied to each request.
+
+    rate_controller : RateController, default=None
+        Limits requests in flight and per second; defaults to the controller
+        shared by all clients of `stage`.
+
+    max_throttled : int, default=10
+        Number of times a throttled (429) request is retried.
+    '''
+
+    def __init__(self, stage=DEV, token=None, host=None, pool_maxsize=10,
+                 max_retries=3, backoff_factor=0.5, jitter=0.5, timeout=60,
+                 rate_controller=None, max_throttled=10):
+        self.stage = stage
+        self.token = token or TOKENS.get(stage)
+        self.host = (host or HOSTS[stage]).rstrip('/')
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.timeout = timeout
+        self.rate_controller = rate_controller or get_rate_controller(stage)
+        self.max_throttled = max_throttled
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._online = None
+        self._lock = threading.Lock()
+        self._buckets = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def is_online(self):
+        '''Check, once, whether the Zenodo host can be reached.'''
+        with self._lock:
+            if self._online is None:
+                try:
+                    self.session.head(self.host, timeout=self.timeout)
+                    self._online = True
+                except requests.ConnectionError:
+                    self._online = False
+        return self._online
+
+    def _backoff(self, attempt):
+        return (self.backoff_factor * (2 ** attempt) +
+                random.uniform(0, self.jitter))
+
+    def _request(self, method, path, body=None, **kwargs):
+        '''Send a request to the deposition API, retrying transient failures.
+
+        Parameters
+        ----------
+        method : str
+            HTTP verb.
+
+        path : str
+            Path relative to `/api/deposit/depositions`, or an absolute URL.
+
+        body : callable, default=None
+            Called before every attempt to produce a fresh request body, for
+            streams that cannot be re-sent once consumed.
+
+        **kwargs
+            Passed through to `requests.Session.request`.
+
+        Returns
+        -------
+        response : dict
+            Decoded JSON response.
+
+        Raises
+        ------
+        ZenodoApiError on failure
+        '''
+        if self.token is None:
+            raise EnvironmentError("Access token for '{}' is unset."
+                                   .format(self.stage))
+
+        if not self.is_online():
+            raise ZenodoApiError('not connected to the internet!')
+
+        url = path
+        if not path.startswith('http'):
+            url = '{host}/api/deposit/depositions{path}'.format(host=self.host,
+                                                                path=path)
+        params = dict(kwargs.pop('params', None) or {}, access_token=self.token)
+        kwargs.setdefault('timeout', self.timeout)
+
+        # A 5xx on a POST may come after the server acted on it.
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt, throttled = 0, 0
+        while True:
+            if body is not None:
+                kwargs['data'] = body()
+            self.rate_controller.acquire()
+            resp, error = None, None
+            try:
+                resp = self.session.request(method, url, params=params, **kwargs)
+            except requests.RequestException as derp:
+                error = derp
+            finally:
+                # Whatever happened, the slot goes back.
+                self.rate_controller.release(resp)
+
+            if error is not None:
+                if attempt >= self.max_retries or not (idempotent or _never_sent(error)):
+                    raise ZenodoApiError(str(error))
+                logger.debug('%s %s failed (%s), retrying', method, path, error)
+            else:
+                if resp.status_code == THROTTLE_STATUS and throttled < self.max_throttled:
+                    # The rate controller holds every worker until the
+                    # server is ready again.
+                    throttled += 1
+                    logger.debug('%s %s throttled, retrying', method, path)
+                    continue
+                elif (resp.status_code not in RETRY_STATUSES or not idempotent or
+                      attempt >= self.max_retries):
+                    break
+                logger.debug('%s %s returned %d, retrying',
+                             method, path, resp.status_code)
+
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+        if resp.status_code >= 300:
+            try:
+                raise ZenodoApiError(resp.json())
+            except ValueError:
+                raise ZenodoApiError(resp.text)
+
+        return resp.json()
+
+    def create_id(self):
+        '''Create a new Zenodo ID.
+
+        Returns
+        -------
+        zid : str or None
+            Returns a string ID on success, or None.
+
+        Raises
+        ------
+        ZenodoApiError on failure
+        '''
+        resp = self._request('post', '', data="{}", headers=HEADERS)
+        zid = resp.get('id')
+        bucket = resp.get('links', {}).get('bucket')
+        if bucket:
+            self._buckets[zid] = bucket
+        return zid
+
+    def bucket_url(self, zid):
+        '''Get the file bucket link of a deposition, fetching it if unknown.
+
+        Parameters
+        ----------
+        zid : int
+            Zenodo identifier
+
+        Returns
+        -------
+        url : str
+            URL of the deposition's file bucket.
+        '''
+        if zid not in self._buckets:
+            self._buckets[zid] = self.get(zid)['links']['bucket']
+        return self._buckets[zid]
+
+    def upload_file(self, zid, filepath, fp=None):
+        '''Stream a filepath (local or URL) to a deposition's file bucket.
+
+        The file is sent chunk by chunk, straight from disk or from the remote
+        response, so memory use does not depend on its size. The MD5 computed
+        while streaming is checked against the one reported by Zenodo.
+
+        Parameters
+        ----------
+        zid : int
+            Zenodo identifier
+
+        filepath : str
+            Path to a local file or a URL.
+
+        fp : bytestring or file iterator, or None
+            Optionally, the file pointer for uploading.
+
+        Returns
+        -------
+        response : dict
+            Response object from Zenodo.
+
+        Raises
+        ------
+        ZenodoApiError on failure, if a URL source cannot be read, or if the
+        checksums disagree.
+        '''
+        url = '{}/{}'.format(self.bucket_url(zid), os.path.basename(filepath))
+        if isinstance(fp, bytes):
+            fp = io.BytesIO(fp)
+        start = None
+        if fp is not None and getattr(fp, 'seekable', lambda: False)():
+            start = fp.tell()
+        readers, handles = [], []
+
+        def body():
+            if fp is not None:
+                if readers and start is None:
+                    raise ZenodoApiError('cannot retry an upload from a '
+                                         'non-seekable stream')
+                elif readers:
+                    fp.seek(start)
+                src = fp
+            elif filepath.startswith('http'):
+                # A missing source is not a failure of Zenodo; name it.
+                try:
+                    res = self.session.get(filepath, stream=True, timeout=self.timeout)
+                    handles.append(res)
+                    res.raise_for_status()
+                except requests.RequestException as derp:
+                    raise ZenodoApiError('cannot read {}: {}'.format(filepath, derp))
+                res.raw.decode_content = True
+                src = res.raw
+            else:
+                src = open(filepath, 'rb')
+                handles.append(src)
+
+            length = _remaining_length(src)
+            if length is None and filepath.startswith('http'):
+                length = handles[-1].headers.get('Content-Length')
+                if length is not None and not handles[-1].headers.get('Content-Encoding'):
+                    length = int(length)
+                else:
+                    length = None
+
+            readers.append(HashingReader(src, length))
+            return readers[-1]
+
+        try:
+            resp = self._request(
+                'put', url, body=body,
+                headers={"Content-Type": "application/octet-stream"})
+        finally:
+            for handle in handles:
+                handle.close()
+
+        if resp.get('checksum') != readers[-1].checksum:
+            raise ZenodoApiError('checksum mismatch for {}: local={}, remote={}'
+                                 .format(url, readers[-1].checksum,
+                                         resp.get('checksum')))
+        return resp
+
+    def update_metadata(self, zid, metadata):
+        '''Update a record's metadata given a Zenodo ID.
+
+        Parameters
+        ----------
+        zid : int
+            Requested Zenodo ID.
+
+        metadata : dict
+            Zenodo metadata object; see ... for more info.
+
+        Returns
+        -------
+        response : dict
+            Zenodo repsonse object.
+            See ... for more details.
+        '''
+        data = {"metadata": metadata}
+        return self._request('put', '/{}'.format(zid),
+                             data=json.dumps(data), headers=HEADERS)
+
+    def publish(self, zid):
+        '''Publish a staged deposition for a given Zenodo ID.
+
+        Parameters
+        ----------
+        zid : int
+            Requested Zenodo ID.
+
+        Returns
+        -------
+        response : dict
+            Zenodo repsonse object.
+            See ... for more details.
+        '''
+        return self._request('post', '/{}/actions/publish'.format(zid))
+
+    def edit(self, zid):
+        '''Unlock a published deposition for changes, given a Zenodo ID.
+
+        Parameters
+        ----------
+        zid : int
+            Requested Zenodo ID.
+
+        Returns
+        -------
+        response : dict
+            Zenodo repsonse object.
+            See ... for more details.
+        '''
+        return self._request('post', '/{}/actions/edit'.format(zid))
+
+    def get(self, zid):
+        '''Get the resource for a given Zenodo ID.
+
+        Parameters
+        ----------
+        zid : int
+            Requested Zenodo ID.
+
+        Returns
+        -------
+        response : dict
+            Zenodo repsonse object.
+            See ... for more details.
+        '''
+        return self._request('get', '/{}'.format(zid))
+
+    def list_items(self):
+        return self._request('get', '/')
+
+
+_CLIENTS = dict()
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(stage=DEV):
+    '''Get the shared client for a given stage, creating it on first use.
+
+    Parameters
+    ----------
+    stage : str
+        One of [dev, prod]; defines the deployment area to use.
+
+    Returns
+    -------
+    client : ZenodoClient
+        Client shared by all module-level calls in this process.
+    '''
+    with _CLIENTS_LOCK:
+        if stage not in _CLIENTS:
+            _CLIENTS[stage] = ZenodoClient(stage)
+        return _CLIENTS[stage]
+
+
 def verify_token(func):
     @functools.wraps(func)
     def wrapped(*args, **kwargs):
@@ -52,9 +773,6 @@ def verify_token(func):
         if TOKENS[stage] is None:
             raise EnvironmentError("Access token for '{}' is unset.".format(stage))
 
-        if not _is_online():
-            raise ZenodoApiError('not connected to the internet!')
-
         return func(*args, **kwargs)
     return wrapped
 
@@ -77,15 +795,7 @@ def create_id(stage=DEV):
     ------
     ZenodoApiError on failure
     """
-    resp = requests.post(
-        '{host}/api/deposit/depositions?access_token={token}'
-        .format(host=HOSTS[stage], token=TOKENS[stage]),
-        data="{}", headers=HEADERS)
-
-    if resp.status_code >= 300:
-        raise ZenodoApiError(resp.json())
-
-    return resp.json().get('id')
+    return get_client(stage).create_id()
 
 
 @verify_token
@@ -108,23 +818,7 @@ def upload_file(zid, filepath, fp=None, stage=DEV):
     response : dict
         Response object from Zenodo.
     '''
-    basename = os.path.basename(filepath)
-    fext = os.path.splitext(filepath)[-1].strip('.')
-    if filepath.startswith('http') and fp is None:
-        res = requests.get(filepath)
-        fp = io.BytesIO(res.content)
-
-    files = {'file': (basename, fp or open(filepath, 'rb'),
-                      'application/{}'.format(fext))}
-    resp = requests.post(
-        "{host}/api/deposit/depositions/{zid}/"
-        "files?access_token={token}".format(zid=zid, token=TOKENS[stage],
-                                            host=HOSTS[stage]),
-        files=files)
-    if resp.status_code >= 300:
-        raise ZenodoApiError(resp.json())
-
-    return resp.json()
+    return get_client(stage).upload_file(zid, filepath, fp=fp)
 
 
 @verify_token
@@ -145,15 +839,7 @@ def update_metadata(zid, metadata, stage=DEV):
         Zenodo repsonse object.
         See ... for more details.
     '''
-    data = {"metadata": metadata}
-    resp = requests.put(
-        "{host}/api/deposit/depositions/{zid}"
-        "?access_token={token}".format(zid=zid, token=TOKENS[stage],
-                                       host=HOSTS[stage]),
-        data=json.dumps(data), headers=HEADERS)
-    if resp.status_code >= 300:
-        raise ZenodoApiError(resp.json())
-    return resp.json()
+    return get_client(stage).update_metadata(zid, metadata)
 
 
 @verify_token
@@ -171,14 +857,25 @@ def publish(zid, stage=DEV):
         Zenodo repsonse object.
         See ... for more details.
     '''
-    resp = requests.post(
-        "{host}/api/deposit/depositions/{zid}/"
-        "actions/publish?access_token={token}".format(zid=zid,
-                                                      token=TOKENS[stage],
-                                                      host=HOSTS[stage]))
-    if resp.status_code >= 300:
-        raise ZenodoApiError(resp.json())
-    return resp.json()
+    return get_client(stage).publish(zid)
+
+
+@verify_token
+def edit(zid, stage=DEV):
+    '''Unlock a published deposition for changes, given a Zenodo ID.
+
+    Parameters
+    ----------
+    zid : int
+        Requested Zenodo ID.
+
+    Returns
+    -------
+    response : dict
+        Zenodo repsonse object.
+        See ... for more details.
+    '''
+    return get_client(stage).edit(zid)
 
 
 @verify_token
@@ -196,22 +893,9 @@ def get(zid, stage=DEV):
         Zenodo repsonse object.
         See ... for more details.
     '''
-    resp = requests.get(
-        "{host}/api/deposit/depositions/{zid}"
-        "?access_token={token}".format(zid=zid,
-                                       token=TOKENS[stage],
-                                       host=HOSTS[stage]))
-    if resp.status_code >= 300:
-        raise ZenodoApiError(resp.json())
-    return resp.json()
+    return get_client(stage).get(zid)
 
 
 @verify_token
 def list_items(stage=DEV):
-    resp = requests.get(
-        "{host}/api/deposit/depositions/?access_token={token}"
-        .format(token=TOKENS[stage], host=HOSTS[stage]))
-
-    if resp.status_code >= 300:
-        raise ZenodoApiError(resp.json())
-    return resp.json()
+    return get_client(stage).list_items()
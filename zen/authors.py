@@ -0,0 +1,254 @@
+'''Author index of the proceedings, with spelling variants grouped.
+
+Author names are spelled differently across years: with or without
+diacritics, middle names or initials, hyphens, and stray whitespace. The
+index normalises every name, groups the variants of one person, and
+precomputes for each person their papers and collaborators:
+
+    index = zen.authors.load()
+    index.papers('Juan P. Bello')        # [(year, position), ...]
+    index.collaborators('J. P. Bello')   # {'Brian McFee': 4, ...}
+    index.variants('Juan Bello')         # ['Juan P. Bello', 'Juan Pablo Bello', ...]
+
+Names of one person share a surname and a first given name, where an
+initial stands for the only given name of the surname it can abbreviate;
+an initial that fits several people is kept apart. The index is cached on
+disk, keyed by the hash of the corpus, and rebuilt when any year changes.
+'''
+import collections
+import json
+import logging
+import os
+import re
+import unicodedata
+
+import zen.corpus
+
+logger = logging.getLogger("zen.authors")
+
+# Bump on any change to the grouping or the cache layout.
+FORMAT_VERSION = 2
+
+# Default directory of the cached index.
+AUTHORS_CACHE = os.path.join('~', '.cache', 'conference-archive', 'authors')
+
+# Name suffixes ignored when matching.
+SUFFIXES = frozenset(['jr', 'sr', 'ii', 'iii', 'iv'])
+
+# Innermost parenthesised text, such as an affiliation.
+_PARENTHESES = re.compile(r'\([^()]*\)')
+
+
+def normalize_name(name):
+    '''Comparable form of an author name.
+
+    Parenthesised text (affiliations, possibly nested), diacritics, case,
+    dots, hyphens, apostrophes, commas, suffixes such as 'Jr.' and repeated
+    whitespace are removed.
+
+    Parameters
+    ----------
+    name : str
+        Author name, as spelled in a record.
+
+    Returns
+    -------
+    key : str
+        Normalised name, e.g. 'gael richard' for ' Gaël  Richard'.
+    '''
+    # Inside out, so that nested parentheses go too.
+    while '(' in name:
+        name, count = _PARENTHESES.subn(' ', name)
+        if not count:
+            break
+    if not name.isascii():
+        name = unicodedata.normalize('NFKD', name)
+        name = ''.join(char for char in name if not unicodedata.combining(char))
+    name = name.casefold()
+    name = re.sub(r"[-'’]", '', name)
+    return ' '.join(token for token in re.sub(r'[\W_]+', ' ', name).split()
+                    if token not in SUFFIXES)
+
+
+def _person_key(key):
+    # (surname, first given name); the latter may be an initial.
+    tokens = key.split()
+    if len(tokens) < 2:
+        return key, ''
+    return tokens[-1], tokens[0]
+
+
+def _display_name(name):
+    return ' '.join(name.split())
+
+
+class AuthorIndex(object):
+    '''Authors of a corpus, their papers and their collaborators.
+
+    Use `build` or `load` rather than the constructor.
+
+    Parameters
+    ----------
+    authors : dict
+        Canonical name to a dict with the `variants` spellings and the
+        `papers` as [year, position] pairs.
+
+    names : dict
+        Normalised spelling to canonical name.
+
+    coauthors : dict
+        Canonical name to a dict of canonical collaborator names and their
+        number of joint papers.
+    '''
+
+    def __init__(self, authors, names, coauthors):
+        self.authors = authors
+        self.names = names
+        self.coauthors = coauthors
+
+        # Spellings not in the corpus are matched on surname and first given
+        # name, or an unambiguous initial.
+        self._people = dict()
+        initials = collections.defaultdict(set)
+        for key, canonical in names.items():
+            surname, given = _person_key(key)
+            self._people[surname, given] = canonical
+            initials[surname, given[:1]].add(canonical)
+        self._initials = dict((person, canonicals.pop())
+                              for person, canonicals in initials.items() if len(canonicals) == 1)
+
+    @classmethod
+    def build(cls, corpus):
+        '''Index the authors of a corpus.
+
+        Parameters
+        ----------
+        corpus : zen.corpus.Corpus
+            Papers to index.
+
+        Returns
+        -------
+        index : AuthorIndex
+        '''
+        spellings = collections.defaultdict(collections.Counter)
+        refs = []
+        for year in corpus.years:
+            for position, paper in enumerate(corpus.papers(year)):
+                keys = []
+                for name in paper['author'] or []:
+                    key = normalize_name(name)
+                    if key:
+                        spellings[key][_display_name(name)] += 1
+                        keys.append(key)
+                refs.append(((year, position), keys))
+
+        # Group spellings by person: full first names first, then initials
+        # that abbreviate exactly one of them.
+        people = collections.defaultdict(list)
+        for key in spellings:
+            people[_person_key(key)].append(key)
+        person_of = dict()
+        full = collections.defaultdict(list)
+        for (surname, given), keys in people.items():
+            if len(given) > 1:
+                full[surname, given[:1]].append((surname, given))
+        for (surname, given), keys in people.items():
+            candidates = full.get((surname, given), []) if len(given) == 1 else []
+            person = candidates[0] if len(candidates) == 1 else (surname, given)
+            for key in keys:
+                person_of[key] = person
+
+        variants = collections.defaultdict(collections.Counter)
+        for key, counts in spellings.items():
+            variants[person_of[key]].update(counts)
+        # The most frequent spelling names the person; the longest on ties.
+        canonical = dict((person, max(counts, key=lambda name: (counts[name], len(name), name)))
+                         for person, counts in variants.items())
+
+        authors = dict((name, dict(variants=sorted(variants[person]), papers=[]))
+                       for person, name in canonical.items())
+        names = dict((key, canonical[person]) for key, person in person_of.items())
+        coauthors = dict((name, collections.Counter()) for name in authors)
+        for ref, keys in refs:
+            paper_authors = list(dict.fromkeys(names[key] for key in keys))
+            for name in paper_authors:
+                authors[name]['papers'].append(list(ref))
+                coauthors[name].update(other for other in paper_authors if other != name)
+
+        coauthors = dict((name, dict(counts)) for name, counts in coauthors.items())
+        return cls(authors, names, coauthors)
+
+    def find(self, name):
+        '''Canonical name of an author, from any spelling; None if unknown.'''
+        key = normalize_name(name)
+        if key in self.names:
+            return self.names[key]
+        surname, given = _person_key(key)
+        if (surname, given) in self._people:
+            return self._people[surname, given]
+        return self._initials.get((surname, given[:1])) if len(given) == 1 else None
+
+    def papers(self, name):
+        '''Papers of an author as (year, position) pairs, in order.'''
+        canonical = self.find(name)
+        if canonical is None:
+            return []
+        return [tuple(ref) for ref in self.authors[canonical]['papers']]
+
+    def collaborators(self, name):
+        '''Co-authors of an author, with their number of joint papers.'''
+        return dict(self.coauthors.get(self.find(name), {}))
+
+    def variants(self, name):
+        '''Spellings of an author's name found in the corpus.'''
+        canonical = self.find(name)
+        return list(self.authors[canonical]['variants']) if canonical is not None else []
+
+    def to_json(self):
+        return dict(version=FORMAT_VERSION, authors=self.authors, names=self.names,
+                    coauthors=self.coauthors)
+
+    @classmethod
+    def from_json(cls, obj):
+        return cls(obj['authors'], obj['names'], obj['coauthors'])
+
+
+def load(database_dir=zen.corpus.DATABASE_DIR, cache_dir=AUTHORS_CACHE):
+    '''The author index of a corpus, from the cache if it is up to date.
+
+    Parameters
+    ----------
+    database_dir : str, default=zen.corpus.DATABASE_DIR
+        Directory holding `proceedings/<year>.json`.
+
+    cache_dir : str, default=AUTHORS_CACHE
+        Directory of the cached index; None disables caching.
+
+    Returns
+    -------
+    index : AuthorIndex
+    '''
+    if cache_dir is None:
+        return AuthorIndex.build(zen.corpus.Corpus(database_dir))
+
+    cache_dir = os.path.expanduser(cache_dir)
+    path = os.path.join(cache_dir, 'authors-{}-{}.json'.format(
+        FORMAT_VERSION, zen.corpus.corpus_hash(database_dir)))
+    try:
+        with open(path, encoding='utf-8') as fp:
+            return AuthorIndex.from_json(json.load(fp))
+    except (OSError, ValueError):
+        pass
+
+    index = AuthorIndex.build(zen.corpus.Corpus(database_dir))
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as fp:
+        json.dump(index.to_json(), fp)
+    os.replace(path + '.tmp', path)
+    logger.info('cached %d authors in %s', len(index.authors), path)
+
+    for fn in os.listdir(cache_dir):
+        if fn.startswith('authors-') and fn.endswith('.json') and \
+                os.path.join(cache_dir, fn) != path:
+            os.remove(os.path.join(cache_dir, fn))
+    return index
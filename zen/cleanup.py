@@ -0,0 +1,145 @@
+'''Normalisation of text extracted from PDFs.
+
+A `Cleaner` runs the chain of `str.replace` calls `extract_abstract` always
+used, completed and made extensible: characters from a translation table
+(ligatures, invisible characters) first, then literal replacements (line-end
+hyphenation, line breaks, space runs), each repeated until it no longer
+matches, then optional regular expression rules:
+
+    # tabs too, and no space before punctuation
+    clean = zen.cleanup.Cleaner(
+        translations=dict(zen.cleanup.LIGATURES, **zen.cleanup.INVISIBLE,
+                          **zen.cleanup.WHITESPACE),
+        rules=[(r' ([,.;:])', r'\1')])
+    abstract = clean(raw_text)
+
+Every step is a `str` method, and non-ASCII characters are only looked for
+until none is left; on pdfminer output this is about as fast as the original
+chain, where a single regular expression with a replacement callback, or
+`str.translate`, is several times slower.
+'''
+import re
+
+# Typographic ligatures pdfminer emits as single characters, the most
+# frequent first.
+LIGATURES = {
+    '\ufb01': 'fi',
+    '\ufb02': 'fl',
+    '\ufb00': 'ff',
+    '\ufb03': 'ffi',
+    '\ufb04': 'ffl',
+    '\ufb05': 'st',
+    '\ufb06': 'st',
+}
+
+# Characters with no visible width, dropped.
+INVISIBLE = {
+    '\u00ad': None,  # soft hyphen
+    '\u200b': None,  # zero width space
+    '\ufeff': None,  # byte order mark
+}
+
+# Whitespace other than line breaks, made a plain space. pdfminer does not
+# emit it within a page, so it is not translated by default.
+WHITESPACE = {
+    '\t': ' ',
+    '\r': ' ',
+    '\x0b': ' ',
+    '\x0c': ' ',  # page break
+}
+
+# Literal replacements, applied in order: words hyphenated across a line
+# break are joined, other line breaks become spaces, then space runs are
+# collapsed.
+REPLACEMENTS = [
+    ('-\n', ''),
+    ('\n', ' '),
+    ('  ', ' '),
+]
+
+# Regular expression rules, none by default.
+RULES = []
+
+
+class Cleaner(object):
+    '''Text normaliser from a translation table, literal replacements and
+    pattern rules.
+
+    Parameters
+    ----------
+    translations : dict, default=None
+        Characters (or ordinals) to their replacement string, or None to drop
+        them; LIGATURES and INVISIBLE if None.
+
+    replacements : list of (str, str), default=None
+        Substrings and their replacements, applied in order, each until the
+        text no longer contains it; REPLACEMENTS if None.
+
+    rules : list of (str, str), default=None
+        Regular expressions and their replacements, as for `re.sub`, applied
+        in order after the replacements; RULES if None.
+
+    Raises
+    ------
+    ValueError
+        If a replacement is empty, or contains its own substring, so that
+        repeating it would never end.
+    '''
+
+    def __init__(self, translations=None, replacements=None, rules=None):
+        if translations is None:
+            translations = dict(LIGATURES, **INVISIBLE)
+        if replacements is None:
+            replacements = REPLACEMENTS
+        if rules is None:
+            rules = RULES
+
+        table = [(chr(char) if isinstance(char, int) else char,
+                  '' if repl is None else repl)
+                 for char, repl in translations.items()]
+        # Texts are mostly ASCII once their ligatures are replaced: the
+        # other characters are only looked for until they are. The ASCII
+        # ones are replaced like substrings, first.
+        self.non_ascii = [(char, repl) for char, repl in table if not char.isascii()]
+        replacements = [(char, repl) for char, repl in table if char.isascii()] + \
+            list(replacements)
+
+        for old, new in replacements:
+            if not old or old in new:
+                raise ValueError('Replacement of {!r} by {!r} does not '
+                                 'terminate'.format(old, new))
+        self.replacements = replacements
+
+        self.rules = [(re.compile(pattern), repl) for pattern, repl in rules]
+
+    def __call__(self, text):
+        '''Clean a text.
+
+        Parameters
+        ----------
+        text : str
+            Raw text.
+
+        Returns
+        -------
+        clean : str
+            Translated text with all replacements and rules applied,
+            stripped.
+        '''
+        if not text.isascii():
+            for char, repl in self.non_ascii:
+                if char in text:
+                    text = text.replace(char, repl)
+                    if text.isascii():
+                        break
+        text = text.strip()
+        for old, new in self.replacements:
+            while old in text:
+                text = text.replace(old, new)
+        for regex, repl in self.rules:
+            text = regex.sub(repl, text)
+        return text.strip()
+
+
+# Cleaner with the default rules, as used on extracted abstracts.
+clean = Cleaner()
@@ -0,0 +1,286 @@
+'''Lazy, indexed access to the metadata of all ISMIR proceedings.
+
+The proceedings are discovered as `database/proceedings/<year>.json`, next to
+`database/conferences.json`; a year is only read the first time it is asked
+for. Papers come back normalised to one schema (see `normalize_paper`) and
+can be looked up in O(1) by DOI, Zenodo id, DBLP key, PDF URL or normalised
+title:
+
+    corpus = zen.corpus.Corpus()
+    corpus.papers(2018)
+    corpus.get('zenodo_id', 1492333)
+    corpus.lookup('title', 'A Confidence Measure for Key Labelling')
+
+`lookup` loads the whole corpus first, to return every match; `get` reads the
+years not loaded yet one at a time and stops at the first one holding the
+key. Once loaded, every lookup is a dict access.
+'''
+import difflib
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import unicodedata
+
+logger = logging.getLogger("zen.corpus")
+
+DATABASE_DIR = os.path.join(os.path.dirname(__file__), os.path.pardir, 'database')
+
+# Fields with a hash index; see `index_key` for how values are normalised.
+INDEXES = ('doi', 'zenodo_id', 'dblp_key', 'ee', 'title')
+
+
+def normalize_title(title):
+    '''Comparable form of a title: casefolded, accents, punctuation and
+    repeated whitespace removed.
+
+    Parameters
+    ----------
+    title : str
+        Paper title.
+
+    Returns
+    -------
+    key : str
+        Normalised title.
+    '''
+    if not title.isascii():
+        title = unicodedata.normalize('NFKD', title)
+        title = ''.join(char for char in title if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[\W_]+', ' ', title.casefold()).split())
+
+
+def index_key(field, value):
+    '''Normalised value of a field, as stored in its index.
+
+    Parameters
+    ----------
+    field : str
+        One of INDEXES.
+
+    value : object
+        Value of the field in a record, or one to look up.
+
+    Returns
+    -------
+    key : object or None
+        Key of the value in the index, None if it is not indexed.
+    '''
+    if value is None or value == '':
+        return None
+    elif field == 'title':
+        return normalize_title(value)
+    elif field == 'zenodo_id':
+        return int(value)
+    elif field == 'doi':
+        # DOIs are case-insensitive.
+        return value.lower()
+    return value
+
+
+def normalize_paper(record):
+    '''Bring a paper record to the schema of the current proceedings.
+
+    The files drifted over the years: 2020 spells `Abstract` with a capital,
+    papers before 2018 have no `pages`, single authors are a plain string,
+    and some years store `year` as int or `zenodo_id` as str.
+
+    Parameters
+    ----------
+    record : dict
+        Paper record, as stored.
+
+    Returns
+    -------
+    paper : dict
+        A normalised copy, with every field of `zen.models.IsmirPaper`.
+    '''
+    paper = dict(record)
+    if 'Abstract' in paper:
+        paper['abstract'] = paper.pop('Abstract') or paper.get('abstract')
+    paper.setdefault('abstract', None)
+    paper.setdefault('pages', None)
+    for field in ('doi', 'url', 'ee', 'zenodo_id', 'dblp_key'):
+        paper.setdefault(field, None)
+
+    if isinstance(paper.get('author'), str):
+        paper['author'] = [paper['author']]
+    if paper.get('year') is not None:
+        paper['year'] = str(paper['year'])
+    if paper['zenodo_id'] not in (None, ''):
+        paper['zenodo_id'] = int(paper['zenodo_id'])
+    return paper
+
+
+def proceedings_files(root=DATABASE_DIR):
+    '''Proceedings metadata files of a database directory, keyed by year.'''
+    return dict((os.path.splitext(os.path.basename(fn))[0], fn)
+                for fn in glob.glob(os.path.join(root, 'proceedings', '*.json')))
+
+
+def corpus_hash(root=DATABASE_DIR):
+    '''Hex SHA-256 over the names and contents of all proceedings files.
+
+    Caches derived from the whole corpus are keyed by it.
+    '''
+    sha = hashlib.sha256()
+    for year, filename in sorted(proceedings_files(root).items()):
+        with open(filename, 'rb') as fp:
+            sha.update(year.encode('utf-8'))
+            sha.update(hashlib.sha256(fp.read()).digest())
+    return sha.hexdigest()
+
+
+def dumps_like(records, text):
+    '''Serialise records in the format of the JSON text they were read from.
+
+    The files were written by different tools over the years: their
+    indentation, escaping of non-ASCII characters and final newline differ.
+    The indentation and escaping are taken from `text`, and every line whose
+    content did not change is copied from it as is, so a diff of the file
+    only shows the changed values.
+
+    Parameters
+    ----------
+    records : object
+        Updated content of `text`.
+
+    text : str
+        Original JSON text, as written with an indentation.
+
+    Returns
+    -------
+    new_text : str
+    '''
+    match = re.search(r'\n( +)\S', text)
+    options = dict(indent=len(match.group(1)) if match else None,
+                   ensure_ascii=text.isascii())
+    new_lines = json.dumps(records, **options).split('\n')
+    old_lines = json.dumps(json.loads(text), **options).split('\n')
+    lines = text.rstrip('\n').split('\n')
+
+    # Same structure, line for line: keep the original of unchanged lines.
+    if len(lines) == len(old_lines):
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        merged = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            merged.extend(lines[i1:i2] if tag == 'equal' else new_lines[j1:j2])
+        if json.loads('\n'.join(merged)) == records:
+            new_lines = merged
+    return '\n'.join(new_lines) + ('\n' if text.endswith('\n') else '')
+
+
+class Corpus(object):
+    '''All proceedings and conferences, loaded on demand.
+
+    Parameters
+    ----------
+    root : str, default=DATABASE_DIR
+        Directory holding `conferences.json` and `proceedings/<year>.json`.
+    '''
+
+    def __init__(self, root=DATABASE_DIR):
+        self.root = os.path.abspath(root)
+        self._files = proceedings_files(self.root)
+        self._years = sorted(self._files)
+        self._papers = dict()
+        self._conferences = None
+        self._indexes = dict((field, dict()) for field in INDEXES)
+
+    @property
+    def years(self):
+        '''Years with a proceedings file, in order; nothing is loaded.'''
+        return list(self._years)
+
+    @property
+    def conferences(self):
+        '''Conference metadata, keyed by year.'''
+        if self._conferences is None:
+            with open(os.path.join(self.root, 'conferences.json'), encoding='utf-8') as fp:
+                self._conferences = json.load(fp)
+        return self._conferences
+
+    def papers(self, year):
+        '''Normalised papers of one year, read on first access.
+
+        Parameters
+        ----------
+        year : int or str
+            Year of the proceedings.
+
+        Returns
+        -------
+        papers : list of dict
+            Papers in the order of the file.
+
+        Raises
+        ------
+        KeyError
+            If there is no proceedings file for `year`.
+        '''
+        year = str(year)
+        if year not in self._papers:
+            with open(self._files[year], encoding='utf-8') as fp:
+                papers = [normalize_paper(record) for record in json.load(fp)]
+            for paper in papers:
+                for field, index in self._indexes.items():
+                    key = index_key(field, paper.get(field))
+                    if key is not None:
+                        index.setdefault(key, []).append(paper)
+            self._papers[year] = papers
+            logger.debug('loaded %d papers of %s', len(papers), year)
+        return self._papers[year]
+
+    def __iter__(self):
+        for year in self.years:
+            yield from self.papers(year)
+
+    def __len__(self):
+        return sum(len(self.papers(year)) for year in self.years)
+
+    def load(self):
+        '''Read every year not loaded yet.'''
+        for year in self.years:
+            self.papers(year)
+        return self
+
+    def lookup(self, field, value):
+        '''Papers whose field matches a value, after normalisation.
+
+        Parameters
+        ----------
+        field : str
+            One of INDEXES.
+
+        value : object
+            Value to look up, e.g. a DOI or a title.
+
+        Returns
+        -------
+        papers : list of dict
+            Matching papers from all years, possibly empty.
+        '''
+        key = index_key(field, value)
+        if key is None:
+            return []
+        if len(self._papers) < len(self._files):
+            self.load()
+        return list(self._indexes[field].get(key, []))
+
+    def get(self, field, value, default=None):
+        '''The first paper whose field matches a value, or `default`.
+
+        Unlike `lookup`, only reads years until one has a match.
+        '''
+        index = self._indexes[field]
+        key = index_key(field, value)
+        if key is None:
+            return default
+
+        for year in self._years:
+            if key in index:
+                break
+            self.papers(year)
+        return index[key][0] if key in index else default
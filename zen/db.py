@@ -0,0 +1,347 @@
+'''Indexed SQLite build of the proceedings database.
+
+`build` compiles `database/proceedings/*.json` and `conferences.json` into a
+single SQLite file with tables for papers, authors, paper_authors and
+conferences, plus a full-text index over titles, abstracts and authors.
+Sources are hashed, and a rebuild only re-imports the years whose JSON
+changed:
+
+    zen.db.build('database', 'ismir.sqlite')
+    db = zen.db.Database('ismir.sqlite')
+    db.get('doi', '10.5281/zenodo.1492333')
+    db.by_author('Meinard Müller')
+
+Papers are read back as `zen.models.IsmirPaper`, normalised as by
+`zen.corpus.normalize_paper`.
+'''
+import json
+import logging
+import os
+import sqlite3
+
+import zen.corpus
+import zen.models
+import zen.pdfcache
+
+logger = logging.getLogger("zen.db")
+
+# Bump on any change to SCHEMA; older files are then rebuilt from scratch.
+SCHEMA_VERSION = 1
+
+# Marks the files built here ('ISMR'); no other file is ever rebuilt.
+APPLICATION_ID = 0x49534d52
+
+# Tables of SCHEMA, dropped on a rebuild; dropping a table drops its indexes.
+TABLES = ('papers_fts', 'paper_authors', 'authors', 'papers', 'conferences', 'sources')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sources (
+    name TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conferences (
+    year TEXT PRIMARY KEY,
+    conference_acronym TEXT,
+    conference_title TEXT,
+    conference_place TEXT,
+    conference_dates TEXT,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS papers (
+    id INTEGER PRIMARY KEY,
+    year TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT,
+    title_key TEXT,
+    doi TEXT,
+    url TEXT,
+    ee TEXT,
+    pages TEXT,
+    abstract TEXT,
+    authors TEXT,
+    zenodo_id INTEGER,
+    dblp_key TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS authors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS paper_authors (
+    paper_id INTEGER NOT NULL REFERENCES papers (id),
+    author_id INTEGER NOT NULL REFERENCES authors (id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (paper_id, position)
+);
+CREATE INDEX IF NOT EXISTS papers_year ON papers (year, position);
+CREATE INDEX IF NOT EXISTS papers_title_key ON papers (title_key);
+CREATE INDEX IF NOT EXISTS papers_doi ON papers (doi);
+CREATE INDEX IF NOT EXISTS papers_zenodo_id ON papers (zenodo_id);
+CREATE INDEX IF NOT EXISTS papers_dblp_key ON papers (dblp_key);
+CREATE INDEX IF NOT EXISTS papers_ee ON papers (ee);
+CREATE INDEX IF NOT EXISTS paper_authors_author ON paper_authors (author_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5 (
+    title, abstract, authors, content='papers', content_rowid='id'
+);
+'''
+
+# Joins the author names in `papers.authors`, which feeds the full-text index.
+AUTHOR_SEPARATOR = '; '
+
+# Indexed paper columns, by the field names of `zen.corpus.INDEXES`.
+COLUMNS = dict(doi='doi', zenodo_id='zenodo_id', dblp_key='dblp_key', ee='ee',
+               title='title_key')
+
+
+def _connect(path):
+    '''Open a database made by `build`, or a new one, at the current schema.
+
+    Raises
+    ------
+    ValueError
+        If `path` is another SQLite database, or not one at all; it is left
+        untouched.
+    '''
+    db = sqlite3.connect(path)
+    try:
+        application_id = db.execute('PRAGMA application_id').fetchone()[0]
+        user_version = db.execute('PRAGMA user_version').fetchone()[0]
+        empty = db.execute('SELECT count(*) FROM sqlite_master').fetchone()[0] == 0
+    except sqlite3.DatabaseError as exc:
+        db.close()
+        raise ValueError('{} is not an SQLite database: {}'.format(path, exc))
+
+    if not empty and application_id != APPLICATION_ID:
+        db.close()
+        raise ValueError('{} was not built by zen.db; refusing to '
+                         'overwrite it'.format(path))
+
+    if not empty and user_version != SCHEMA_VERSION:
+        logger.info('%s has an older schema; rebuilding', path)
+        db.executescript(''.join('DROP TABLE IF EXISTS {};'.format(table)
+                                 for table in TABLES))
+    db.executescript(SCHEMA)
+    db.execute('PRAGMA application_id = {}'.format(APPLICATION_ID))
+    db.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION))
+    return db
+
+
+def _delete_year(db, year):
+    # The full-text index only refers to `papers`, and is told what to forget.
+    db.execute("INSERT INTO papers_fts (papers_fts, rowid, title, abstract, authors) "
+               "SELECT 'delete', id, title, abstract, authors FROM papers WHERE year = ?",
+               (year,))
+    db.execute('DELETE FROM paper_authors WHERE paper_id IN '
+               '(SELECT id FROM papers WHERE year = ?)', (year,))
+    db.execute('DELETE FROM papers WHERE year = ?', (year,))
+
+
+def _import_year(db, year, records):
+    for position, record in enumerate(records):
+        paper = zen.corpus.normalize_paper(record)
+        authors = paper.get('author') or []
+        cursor = db.execute(
+            'INSERT INTO papers (year, position, title, title_key, doi, url, ee, pages, '
+            'abstract, authors, zenodo_id, dblp_key, extra) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (year, position, paper['title'], zen.corpus.index_key('title', paper['title']),
+             zen.corpus.index_key('doi', paper['doi']), paper['url'],
+             zen.pdfcache.pdf_url(paper['ee']), paper['pages'], paper['abstract'],
+             AUTHOR_SEPARATOR.join(authors), paper['zenodo_id'], paper['dblp_key'],
+             json.dumps(paper['extra']) if 'extra' in paper else None))
+        paper_id = cursor.lastrowid
+
+        for name in authors:
+            db.execute('INSERT OR IGNORE INTO authors (name) VALUES (?)', (name,))
+        db.executemany(
+            'INSERT INTO paper_authors VALUES (?, (SELECT id FROM authors WHERE name = ?), ?)',
+            [(paper_id, name, n) for n, name in enumerate(authors)])
+        db.execute('INSERT INTO papers_fts (rowid, title, abstract, authors) '
+                   'SELECT id, title, abstract, authors FROM papers WHERE id = ?', (paper_id,))
+
+
+def _import_conferences(db, conferences):
+    db.execute('DELETE FROM conferences')
+    db.executemany(
+        'INSERT INTO conferences VALUES (?, ?, ?, ?, ?, ?)',
+        [(year, conf.get('conference_acronym'), conf.get('conference_title'),
+          conf.get('conference_place'), conf.get('conference_dates'), json.dumps(conf))
+         for year, conf in conferences.items()])
+
+
+def build(database_dir, path, force=False):
+    '''Build or update the SQLite database from the JSON sources.
+
+    Parameters
+    ----------
+    database_dir : str
+        Directory holding `conferences.json` and `proceedings/<year>.json`.
+
+    path : str
+        SQLite file to write; updated in place if it exists, rebuilt if it
+        has an older schema.
+
+    force : bool, default=False
+        Re-import every source, changed or not.
+
+    Returns
+    -------
+    updated : list of str
+        Sources that were (re-)imported or removed, as paths relative to
+        `database_dir`.
+
+    Raises
+    ------
+    ValueError
+        If `path` exists but is not a database made by `build`.
+    '''
+    sources = dict(('proceedings/{}.json'.format(year), filename) for year, filename
+                   in zen.corpus.proceedings_files(database_dir).items())
+    sources['conferences.json'] = os.path.join(database_dir, 'conferences.json')
+
+    updated = []
+    db = _connect(path)
+    try:
+        known = dict(db.execute('SELECT name, sha256 FROM sources'))
+        for name in sorted(set(known) - set(sources)):
+            with db:
+                _delete_year(db, os.path.splitext(os.path.basename(name))[0])
+                db.execute('DELETE FROM sources WHERE name = ?', (name,))
+            updated.append(name)
+
+        for name, filename in sorted(sources.items()):
+            sha256 = zen.pdfcache.sha256sum(filename)
+            if not force and known.get(name) == sha256:
+                continue
+
+            with open(filename, encoding='utf-8') as fp:
+                records = json.load(fp)
+            with db:
+                if name == 'conferences.json':
+                    _import_conferences(db, records)
+                else:
+                    year = os.path.splitext(os.path.basename(name))[0]
+                    _delete_year(db, year)
+                    _import_year(db, year, records)
+                db.execute('INSERT OR REPLACE INTO sources VALUES (?, ?)', (name, sha256))
+            updated.append(name)
+            logger.info('imported %s', name)
+
+        if updated:
+            with db:
+                db.execute('DELETE FROM authors WHERE id NOT IN '
+                           '(SELECT author_id FROM paper_authors)')
+                db.execute("INSERT INTO papers_fts (papers_fts) VALUES ('optimize')")
+            db.execute('VACUUM')
+    finally:
+        db.close()
+    return updated
+
+
+class Database(object):
+    '''Read access to a database made by `build`.
+
+    Parameters
+    ----------
+    path : str
+        SQLite file.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect('file:{}?mode=ro'.format(path), uri=True)
+
+    def close(self):
+        self._db.close()
+
+    def _rows(self, where, params=()):
+        rows = self._db.execute(
+            'SELECT id, year, title, doi, url, ee, pages, abstract, zenodo_id, dblp_key '
+            'FROM papers WHERE {} ORDER BY year, position'.format(where), params).fetchall()
+        authors = dict()
+        for paper_id, name in self._db.execute(
+                'SELECT paper_id, name FROM paper_authors JOIN authors ON author_id = authors.id '
+                'WHERE paper_id IN (SELECT id FROM papers WHERE {}) '
+                'ORDER BY paper_id, position'.format(where), params):
+            authors.setdefault(paper_id, []).append(name)
+
+        return [(paper_id, zen.models.IsmirPaper(
+                    title=title, author=authors.get(paper_id, []), year=year, doi=doi, url=url,
+                    ee=ee, pages=pages, abstract=abstract, zenodo_id=zenodo_id,
+                    dblp_key=dblp_key))
+                for paper_id, year, title, doi, url, ee, pages, abstract, zenodo_id, dblp_key
+                in rows]
+
+    def _papers(self, where, params=()):
+        return [paper for _, paper in self._rows(where, params)]
+
+    @property
+    def years(self):
+        '''Years with papers, in order.'''
+        return [row[0] for row in self._db.execute(
+            'SELECT DISTINCT year FROM papers ORDER BY year')]
+
+    def conference(self, year):
+        '''Metadata of one conference, as in `conferences.json`, or None.'''
+        row = self._db.execute('SELECT metadata FROM conferences WHERE year = ?',
+                               (str(year),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def papers(self, year=None):
+        '''Papers of one year, or of all years, in the order of the sources.'''
+        if year is None:
+            return self._papers('1')
+        return self._papers('year = ?', (str(year),))
+
+    def lookup(self, field, value):
+        '''Papers whose field matches a value, normalised as in `zen.corpus`.
+
+        Parameters
+        ----------
+        field : str
+            One of `zen.corpus.INDEXES`.
+
+        value : object
+            Value to look up.
+
+        Returns
+        -------
+        papers : list of IsmirPaper
+            Matching papers, possibly empty.
+        '''
+        key = zen.corpus.index_key(field, value)
+        if key is None:
+            return []
+        return self._papers('{} = ?'.format(COLUMNS[field]), (key,))
+
+    def get(self, field, value, default=None):
+        '''The first paper whose field matches a value, or `default`.'''
+        papers = self.lookup(field, value)
+        return papers[0] if papers else default
+
+    def by_author(self, name):
+        '''Papers listing an author, by exact name.'''
+        return self._papers('id IN (SELECT paper_id FROM paper_authors JOIN authors '
+                            'ON author_id = authors.id WHERE name = ?)', (name,))
+
+    def search(self, query, limit=20):
+        '''Full-text search over titles, abstracts and authors.
+
+        Parameters
+        ----------
+        query : str
+            FTS5 query, e.g. 'chord AND recognition'.
+
+        limit : int, default=20
+            Maximum number of results.
+
+        Returns
+        -------
+        papers : list of IsmirPaper
+            Best matches first.
+        '''
+        ids = [row[0] for row in self._db.execute(
+            'SELECT rowid FROM papers_fts WHERE papers_fts MATCH ? ORDER BY rank LIMIT ?',
+            (query, limit))]
+        papers = dict(self._rows('id IN ({})'.format(','.join('?' * len(ids))), ids))
+        return [papers[id_] for id_ in ids]
@@ -0,0 +1,348 @@
+'''Polite, cached harvesting of ISMIR metadata from DBLP.
+
+Every response is kept in an on-disk HTTP cache: within `ttl` seconds a URL
+is served from disk, after that it is revalidated with its ETag or
+Last-Modified date, so an unchanged page costs a 304. Requests that do go
+out share one token bucket and a small thread pool:
+
+    harvester = zen.dblp.Harvester(cache_dir, rate=2, num_workers=4)
+    records = harvester.harvest(range(2000, 2018))
+
+By default a year takes a single request, for the XML export of its table of
+contents; years without one, or whose export cannot be parsed, fall back to
+the listing page and one request per record. Listed records that DBLP no
+longer has are logged and skipped.
+
+Without network, the same records can be read from a local copy of the
+full `dblp.xml(.gz)` dump, which is streamed in constant memory:
+
+    for cite_key, record in zen.dblp.iter_dump('dblp.xml.gz'):
+        ...
+'''
+import concurrent.futures
+import gzip
+import hashlib
+import html.entities
+import json
+import logging
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+import bs4
+import requests
+import requests.adapters
+import xmltodict
+
+import zen.api
+
+logger = logging.getLogger("zen.dblp")
+
+HOST = 'https://dblp.uni-trier.de'
+LISTING = '{host}/db/conf/ismir/ismir{year}.html'
+VOLUME = '{host}/db/conf/ismir/ismir{year}.xml'
+RECORD = '{host}/rec/xml/{cite_key}.xml'
+
+# Default location of the HTTP cache, and seconds before revalidating.
+CACHE_DIR = os.path.join('~', '.cache', 'conference-archive', 'dblp')
+TTL = 7 * 24 * 3600
+
+# Record types kept from a volume or the dump.
+RECORD_TYPES = ('inproceedings', 'proceedings')
+
+# Cite key prefix of ISMIR records.
+PREFIX = 'conf/ismir/'
+
+# Character entities declared by dblp.dtd, which the dump uses without
+# the DTD being read; they are a subset of the HTML ones.
+ENTITIES = dict((name, chr(codepoint))
+                for name, codepoint in html.entities.name2codepoint.items())
+
+
+class HttpCache(object):
+    '''On-disk cache of GET responses, revalidated by ETag / Last-Modified.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the cached bodies and their headers.
+
+    ttl : float, default=TTL
+        Seconds a response is used without asking the server.
+    '''
+
+    def __init__(self, cache_dir, ttl=TTL):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.ttl = ttl
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return (os.path.join(self.cache_dir, name + '.json'),
+                os.path.join(self.cache_dir, name + '.body'))
+
+    def load(self, url):
+        '''Cached (meta, body) of a URL, or (None, None).'''
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as fp:
+                meta = json.load(fp)
+            with open(body_path, 'rb') as fp:
+                return meta, fp.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def is_fresh(self, meta, now=None):
+        return meta is not None and (now or time.time()) - meta['fetched'] < self.ttl
+
+    def store(self, url, response=None, body=None, meta=None):
+        '''Store a 200 response, or refresh `meta` after a 304.'''
+        meta_path, body_path = self._paths(url)
+        if response is not None:
+            body = response.content
+            meta = dict(url=url, etag=response.headers.get('ETag'),
+                        last_modified=response.headers.get('Last-Modified'))
+            with open(body_path + '.tmp', 'wb') as fp:
+                fp.write(body)
+            os.replace(body_path + '.tmp', body_path)
+        meta = dict(meta, fetched=time.time())
+        with open(meta_path + '.tmp', 'w') as fp:
+            json.dump(meta, fp)
+        os.replace(meta_path + '.tmp', meta_path)
+        return body
+
+
+class Harvester(object):
+    '''Concurrent, rate-limited, cached client of DBLP.
+
+    Parameters
+    ----------
+    cache_dir : str, default=CACHE_DIR
+        Directory of the HTTP cache.
+
+    ttl : float, default=TTL
+        Seconds a cached response is used without revalidation.
+
+    rate : float, default=2
+        Maximum requests per second, across all workers.
+
+    num_workers : int, default=4
+        Maximum number of requests in flight.
+
+    host : str, default=HOST
+        Base URL of DBLP.
+
+    session : requests.Session, default=None
+        Session to use; a new one by default.
+    '''
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=TTL, rate=2, num_workers=4, host=HOST,
+                 session=None):
+        self.cache = HttpCache(cache_dir, ttl)
+        self.bucket = zen.api.TokenBucket(rate, burst=1)
+        self.num_workers = max(1, num_workers)
+        self.host = host
+        self.session = session or requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.num_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, url):
+        '''Body of a URL, from the cache if it is fresh or unchanged.
+
+        Returns
+        -------
+        body : bytes or None
+            None if the server has no such page (404).
+
+        Raises
+        ------
+        requests.HTTPError
+            On any other error status.
+        '''
+        meta, body = self.cache.load(url)
+        if self.cache.is_fresh(meta):
+            return body
+
+        headers = dict()
+        if meta is not None and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta is not None and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        self.bucket.acquire()
+        with self._lock:
+            self.requests += 1
+        response = self.session.get(url, headers=headers, timeout=60)
+        if response.status_code == 304 and body is not None:
+            logger.debug('not modified: %s', url)
+            return self.cache.store(url, body=body, meta=meta)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return self.cache.store(url, response)
+
+    def cite_keys(self, year):
+        '''Cite keys of the papers of a year, from its listing page.'''
+        body = self.fetch(LISTING.format(host=self.host, year=year))
+        return parse_listing(body) if body is not None else []
+
+    def volume(self, year):
+        '''Records of a year from its TOC export; None if there is none, or
+        if what came back is not one (e.g. an HTML error page).'''
+        url = VOLUME.format(host=self.host, year=year)
+        body = self.fetch(url)
+        if body is None:
+            return None
+        try:
+            return parse_volume(body, types=('inproceedings',))
+        except ET.ParseError as derp:
+            logger.warning('%s is not a TOC export (%s); using the listing', url, derp)
+            return None
+
+    def record(self, cite_key):
+        '''Record of a paper; None, and logged, if DBLP has no such record.'''
+        url = RECORD.format(host=self.host, cite_key=cite_key)
+        body = self.fetch(url)
+        if body is None:
+            logger.warning('%s: no such record, skipped', url)
+            return None
+        return parse_record(body)
+
+    def harvest(self, years, records=None, bulk=True):
+        '''Records of the papers of several years, keyed by cite key.
+
+        Parameters
+        ----------
+        years : iterable of int
+            Conference years.
+
+        records : dict, default=None
+            Records already harvested; they are not fetched again, and new
+            ones are added to it as they arrive, so an interrupted harvest
+            keeps its progress.
+
+        bulk : bool, default=True
+            Use the TOC export of each year; otherwise, or for years
+            without one, fetch every record on its own.
+
+        Returns
+        -------
+        records : dict
+            Cite key to record, as returned by `parse_record`; records listed
+            but missing from DBLP are left out.
+        '''
+        years = list(years)
+        records = records if records is not None else dict()
+        with concurrent.futures.ThreadPoolExecutor(self.num_workers) as pool:
+            missing = []
+            volumes = pool.map(self.volume, years) if bulk else [None for _ in years]
+            for year, volume in zip(years, volumes):
+                if volume is not None:
+                    for cite_key, record in volume.items():
+                        if cite_key.startswith(PREFIX):
+                            records.setdefault(cite_key, record)
+                    logger.info('ISMIR%s: %d records from the TOC export', year, len(volume))
+                else:
+                    missing.append(year)
+
+            cite_keys = [cite_key for keys in pool.map(self.cite_keys, missing)
+                         for cite_key in keys if cite_key not in records]
+            for cite_key, record in zip(cite_keys, pool.map(self.record, cite_keys)):
+                if record is not None:
+                    records[cite_key] = record
+        return records
+
+
+def parse_listing(html):
+    '''Cite keys of the papers on a DBLP listing page, e.g. 'conf/ismir/BelloS04'.'''
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    records = soup.find_all(attrs={'class': 'entry inproceedings'})
+    return [rec.attrs.get('id') for rec in records]
+
+
+def parse_record(xml):
+    '''Record of a paper from its DBLP XML.'''
+    if isinstance(xml, bytes):
+        xml = xml.decode('utf-8')
+    return dict(xmltodict.parse(xml.replace('\n', ''))['dblp']['inproceedings'])
+
+
+def parse_volume(xml, types=RECORD_TYPES):
+    '''Records of a DBLP TOC export, keyed by cite key.
+
+    The export wraps the records of a volume, in the same XML as single
+    records, in `<dblpcites><r>` elements.
+
+    Parameters
+    ----------
+    xml : str or bytes
+        The TOC export.
+
+    types : tuple of str, default=RECORD_TYPES
+        Record types to keep; by default the papers and the volume itself.
+
+    Returns
+    -------
+    records : dict
+        Cite key to record, as returned by `parse_record`.
+    '''
+    records = dict()
+    for elem in ET.fromstring(xml).iter():
+        if elem.tag in types and elem.get('key'):
+            records[elem.get('key')] = parse_element(elem)
+    return records
+
+
+def parse_element(elem):
+    '''Record of a parsed DBLP record element, as `parse_record` makes it.'''
+    return dict(xmltodict.parse(ET.tostring(elem, encoding='unicode').replace('\n', ''))[elem.tag])
+
+
+def iter_dump(path, prefix=PREFIX, types=RECORD_TYPES):
+    '''Stream the records of a DBLP XML dump.
+
+    Records are parsed one at a time and cleared once read, so memory does
+    not depend on the size of the dump.
+
+    Parameters
+    ----------
+    path : str
+        Path of `dblp.xml`, or of `dblp.xml.gz`.
+
+    prefix : str, default=PREFIX
+        Keep records whose cite key starts with it.
+
+    types : tuple of str, default=RECORD_TYPES
+        Record types to keep.
+
+    Yields
+    ------
+    cite_key : str
+
+    record : dict
+        As returned by `parse_record`.
+    '''
+    opener = gzip.open if path.endswith('.gz') else open
+    parser = ET.XMLParser()
+    parser.entity.update(ENTITIES)
+    with opener(path, 'rb') as fp:
+        depth, root = 0, None
+        for event, elem in ET.iterparse(fp, events=('start', 'end'), parser=parser):
+            if event == 'start':
+                depth += 1
+                if root is None:
+                    root = elem
+                continue
+
+            depth -= 1
+            if depth != 1:
+                continue
+            key = elem.get('key', '')
+            if elem.tag in types and key.startswith(prefix):
+                yield key, parse_element(elem)
+            # Drop the record, and the reference the root keeps to it.
+            root.clear()
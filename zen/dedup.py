@@ -0,0 +1,294 @@
+'''Near-duplicate detection over proceedings records with MinHash and LSH.
+
+Every paper gets two MinHash signatures: one over character 4-grams of its
+normalised title, which catches the same title entered twice with different
+abstracts, and, if it has an abstract, one over word bigrams of its title
+and abstract, which catches reworded copies. Authors are left out, so a reprint with another
+author order still matches. Signatures use one-permutation hashing: every
+shingle is hashed once, into one of NUM_HASHES bins, and empty bins borrow
+from others, so a signature costs one hash per shingle.
+
+LSH banding turns signatures into candidate pairs in roughly linear time;
+only candidates are compared, and pairs above the thresholds are joined
+into clusters:
+
+    signatures = zen.dedup.load_signatures(sources, cache_dir)
+    for cluster in zen.dedup.find_duplicates(signatures):
+        ...
+
+Signatures are cached per source file, keyed by its hash, so adding a year
+only hashes the new papers.
+'''
+import array
+import collections
+import hashlib
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+
+import zen.corpus
+
+logger = logging.getLogger("zen.dedup")
+
+# Bump on any change to shingling or hashing; invalidates cached signatures.
+FORMAT_VERSION = 1
+
+NUM_HASHES = 128
+
+# LSH bands of NUM_HASHES // BANDS rows; pairs with a Jaccard similarity of
+# about (1 / BANDS) ** (BANDS / NUM_HASHES) and above become candidates.
+BANDS = 32
+
+# Minimum estimated Jaccard similarity of the titles, or of the texts, of a
+# duplicate pair.
+TITLE_THRESHOLD = 0.8
+TEXT_THRESHOLD = 0.5
+
+# Precomputed probes of the densification of empty bins.
+_NUM_PROBES = 32
+_rng = random.Random(FORMAT_VERSION)
+_PROBES = [[_rng.randrange(NUM_HASHES) for _ in range(_NUM_PROBES)]
+           for _ in range(NUM_HASHES)]
+del _rng
+
+
+def _words(text):
+    return zen.corpus.normalize_title(text or '').split()
+
+
+def title_shingles(paper):
+    '''Character 4-grams of a paper's normalised title.'''
+    title = ' '.join(_words(paper.get('title')))
+    if len(title) < 4:
+        return set([title]) if title else set()
+    return set(title[n:n + 4] for n in range(len(title) - 3))
+
+
+def text_shingles(paper):
+    '''Word bigrams of a paper's title and abstract; none without abstract.'''
+    if not paper.get('abstract'):
+        return set()
+    words = _words(paper.get('title')) + _words(paper.get('abstract'))
+    if len(words) < 2:
+        return set(words)
+    return set(' '.join(pair) for pair in zip(words, words[1:]))
+
+
+def signature(shingles, num_hashes=NUM_HASHES):
+    '''One-permutation MinHash signature of a set of shingles.
+
+    Parameters
+    ----------
+    shingles : set of str
+        Shingles of a document.
+
+    num_hashes : int, default=NUM_HASHES
+        Length of the signature.
+
+    Returns
+    -------
+    signature : list of int or None
+        Minimum hash value per bin; None for an empty set.
+    '''
+    if not shingles:
+        return None
+
+    bins = [None] * num_hashes
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'),
+                                               digest_size=8).digest(), 'little')
+        index, value = value % num_hashes, value // num_hashes
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+
+    # Densification: an empty bin copies a non-empty one chosen by a fixed
+    # probe sequence, the same for every document.
+    filled = [value for value in bins]
+    for index, value in enumerate(bins):
+        if value is not None:
+            continue
+        probes = _PROBES[index] if num_hashes == NUM_HASHES else []
+        source = next((probe for probe in probes if bins[probe] is not None), None)
+        if source is None:
+            source = next(probe % num_hashes for probe in range(index + 1, index + num_hashes)
+                          if bins[probe % num_hashes] is not None)
+        filled[index] = bins[source]
+    return filled
+
+
+def similarity(a, b):
+    '''Estimated Jaccard similarity of two signatures; 0 if either is None.'''
+    if a is None or b is None:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def paper_signatures(paper):
+    '''Title and text signatures of a paper.'''
+    return signature(title_shingles(paper)), signature(text_shingles(paper))
+
+
+def _pack(signatures):
+    values = array.array('Q')
+    for pair in signatures:
+        for sig in pair:
+            values.extend(sig if sig is not None else [0] * NUM_HASHES)
+    # A leading flag per signature marks the missing ones.
+    flags = array.array('B', [sig is not None for pair in signatures for sig in pair])
+    return flags, values
+
+
+def _unpack(flags, values):
+    sigs = [list(values[n * NUM_HASHES:(n + 1) * NUM_HASHES]) if flag else None
+            for n, flag in enumerate(flags)]
+    return list(zip(sigs[::2], sigs[1::2]))
+
+
+def load_signatures(sources, cache_dir=None):
+    '''Signatures of the papers of several sources, cached per source.
+
+    Parameters
+    ----------
+    sources : dict
+        Source name (e.g. a year) to the path of a JSON list of paper
+        records.
+
+    cache_dir : str, default=None
+        Directory of the cached signatures; None disables caching.
+
+    Returns
+    -------
+    signatures : dict
+        (source name, position) to the (title, text) signatures of a paper.
+
+    papers : dict
+        (source name, position) to the normalised paper.
+    '''
+    if cache_dir is not None:
+        cache_dir = os.path.expanduser(cache_dir)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    signatures, papers = dict(), dict()
+    for name, filename in sorted(sources.items()):
+        with open(filename, 'rb') as fp:
+            data = fp.read()
+        records = [zen.corpus.normalize_paper(record) for record in json.loads(data)]
+        papers.update(((name, position), paper) for position, paper in enumerate(records))
+
+        key = hashlib.sha256(data + json.dumps(
+            [FORMAT_VERSION, NUM_HASHES, sys.byteorder]).encode('utf-8')).hexdigest()[:16]
+        path = os.path.join(cache_dir, '{}.{}.sig'.format(name, key)) if cache_dir else None
+        sigs = None
+        if path is not None and os.path.exists(path):
+            flags, values = array.array('B'), array.array('Q')
+            try:
+                with open(path, 'rb') as fp:
+                    flags.fromfile(fp, 2 * len(records))
+                    values.fromfile(fp, 2 * len(records) * NUM_HASHES)
+                sigs = _unpack(flags, values)
+            except (EOFError, ValueError):
+                # A truncated file, e.g. from a full disk; hash again.
+                logger.warning('ignoring a corrupt signature cache: %s', path)
+
+        if sigs is None:
+            sigs = [paper_signatures(paper) for paper in records]
+            logger.info('hashed %d papers of %s', len(records), name)
+            if path is not None:
+                for fn in os.listdir(cache_dir):
+                    if fn.startswith(name + '.') and fn.endswith('.sig'):
+                        os.remove(os.path.join(cache_dir, fn))
+                flags, values = _pack(sigs)
+                with open(path + '.tmp', 'wb') as fp:
+                    flags.tofile(fp)
+                    values.tofile(fp)
+                os.replace(path + '.tmp', path)
+
+        signatures.update(((name, position), sig) for position, sig in enumerate(sigs))
+    return signatures, papers
+
+
+def candidate_pairs(signatures, bands=BANDS):
+    '''Pairs of documents sharing all rows of at least one LSH band.
+
+    Parameters
+    ----------
+    signatures : dict
+        Document key to signature; None signatures are skipped.
+
+    bands : int, default=BANDS
+        Number of bands the signatures are cut into.
+
+    Returns
+    -------
+    pairs : set of tuple
+        Candidate (key, key) pairs, in sorted order within each pair.
+    '''
+    buckets = collections.defaultdict(list)
+    for key, sig in signatures.items():
+        if sig is None:
+            continue
+        rows = len(sig) // bands
+        for band in range(bands):
+            buckets[band, tuple(sig[band * rows:(band + 1) * rows])].append(key)
+
+    pairs = set()
+    for keys in buckets.values():
+        pairs.update(itertools.combinations(sorted(keys), 2))
+    return pairs
+
+
+def find_duplicates(signatures, title_threshold=TITLE_THRESHOLD,
+                    text_threshold=TEXT_THRESHOLD, bands=BANDS):
+    '''Clusters of near-duplicate papers.
+
+    Parameters
+    ----------
+    signatures : dict
+        Paper key to its (title, text) signatures, see `load_signatures`.
+
+    title_threshold : float, default=TITLE_THRESHOLD
+        Minimum title similarity of a duplicate pair.
+
+    text_threshold : float, default=TEXT_THRESHOLD
+        Minimum title and abstract similarity of a duplicate pair.
+
+    bands : int, default=BANDS
+        Number of LSH bands.
+
+    Returns
+    -------
+    clusters : list of dict
+        Most similar first, each with the sorted paper `keys` and the
+        duplicate `pairs` as (key, key, title similarity, text similarity).
+    '''
+    titles = dict((key, sigs[0]) for key, sigs in signatures.items())
+    texts = dict((key, sigs[1]) for key, sigs in signatures.items())
+    pairs = candidate_pairs(titles, bands) | candidate_pairs(texts, bands)
+
+    parent = dict()
+
+    def root(key):
+        while parent.get(key, key) != key:
+            key = parent[key]
+        return key
+
+    duplicates = []
+    for a, b in sorted(pairs):
+        title, text = similarity(titles[a], titles[b]), similarity(texts[a], texts[b])
+        if title >= title_threshold or text >= text_threshold:
+            duplicates.append((a, b, title, text))
+            parent[root(b)] = root(a)
+
+    clusters = collections.defaultdict(lambda: dict(keys=set(), pairs=[]))
+    for a, b, title, text in duplicates:
+        cluster = clusters[root(a)]
+        cluster['keys'].update((a, b))
+        cluster['pairs'].append((a, b, title, text))
+
+    clusters = [dict(keys=sorted(cluster['keys']), pairs=cluster['pairs'])
+                for cluster in clusters.values()]
+    return sorted(clusters, key=lambda cluster: (
+        -max(max(title, text) for _, _, title, text in cluster['pairs']), cluster['keys']))
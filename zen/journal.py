@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+import time
+
+from . import models
+
+logger = logging.getLogger("zen.journal")
+
+# Upload steps, in the order they are completed for each paper.
+STEPS = ('created', 'uploaded', 'metadata', 'published')
+
+
+def paper_key(paper):
+    '''Stable identifier for a paper across runs over the same input.
+
+    DBLP keys alone are not unique: DBLP gave two papers of 2018 the same one.
+    The title is added to tell such papers apart.
+
+    Parameters
+    ----------
+    paper : dict
+        ISMIR paper record.
+
+    Returns
+    -------
+    key : str
+        The DBLP key if set, otherwise the PDF location, followed by the
+        title.
+    '''
+    return '|'.join(part for part in (paper.get('dblp_key') or paper.get('ee'),
+                                      paper.get('title')) if part)
+
+
+def paper_keys(proceedings):
+    '''Keys of a list of papers, checked to be unique.
+
+    Parameters
+    ----------
+    proceedings : list of dict
+        ISMIR paper records.
+
+    Returns
+    -------
+    keys : list of str
+        `paper_key` of every paper, in order.
+
+    Raises
+    ------
+    ValueError
+        If two papers have the same key, so that their journal states would
+        be mixed up.
+    '''
+    keys = [paper_key(paper) for paper in proceedings]
+    seen = set()
+    for key in keys:
+        if key in seen:
+            raise ValueError('Two papers have the journal key {}'.format(key))
+        seen.add(key)
+    return keys
+
+
+def completed(state, step):
+    '''Test whether a paper's journal state has reached a given step.
+
+    Parameters
+    ----------
+    state : dict
+        Replayed journal state of one paper; see `Journal.replay`.
+
+    step : str
+        One of STEPS.
+
+    Returns
+    -------
+    done : bool
+        True if `step`, or a later one, has been recorded.
+    '''
+    last = state.get('step')
+    return last is not None and STEPS.index(last) >= STEPS.index(step)
+
+
+class Journal(object):
+    '''Append-only JSONL log of upload steps, one line per completed step.
+
+    Every line is written with a single call and synced to disk before the
+    next step starts, so a crash loses at most the step in flight. Lines are
+    appended in `O_APPEND` mode, which keeps concurrent writers (threads or
+    worker processes on the same machine) from interleaving.
+
+    Parameters
+    ----------
+    path : str
+        Path to the journal file.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def for_output(cls, output_file):
+        '''Journal kept next to a given output file.'''
+        return cls(os.path.splitext(output_file)[0] + '.journal.jsonl')
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def record(self, key, step, **data):
+        '''Append a completed step for a paper.
+
+        Parameters
+        ----------
+        key : str
+            Paper identifier; see `paper_key`.
+
+        step : str
+            One of STEPS.
+
+        **data
+            JSON-serializable values to store with the step.
+        '''
+        if step not in STEPS:
+            raise ValueError('step must be one of {}, not {}'.format(STEPS, step))
+
+        line = json.dumps(dict(key=key, step=step, time=time.time(), **data))
+        with open(self.path, 'a', encoding='utf-8') as fp:
+            fp.write(line + '\n')
+            fp.flush()
+            os.fsync(fp.fileno())
+
+    def replay(self):
+        '''Rebuild the state of every paper from the journal.
+
+        Returns
+        -------
+        states : dict
+            Maps paper keys to the union of their recorded data, with `step`
+            set to the last completed step.
+        '''
+        states = dict()
+        if not self.exists():
+            return states
+
+        with open(self.path, 'r', encoding='utf-8') as fp:
+            for num, line in enumerate(fp):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn line, from a crash mid-write.
+                    logger.warning('%s:%d: skipping unreadable entry',
+                                   self.path, num + 1)
+                    continue
+                entry.pop('time', None)
+                states.setdefault(entry.pop('key'), dict()).update(entry)
+
+        return states
+
+    def apply(self, proceedings):
+        '''Project the journal onto the input records.
+
+        Parameters
+        ----------
+        proceedings : list of dict
+            ISMIR paper records, as given to the upload.
+
+        Returns
+        -------
+        papers : list of zen.models.IsmirPaper
+            Published papers, updated with their Zenodo identifiers and links.
+
+        Raises
+        ------
+        ValueError
+            If two papers have the same key; see `paper_keys`.
+        '''
+        states = self.replay()
+        papers = []
+        for key, paper in zip(paper_keys(proceedings), proceedings):
+            state = states.get(key, dict())
+            if not completed(state, 'published'):
+                continue
+            paper = models.IsmirPaper(**paper)
+            paper.update(zenodo_id=state['zenodo_id'], ee=state['ee'],
+                         doi=state['doi'], url=state['url'])
+            papers.append(paper)
+
+        return papers
@@ -0,0 +1,326 @@
+'''Content-addressed local store of proceedings PDFs.
+
+Every PDF is kept once, under its SHA-256, and found again through any of
+its aliases: the paper's DBLP key, its Zenodo id, or a URL it was fetched
+from. The download, extraction and upload scripts all resolve a paper's `ee`
+through the same store, so each PDF crosses the network once per machine:
+
+    cache = zen.pdfcache.PdfCache('~/.cache/ismir-pdfs', max_bytes=20 * 2**30)
+    path = cache.resolve(paper)
+
+The index is an SQLite database next to the objects, which keeps it safe to
+share between threads and worker processes. Once the store grows beyond
+`max_bytes`, the least recently used PDFs are evicted.
+'''
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger("zen.pdfcache")
+
+# Bytes read at a time when hashing or downloading.
+CHUNK_SIZE = 1 << 20
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS objects (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_last_used ON objects (last_used);
+'''
+
+
+def pdf_url(ee):
+    '''Pick the PDF location from a paper's `ee` field.
+
+    Parameters
+    ----------
+    ee : str, list of str, or None
+        Electronic edition(s) of a paper.
+
+    Returns
+    -------
+    url : str or None
+        `ee` itself, or from a list the first entry ending in 'pdf'.
+    '''
+    if isinstance(ee, list):
+        return next((url for url in ee if url.endswith('pdf')), None)
+    return ee
+
+
+def aliases(paper):
+    '''Keys under which a paper's PDF is indexed.
+
+    Parameters
+    ----------
+    paper : dict
+        ISMIR paper record.
+
+    Returns
+    -------
+    aliases : list of str
+        Namespaced DBLP key, Zenodo id and PDF URL, for those that are set.
+    '''
+    keys = []
+    if paper.get('dblp_key'):
+        keys.append('dblp:{}'.format(paper['dblp_key']))
+    if paper.get('zenodo_id'):
+        keys.append('zenodo:{}'.format(paper['zenodo_id']))
+    url = pdf_url(paper.get('ee'))
+    if url:
+        keys.append('url:{}'.format(url))
+    return keys
+
+
+def sha256sum(filepath, chunk_size=CHUNK_SIZE):
+    '''Hex SHA-256 of a local file, read in chunks.'''
+    sha = hashlib.sha256()
+    with open(filepath, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def megabytes(size):
+    '''Bytes in `size` MB, passing None through; for command-line caps.'''
+    return None if size is None else size * 2 ** 20
+
+
+class PdfCache(object):
+    '''Content-addressed PDF store with an alias index and LRU eviction.
+
+    Parameters
+    ----------
+    root : str
+        Directory holding the objects and the index; created if needed.
+
+    max_bytes : int, default=None
+        Size cap of the stored PDFs; unbounded if None.
+
+    session : requests.Session, default=None
+        Session used for downloads; one is made on first use if not given.
+    '''
+
+    def __init__(self, root, max_bytes=None, session=None):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.max_bytes = max_bytes
+        self.session = session
+        self._local = threading.local()
+        os.makedirs(os.path.join(self.root, 'tmp'), exist_ok=True)
+        self._db.executescript(SCHEMA)
+
+    def __getstate__(self):
+        # Connections and sessions stay with the process that opened them.
+        return dict(root=self.root, max_bytes=self.max_bytes)
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.root, 'index.sqlite'),
+                                 timeout=60, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            self._local.db = db
+        return db
+
+    def path(self, sha256):
+        '''Location of an object in the store.'''
+        return os.path.join(self.root, sha256[:2], sha256 + '.pdf')
+
+    def lookup(self, *keys):
+        '''Find a stored PDF by any of its aliases.
+
+        Parameters
+        ----------
+        *keys : str
+            Aliases to try, in order.
+
+        Returns
+        -------
+        path : str or None
+            Local path of the PDF, or None if no alias is known.
+        '''
+        for key in keys:
+            row = self._db.execute('SELECT sha256 FROM aliases WHERE alias = ?',
+                                   (key,)).fetchone()
+            if row is not None and os.path.exists(self.path(row[0])):
+                self._touch(row[0])
+                return self.path(row[0])
+        return None
+
+    def alias(self, path, *keys):
+        '''Index a stored PDF under additional aliases.
+
+        Parameters
+        ----------
+        path : str
+            Location of the PDF in the store, as returned by `lookup`.
+
+        *keys : str
+            Aliases to add.
+        '''
+        sha256 = os.path.splitext(os.path.basename(path))[0]
+        self._db.executemany('INSERT OR REPLACE INTO aliases VALUES (?, ?)',
+                             [(key, sha256) for key in keys])
+
+    def add(self, filepath, *keys):
+        '''Copy a local file into the store.
+
+        Parameters
+        ----------
+        filepath : str
+            PDF to store.
+
+        *keys : str
+            Aliases to index it under.
+
+        Returns
+        -------
+        path : str
+            Location of the stored copy.
+        '''
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, 'tmp'))
+        os.close(fd)
+        shutil.copyfile(filepath, tmp)
+        return self._commit(tmp, sha256sum(tmp), keys)
+
+    def fetch(self, url, *keys):
+        '''Download a URL into the store, unless it was fetched before.
+
+        Parameters
+        ----------
+        url : str
+            Location of the PDF.
+
+        *keys : str
+            Further aliases to index it under, besides the URL.
+
+        Returns
+        -------
+        path : str
+            Location of the stored copy.
+
+        Raises
+        ------
+        requests.RequestException
+            If the download fails.
+        '''
+        keys = ('url:{}'.format(url),) + tuple(keys)
+        path = self.lookup(keys[0])
+        if path is not None:
+            self.alias(path, *keys)
+            return path
+
+        if self.session is None:
+            self.session = requests.Session()
+
+        sha = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=os.path.join(self.root, 'tmp'))
+        try:
+            with os.fdopen(fd, 'wb') as fp, \
+                    self.session.get(url, stream=True, timeout=60) as res:
+                res.raise_for_status()
+                for chunk in res.iter_content(CHUNK_SIZE):
+                    sha.update(chunk)
+                    fp.write(chunk)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+        logger.debug('fetched %s', url)
+        return self._commit(tmp, sha.hexdigest(), keys)
+
+    def resolve(self, paper):
+        '''Local path of a paper's PDF, fetching it if needed.
+
+        Parameters
+        ----------
+        paper : dict
+            ISMIR paper record.
+
+        Returns
+        -------
+        path : str or None
+            Path of the PDF on local disk. A local `ee` is returned as is;
+            without `ee`, the PDF stored under the paper's other aliases, if
+            any.
+        '''
+        url = pdf_url(paper.get('ee'))
+        if url is None:
+            return self.lookup(*aliases(paper))
+        elif not url.startswith('http'):
+            return url
+
+        # A known paper with a new URL has a new PDF, so the other aliases are
+        # updated from the URL, never used in its place.
+        return self.fetch(url, *aliases(paper))
+
+    def size(self):
+        '''Total bytes of the stored PDFs.'''
+        return self._db.execute('SELECT COALESCE(SUM(size), 0) FROM objects').fetchone()[0]
+
+    def evict(self, keep=()):
+        '''Remove least recently used PDFs until the store fits `max_bytes`.
+
+        Parameters
+        ----------
+        keep : iterable of str
+            Hashes never to evict in this call.
+
+        Returns
+        -------
+        evicted : list of str
+            Hashes of the removed PDFs.
+        '''
+        evicted = []
+        if self.max_bytes is None:
+            return evicted
+
+        excess = self.size() - self.max_bytes
+        rows = self._db.execute('SELECT sha256, size FROM objects ORDER BY last_used')
+        for sha256, size in rows.fetchall():
+            if excess <= 0:
+                break
+            if sha256 in keep:
+                continue
+            self._db.execute('DELETE FROM objects WHERE sha256 = ?', (sha256,))
+            self._db.execute('DELETE FROM aliases WHERE sha256 = ?', (sha256,))
+            try:
+                os.remove(self.path(sha256))
+            except OSError:
+                pass
+            excess -= size
+            evicted.append(sha256)
+
+        if evicted:
+            logger.info('evicted %d PDFs from %s', len(evicted), self.root)
+        return evicted
+
+    def _touch(self, sha256):
+        self._db.execute('UPDATE objects SET last_used = ? WHERE sha256 = ?',
+                         (time.time(), sha256))
+
+    def _commit(self, tmp, sha256, keys):
+        path = self.path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp, path)
+        self._db.execute('INSERT OR REPLACE INTO objects VALUES (?, ?, ?)',
+                         (sha256, os.path.getsize(path), time.time()))
+        self.alias(path, *keys)
+        self.evict(keep=(sha256,))
+        return path
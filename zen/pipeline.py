@@ -0,0 +1,179 @@
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger("zen.pipeline")
+
+_DONE = object()
+
+
+class Stage(object):
+    '''One step of a pipeline, served by its own pool of worker threads.
+
+    Parameters
+    ----------
+    name : str
+        Name used in the statistics.
+
+    func : callable
+        Applied to every item; its return value is passed to the next stage.
+
+    workers : int, default=1
+        Number of threads running `func`.
+    '''
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.busy = 0.
+        self.processed = 0
+        self.failed = 0
+        self.depth_max = 0
+        self.depth_sum = 0
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def stats(self, elapsed):
+        '''Summary of the stage's activity over `elapsed` seconds.'''
+        return dict(
+            workers=self.workers, processed=self.processed, failed=self.failed,
+            utilisation=self.busy / (self.workers * elapsed) if elapsed else 0.,
+            queue_max=self.depth_max,
+            queue_mean=self.depth_sum / self.samples if self.samples else 0.)
+
+
+class Pipeline(object):
+    '''Run items through a sequence of stages, each with its own workers.
+
+    Stages are connected by bounded queues, so a slow stage applies
+    backpressure instead of letting work pile up in memory, while faster
+    stages keep serving other items. Items that raise are dropped from the
+    remaining stages; the first exception is re-raised once all others have
+    finished.
+
+    Parameters
+    ----------
+    stages : list of Stage
+        Stages, in the order items go through them.
+
+    maxsize : int, default=None
+        Capacity of each queue between stages; defaults to twice the number
+        of workers of the stage reading from it.
+
+    sample_interval : float, default=0.05
+        Seconds between samples of the queue depths.
+    '''
+
+    def __init__(self, stages, maxsize=None, sample_interval=0.05):
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize or 2 * stage.workers) for stage in stages]
+        self.sample_interval = sample_interval
+        self.elapsed = 0.
+
+    def _work(self, index, results, errors):
+        stage, inbox = self.stages[index], self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+
+            num, value = item
+            now = time.perf_counter()
+            try:
+                value = stage.func(value)
+            except BaseException as derp:
+                errors.append((num, derp))
+                with stage._lock:
+                    stage.failed += 1
+                continue
+            finally:
+                with stage._lock:
+                    stage.busy += time.perf_counter() - now
+            with stage._lock:
+                stage.processed += 1
+
+            if outbox is not None:
+                outbox.put((num, value))
+            else:
+                results[num] = value
+
+    def _sample(self, stop):
+        while not stop.wait(self.sample_interval):
+            for stage, inbox in zip(self.stages, self.queues):
+                depth = inbox.qsize()
+                stage.depth_max = max(stage.depth_max, depth)
+                stage.depth_sum += depth
+                stage.samples += 1
+
+    def run(self, items):
+        '''Push every item through all stages.
+
+        Parameters
+        ----------
+        items : iterable
+            Inputs to the first stage.
+
+        Returns
+        -------
+        results : list
+            Outputs of the last stage, in the order of `items`.
+        '''
+        results, errors = dict(), []
+        stop = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(stop,), daemon=True)
+
+        pools = []
+        for index, stage in enumerate(self.stages):
+            pools.append([threading.Thread(target=self._work, daemon=True,
+                                           args=(index, results, errors))
+                          for _ in range(stage.workers)])
+
+        now = time.perf_counter()
+        sampler.start()
+        for pool in pools:
+            for thread in pool:
+                thread.start()
+
+        count = 0
+        for count, item in enumerate(items, 1):
+            self.queues[0].put((count - 1, item))
+
+        # Shut the stages down in order, once each has drained.
+        for index, pool in enumerate(pools):
+            for _ in pool:
+                self.queues[index].put(_DONE)
+            for thread in pool:
+                thread.join()
+
+        stop.set()
+        sampler.join()
+        self.elapsed = time.perf_counter() - now
+
+        if errors:
+            raise min(errors, key=lambda err: err[0])[1]
+        return [results[num] for num in range(count)]
+
+    def stats(self):
+        '''Per-stage statistics of the last run.
+
+        Returns
+        -------
+        stats : dict
+            Maps stage names to their processed / failed counts, utilisation
+            (fraction of worker time spent busy) and queue depths.
+        '''
+        return {stage.name: stage.stats(self.elapsed) for stage in self.stages}
+
+    def report(self):
+        '''Human-readable table of `stats`.'''
+        lines = ['{:>10s} {:>7s} {:>9s} {:>6s} {:>7s} {:>9s} {:>10s}'.format(
+            'stage', 'workers', 'processed', 'failed', 'util', 'queue max', 'queue mean')]
+        for name, stat in self.stats().items():
+            lines.append('{:>10s} {:>7d} {:>9d} {:>6d} {:>6.0%} {:>9d} {:>10.1f}'.format(
+                name, stat['workers'], stat['processed'], stat['failed'],
+                stat['utilisation'], stat['queue_max'], stat['queue_mean']))
+        return '\n'.join(lines)
@@ -0,0 +1,334 @@
+'''Reconciliation of the proceedings against DBLP exports.
+
+The exports next to the proceedings come in three shapes:
+
+* `<year>_dblp.html`, the text submission format of `templates/dblp.txt`;
+* `<year>_dblp.xml` as a DBLP submission (`<dblpsubmission>`, see
+  `templates/dblp.xml`), which carries no cite keys;
+* `<year>_dblp.xml` as DBLP records (`<inproceedings key=...>`), which do.
+
+The JSON written by `scripts/parse_dblp.py` is read as DBLP records too.
+Every paper of a year is matched to an export record through blocks of
+records sharing a word bigram of the normalised title or an author
+surname; only pairs within a block are scored:
+
+    papers, exports = zen.reconcile.load(database_dir)
+    for year, result in zen.reconcile.reconcile(papers, exports).items():
+        result['matches'], result['mismatches'], ...
+
+A match fills in a missing `dblp_key`, and any disagreement in title,
+authors, pages, DOI or cite key is reported.
+'''
+import collections
+import glob
+import html
+import json
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+
+import zen.authors
+import zen.corpus
+import zen.dblp
+
+logger = logging.getLogger("zen.reconcile")
+
+# Minimum score of a match, and the weight of the title in the score.
+MIN_SCORE = 0.5
+TITLE_WEIGHT = 0.7
+
+# Fields compared between a paper and its match.
+FIELDS = ('title', 'author', 'pages', 'doi', 'dblp_key')
+
+# An ampersand that does not start an entity, as in hand-edited exports.
+_BARE_AMPERSAND = re.compile(r'&(?!#?\w+;)')
+
+
+def _text(value):
+    # xmltodict keeps attributes and markup in dicts; only the text counts.
+    if isinstance(value, dict):
+        return ' '.join(_text(v) for k, v in value.items() if not k.startswith('@'))
+    if isinstance(value, list):
+        return ' '.join(_text(v) for v in value)
+    return value or ''
+
+
+def _listify(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _doi(value):
+    match = re.search(r'(10\.\d{4,}/\S+)', value or '')
+    return match.group(1) if match else None
+
+
+def export_record(year, title, author, pages=None, doi=None, dblp_key=None, ee=None):
+    '''An export record, in the shape used for matching.'''
+    return dict(year=str(year), title=' '.join(title.split()).rstrip('.'),
+                author=[' '.join(name.split()) for name in author],
+                pages=pages or None, doi=doi or None, dblp_key=dblp_key, ee=ee or None)
+
+
+def parse_text_export(text, year):
+    '''Records of a text submission (`templates/dblp.txt`).'''
+    records = []
+    for entry in text.split('<li>')[1:]:
+        lines = [line.strip() for line in entry.split('\n')]
+        ee = re.search(r'<ee>(.*?)</ee>', entry)
+        lines = [line for line in lines if line and not line.startswith('<')]
+        if len(lines) < 2:
+            continue
+        # 'Jan Hajič, jr.' is one author, though split by the separator.
+        authors = []
+        for name in html.unescape(lines[0].rstrip(':')).split(', '):
+            if authors and name.strip(' .').casefold() in zen.authors.SUFFIXES:
+                authors[-1] += ', ' + name
+            else:
+                authors.append(name)
+        pages = lines[2] if len(lines) > 2 and re.match(r'^\d+(-\d+)?$', lines[2]) else None
+        records.append(export_record(year, html.unescape(lines[1]), authors, pages,
+                                     ee=ee.group(1) if ee else None))
+    return records
+
+
+def parse_xml_export(text, year):
+    '''Records of an XML export, either a DBLP submission or DBLP records.'''
+    parser = ET.XMLParser()
+    parser.entity.update(zen.dblp.ENTITIES)
+    parser.feed(_BARE_AMPERSAND.sub('&amp;', text))
+    root = parser.close()
+
+    records = []
+    for publ in root.iter('publ'):
+        records.append(export_record(
+            year, ''.join(publ.find('title').itertext()),
+            [''.join(author.itertext()) for author in publ.findall('author')],
+            publ.findtext('pages'), _doi(publ.findtext('doi'))))
+    for elem in root.iter('inproceedings'):
+        records.append(record_from_dblp(zen.dblp.parse_element(elem), year))
+    return records
+
+
+def record_from_dblp(record, year=None):
+    '''Export record of a DBLP record, as parsed by `zen.dblp`.'''
+    ees = [_text(ee) for ee in _listify(record.get('ee'))]
+    doi = next((_doi(value) for value in ees + [_text(record.get('url'))] if _doi(value)),
+               None)
+    return export_record(year or record.get('year'), _text(record.get('title')),
+                         [_text(name) for name in _listify(record.get('author'))],
+                         record.get('pages'), doi, record.get('@key'),
+                         ees[0] if ees else None)
+
+
+def read_export(path, year=None):
+    '''Records of an export file, see the module docstring.
+
+    Parameters
+    ----------
+    path : str
+        Path of a `.html`, `.xml` or parse_dblp `.json` export.
+
+    year : str, default=None
+        Year of the records; by default, from a `<year>_dblp.*` file name.
+
+    Returns
+    -------
+    records : list of dict
+        With the `year`, `title`, `author` list, `pages`, `doi`,
+        `dblp_key` and `ee` of every paper.
+    '''
+    if year is None:
+        match = re.match(r'^(\d{4})', os.path.basename(path))
+        year = match.group(1) if match else None
+    with open(path, encoding='utf-8') as fp:
+        text = fp.read()
+
+    if path.endswith('.json'):
+        return [record_from_dblp(record) for record in json.loads(text).values()
+                if 'author' in record]
+    if path.endswith('.xml'):
+        return parse_xml_export(text, year)
+    return parse_text_export(text, year)
+
+
+def export_files(root=zen.corpus.DATABASE_DIR):
+    '''Export files of a database directory, by year; XML before HTML.'''
+    files = dict()
+    for filename in sorted(glob.glob(os.path.join(root, 'proceedings', '*_dblp.*'))):
+        year, ext = os.path.basename(filename).split('_dblp.')
+        if ext in ('xml', 'html') and (year not in files or ext == 'xml'):
+            files[year] = filename
+    return files
+
+
+def _surnames(names):
+    keys = (zen.authors.normalize_name(name).split() for name in names)
+    return set(key[-1] for key in keys if key)
+
+
+def _title_keys(title):
+    words = zen.corpus.normalize_title(title or '').split()
+    if len(words) < 2:
+        return set(words)
+    return set(zip(words, words[1:]))
+
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.
+
+
+def match(papers, records, min_score=MIN_SCORE):
+    '''One-to-one matches between papers and export records of a year.
+
+    Candidates share a title bigram or an author surname; each is scored by
+    the Jaccard similarities of the title bigrams and of the surnames, and
+    the best-scored pairs are matched first.
+
+    Parameters
+    ----------
+    papers : list of dict
+        Normalised papers.
+
+    records : list of dict
+        Export records, see `read_export`.
+
+    min_score : float, default=MIN_SCORE
+        Minimum score of a match.
+
+    Returns
+    -------
+    matches : list of tuple
+        (paper index, record index, score), in paper order.
+    '''
+    features = [(_title_keys(record['title']), _surnames(record['author']))
+                for record in records]
+    blocks = collections.defaultdict(list)
+    for index, (titles, surnames) in enumerate(features):
+        for key in titles:
+            blocks['t', key].append(index)
+        for key in surnames:
+            blocks['a', key].append(index)
+
+    scored = []
+    for position, paper in enumerate(papers):
+        titles, surnames = _title_keys(paper['title']), _surnames(paper['author'] or [])
+        candidates = set()
+        for key in titles:
+            candidates.update(blocks.get(('t', key), ()))
+        for key in surnames:
+            candidates.update(blocks.get(('a', key), ()))
+        for index in candidates:
+            score = (TITLE_WEIGHT * _jaccard(titles, features[index][0]) +
+                     (1 - TITLE_WEIGHT) * _jaccard(surnames, features[index][1]))
+            if score >= min_score:
+                scored.append((score, position, index))
+
+    matched, used = dict(), set()
+    for score, position, index in sorted(scored, key=lambda item: (-item[0], item[1:])):
+        if position not in matched and index not in used:
+            matched[position] = (index, score)
+            used.add(index)
+    return [(position, index, score) for position, (index, score) in sorted(matched.items())]
+
+
+def _pages(value):
+    return re.sub(r'\s*[-–—]+\s*', '-', value.strip()) if value else None
+
+
+def compare(paper, record):
+    '''Fields on which a paper and its export record disagree.
+
+    Returns
+    -------
+    mismatches : dict
+        Field to the (paper, export) values; fields missing on either side
+        are not compared.
+    '''
+    values = dict(
+        title=(zen.corpus.normalize_title(paper['title'] or ''),
+               zen.corpus.normalize_title(record['title'])),
+        author=([zen.authors.normalize_name(name) for name in paper['author'] or []],
+                [zen.authors.normalize_name(name) for name in record['author']]),
+        pages=(_pages(paper['pages']), _pages(record['pages'])),
+        doi=((paper['doi'] or '').lower() or None, (record['doi'] or '').lower() or None),
+        dblp_key=(paper['dblp_key'], record['dblp_key']))
+
+    mismatches = dict()
+    for field in FIELDS:
+        ours, theirs = values[field]
+        if ours and theirs and ours != theirs:
+            mismatches[field] = (paper[field], record[field])
+    return mismatches
+
+
+def reconcile(papers, exports, min_score=MIN_SCORE):
+    '''Match the papers of every year to their export records.
+
+    Parameters
+    ----------
+    papers : dict
+        Year to its normalised papers.
+
+    exports : dict
+        Year to its export records.
+
+    Returns
+    -------
+    results : dict
+        Year to a dict of `matches` as (paper index, record index, score),
+        the `unmatched` paper indexes and `unmatched_exports` record indexes,
+        the `mismatches` as (paper index, record index, fields) and the
+        `keys` to fill in, as paper index to cite key.
+    '''
+    results = dict()
+    for year in sorted(set(papers) & set(exports)):
+        ours, theirs = papers[year], exports[year]
+        matches = match(ours, theirs, min_score)
+        matched = set(position for position, _, _ in matches)
+        used = set(index for _, index, _ in matches)
+        mismatches, keys = [], dict()
+        for position, index, _ in matches:
+            fields = compare(ours[position], theirs[index])
+            if fields:
+                mismatches.append((position, index, fields))
+            if theirs[index]['dblp_key'] and not ours[position]['dblp_key']:
+                keys[position] = theirs[index]['dblp_key']
+        results[year] = dict(
+            matches=matches, mismatches=mismatches, keys=keys,
+            unmatched=[n for n in range(len(ours)) if n not in matched],
+            unmatched_exports=[n for n in range(len(theirs)) if n not in used])
+    return results
+
+
+def load(database_dir=zen.corpus.DATABASE_DIR, filenames=()):
+    '''Papers and export records of a database directory, by year.
+
+    Parameters
+    ----------
+    database_dir : str, default=zen.corpus.DATABASE_DIR
+        Directory holding `proceedings/<year>.json` and the exports.
+
+    filenames : iterable of str
+        Extra exports, e.g. the output of `scripts/parse_dblp.py`.
+
+    Returns
+    -------
+    papers : dict
+        Year to its normalised papers, for the years with an export.
+
+    exports : dict
+        Year to its export records.
+    '''
+    exports = collections.defaultdict(list)
+    for year, filename in export_files(database_dir).items():
+        exports[year].extend(read_export(filename, year))
+    for filename in filenames:
+        for record in read_export(filename):
+            exports[record['year']].append(record)
+
+    corpus = zen.corpus.Corpus(database_dir)
+    papers = dict((year, corpus.papers(year)) for year in corpus.years if year in exports)
+    return papers, dict(exports)
@@ -0,0 +1,331 @@
+'''BM25 full-text search over the titles and abstracts of the proceedings.
+
+The index is a directory of per-year segments, built from the JSON sources
+with `build`. Each segment is a small JSON header (lexicon, document titles,
+statistics) next to a binary file of uint32 arrays: document lengths, then
+the document ids and term frequencies of all postings, sorted by term. The
+binary file is memory-mapped at query time, so opening the index reads only
+the headers. A manifest lists the segments; a rebuild only re-indexes the
+years whose JSON changed, and only ever deletes files it wrote:
+
+    zen.search.build('database', 'search-index')
+    index = zen.search.Index('search-index')
+    index.search('chord recognition', limit=5)
+
+Collection statistics (document count, average length, document
+frequencies) are summed over the segments at query time, so scores do not
+depend on how the corpus is split.
+'''
+import array
+import collections
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import sys
+import unicodedata
+
+import zen.corpus
+import zen.pdfcache
+
+logger = logging.getLogger("zen.search")
+
+# Bump on any change to the tokenizer or the segment layout.
+FORMAT_VERSION = 1
+
+# Title terms count this many times as abstract terms.
+TITLE_WEIGHT = 2
+
+# BM25 parameters.
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = frozenset('''
+a an and are as at be been but by can for from has have in into is it its of
+on or our such that the their then there these this those to was we were
+which while with
+'''.split())
+
+TOKEN = re.compile(r'[^\W_]+')
+
+# File of the index listing its segments, and their binary files.
+MANIFEST = '.manifest.json'
+
+
+def tokenize(text):
+    '''Index terms of a text: casefolded words without accents or stopwords.
+
+    Parameters
+    ----------
+    text : str or None
+        Text to tokenize.
+
+    Returns
+    -------
+    terms : list of str
+        Terms, in order of appearance.
+    '''
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [term for term in TOKEN.findall(text) if term not in STOPWORDS]
+
+
+def _paper_terms(paper):
+    counts = collections.Counter()
+    for term in tokenize(paper.get('title')):
+        counts[term] += TITLE_WEIGHT
+    counts.update(tokenize(paper.get('abstract')))
+    return counts
+
+
+def write_segment(index_dir, year, papers, sha256):
+    '''Index the papers of one year as a segment.
+
+    Parameters
+    ----------
+    index_dir : str
+        Directory of the index.
+
+    year : str
+        Year of the papers; names the segment.
+
+    papers : list of dict
+        Normalised papers, see `zen.corpus`.
+
+    sha256 : str
+        Hash of the source file, stored to detect changes.
+
+    Returns
+    -------
+    header : dict
+        Header of the segment, as written next to its binary file.
+    '''
+    lengths, postings = array.array('I'), dict()
+    for doc, paper in enumerate(papers):
+        counts = _paper_terms(paper)
+        lengths.append(sum(counts.values()))
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc, tf))
+
+    lexicon, docs, tfs = dict(), array.array('I'), array.array('I')
+    for term in sorted(postings):
+        lexicon[term] = [len(docs), len(postings[term])]
+        for doc, tf in postings[term]:
+            docs.append(doc)
+            tfs.append(tf)
+
+    # The binary file is named after its source, so the header always points
+    # at a complete one; the header is replaced last.
+    data = '{}.{}.bin'.format(year, sha256[:16])
+    with open(os.path.join(index_dir, data + '.tmp'), 'wb') as fp:
+        for values in (lengths, docs, tfs):
+            values.tofile(fp)
+    os.replace(os.path.join(index_dir, data + '.tmp'), os.path.join(index_dir, data))
+
+    header = dict(version=FORMAT_VERSION, byteorder=sys.byteorder, sha256=sha256, data=data,
+                  num_docs=len(lengths), num_postings=len(docs), total_length=sum(lengths),
+                  docs=[[paper.get('title'), paper.get('doi')] for paper in papers],
+                  lexicon=lexicon)
+    path = os.path.join(index_dir, year + '.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as fp:
+        json.dump(header, fp)
+    os.replace(path + '.tmp', path)
+    return header
+
+
+def _read_header(index_dir, year):
+    try:
+        with open(os.path.join(index_dir, year + '.json'), encoding='utf-8') as fp:
+            header = json.load(fp)
+    except (OSError, ValueError):
+        return None
+    if header.get('version') != FORMAT_VERSION or header.get('byteorder') != sys.byteorder:
+        return None
+    return header
+
+
+def _read_manifest(index_dir):
+    # Year to the binary file of its segment, as of the last build.
+    try:
+        with open(os.path.join(index_dir, MANIFEST), encoding='utf-8') as fp:
+            return json.load(fp)['segments']
+    except (OSError, ValueError, KeyError):
+        return dict()
+
+
+def build(database_dir, index_dir, force=False):
+    '''Build or update the search index from the JSON sources.
+
+    Parameters
+    ----------
+    database_dir : str
+        Directory holding `proceedings/<year>.json`.
+
+    index_dir : str
+        Directory of the index; created if needed.
+
+    force : bool, default=False
+        Re-index every year, changed or not.
+
+    Returns
+    -------
+    updated : list of str
+        Years that were (re-)indexed or removed.
+    '''
+    os.makedirs(index_dir, exist_ok=True)
+    files = zen.corpus.proceedings_files(database_dir)
+    corpus = zen.corpus.Corpus(database_dir)
+    previous = _read_manifest(index_dir)
+
+    updated, segments = [], dict()
+    for year in sorted(files):
+        sha256 = zen.pdfcache.sha256sum(files[year])
+        header = _read_header(index_dir, year)
+        if force or header is None or header['sha256'] != sha256:
+            header = write_segment(index_dir, year, corpus.papers(year), sha256)
+            updated.append(year)
+            logger.info('indexed %s', year)
+        segments[year] = header['data']
+
+    path = os.path.join(index_dir, MANIFEST)
+    with open(path + '.tmp', 'w', encoding='utf-8') as fp:
+        json.dump(dict(version=FORMAT_VERSION, segments=segments), fp)
+    os.replace(path + '.tmp', path)
+
+    # Files of earlier builds the manifest no longer points to; anything
+    # else in the directory is left alone.
+    live = set(segments.values())
+    for year, data in previous.items():
+        stale = [data] if data not in live else []
+        if year not in segments:
+            stale.append(year + '.json')
+            updated.append(year)
+        for fn in stale:
+            if os.path.exists(os.path.join(index_dir, fn)):
+                os.remove(os.path.join(index_dir, fn))
+    return sorted(updated)
+
+
+class Segment(object):
+    '''A memory-mapped segment of the index.
+
+    Parameters
+    ----------
+    index_dir : str
+        Directory of the index.
+
+    year : str
+        Year of the segment.
+    '''
+
+    def __init__(self, index_dir, year):
+        self.year = year
+        header = _read_header(index_dir, year)
+        if header is None:
+            raise ValueError('no valid segment for {} in {}'.format(year, index_dir))
+        self.num_docs = header['num_docs']
+        self.total_length = header['total_length']
+        self.docs = header['docs']
+        self.lexicon = header['lexicon']
+
+        self._mmap = None
+        with open(os.path.join(index_dir, header['data']), 'rb') as fp:
+            if os.fstat(fp.fileno()).st_size:
+                self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap if self._mmap is not None else b'').cast('I')
+        num_postings = header['num_postings']
+        self._views = [view,
+                       view[:self.num_docs],
+                       view[self.num_docs:self.num_docs + num_postings],
+                       view[self.num_docs + num_postings:]]
+        _, self.lengths, self.postings, self.tfs = self._views
+
+    def df(self, term):
+        '''Number of documents of the segment containing a term.'''
+        entry = self.lexicon.get(term)
+        return entry[1] if entry is not None else 0
+
+    def close(self):
+        for view in self._views[::-1]:
+            view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+
+
+class Index(object):
+    '''Query interface of an index made by `build`.
+
+    Parameters
+    ----------
+    index_dir : str
+        Directory of the index.
+    '''
+
+    def __init__(self, index_dir):
+        self.segments = [Segment(index_dir, year) for year in sorted(_read_manifest(index_dir))]
+        self.num_docs = sum(segment.num_docs for segment in self.segments)
+        self.avg_length = (sum(segment.total_length for segment in self.segments) /
+                           max(1, self.num_docs))
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def search(self, query, limit=10):
+        '''Rank papers against a query with BM25.
+
+        Parameters
+        ----------
+        query : str
+            Free text; papers matching any of its terms are ranked.
+
+        limit : int, default=10
+            Maximum number of results.
+
+        Returns
+        -------
+        results : list of dict
+            Best matches first, with keys `score`, `year`, `position` (index
+            of the paper in its proceedings file), `title` and `doi`.
+        '''
+        # An empty index, or one of empty documents, matches nothing.
+        if not self.avg_length:
+            return []
+
+        # BM25 length normalisation, K1 * (1 - B + B * length / avg_length).
+        norm = K1 * (1 - B), K1 * B / self.avg_length
+
+        scores = dict()
+        for term in set(tokenize(query)):
+            df = sum(segment.df(term) for segment in self.segments)
+            if not df:
+                continue
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+            for segment in self.segments:
+                entry = segment.lexicon.get(term)
+                if entry is None:
+                    continue
+                start, count = entry
+                lengths = segment.lengths
+                for doc, tf in zip(segment.postings[start:start + count],
+                                   segment.tfs[start:start + count]):
+                    key = (segment, doc)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (K1 + 1) / (
+                        tf + norm[0] + norm[1] * lengths[doc])
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [dict(score=score, year=segment.year, position=doc,
+                     title=segment.docs[doc][0], doi=segment.docs[doc][1])
+                for (segment, doc), score in best]
@@ -0,0 +1,303 @@
+'''In-process stand-in for the Zenodo deposition API.
+
+Serves the endpoints used by `zen.api` from a background thread, so uploads
+can be tested and benchmarked without network access:
+
+    with zen.testing.FakeZenodo(latency=0.01) as fake:
+        client = zen.api.ZenodoClient(host=fake.host, token=fake.token)
+        zid = client.create_id()
+
+Depositions live in memory; uploaded files are hashed and counted, but their
+contents are not kept.
+'''
+import collections
+import hashlib
+import http.server
+import json
+import random
+import re
+import socket
+import threading
+import time
+import urllib.parse
+
+ROUTES = [
+    ('HEAD', re.compile(r'^/$'), 'ping'),
+    ('GET', re.compile(r'^/$'), 'ping'),
+    ('POST', re.compile(r'^/api/deposit/depositions/?$'), 'create'),
+    ('GET', re.compile(r'^/api/deposit/depositions/?$'), 'list'),
+    ('GET', re.compile(r'^/api/deposit/depositions/(\d+)$'), 'get'),
+    ('PUT', re.compile(r'^/api/deposit/depositions/(\d+)$'), 'metadata'),
+    ('POST', re.compile(r'^/api/deposit/depositions/(\d+)/actions/publish$'), 'publish'),
+    ('POST', re.compile(r'^/api/deposit/depositions/(\d+)/actions/edit$'), 'edit'),
+    ('PUT', re.compile(r'^/api/files/(\d+)/(.+)$'), 'file'),
+]
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.fake._count('connections')
+
+    def log_message(self, *args):
+        pass
+
+    def _read_body(self, sink):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                sink(self.rfile.read(size))
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get('Content-Length') or 0)
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, 1 << 16))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                sink(chunk)
+
+    def _send(self, status, content=None, headers=None):
+        body = json.dumps(content).encode('utf-8') if content is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or dict()).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _dispatch(self):
+        url = urllib.parse.urlsplit(self.path)
+        for method, pattern, name in ROUTES:
+            match = pattern.match(url.path)
+            if method == self.command and match:
+                break
+        else:
+            self._read_body(lambda chunk: None)
+            return self._send(404, dict(status=404, message='Not found.'))
+
+        fake = self.server.fake
+        md5, body = hashlib.md5(), []
+        size = [0]
+
+        def sink(chunk):
+            md5.update(chunk)
+            size[0] += len(chunk)
+            if name != 'file':
+                body.append(chunk)
+
+        self._read_body(sink)
+        fake._count(name)
+
+        status, content, headers = fake._intercept(name)
+        if status is None:
+            token = urllib.parse.parse_qs(url.query).get('access_token', [None])[0]
+            if name != 'ping' and token != fake.token:
+                status, content = 401, dict(status=401, message='Unauthorized.')
+            else:
+                data = dict(md5=md5.hexdigest(), size=size[0], body=b''.join(body))
+                status, content = getattr(fake, '_' + name)(*match.groups(), **data)
+
+        fake._count(status)
+        self._send(status, content, headers)
+
+    do_HEAD = do_GET = do_POST = do_PUT = _dispatch
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is expected.
+        pass
+
+
+class FakeZenodo(object):
+    '''Local fake of the Zenodo deposition API.
+
+    Parameters
+    ----------
+    latency : float or tuple, default=0
+        Seconds to wait before answering each request; a (low, high) pair
+        draws uniformly from that range.
+
+    error_rate : float, default=0
+        Fraction of requests answered with a transient 503, which the client
+        only retries for idempotent methods.
+
+    throttle_rate : float, default=0
+        Fraction of requests answered with a 429 and a `Retry-After` header.
+
+    rate_limit : float, default=None
+        If given, requests per second allowed before answering 429, enforced
+        by a token bucket of one second's burst.
+
+    retry_after : float, default=1
+        Seconds advertised in `Retry-After` on 429 responses.
+
+    bandwidth : float, default=None
+        If given, file uploads take an extra `size / bandwidth` seconds.
+
+    token : str, default='fake-token'
+        Access token the server accepts.
+
+    seed : int, default=None
+        Seed for the random fault injection.
+    '''
+
+    def __init__(self, latency=0, error_rate=0, throttle_rate=0, rate_limit=None,
+                 retry_after=1, bandwidth=None, token='fake-token', seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.bandwidth = bandwidth
+        self.token = token
+
+        self.depositions = dict()
+        self.stats = collections.Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._tokens = rate_limit or 0
+        self._refilled = time.monotonic()
+        self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def host(self):
+        return 'http://{}:{}'.format(*self._server.server_address)
+
+    def start(self):
+        '''Start serving on a free localhost port.'''
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.fake = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _intercept(self, name):
+        '''Inject latency and faults; returns (status, content, headers).'''
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            latency = self._random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+        with self._lock:
+            draw = self._random.random()
+            limited = False
+            if self.rate_limit:
+                now = time.monotonic()
+                self._tokens = min(self.rate_limit, self._tokens +
+                                   (now - self._refilled) * self.rate_limit)
+                self._refilled = now
+                limited = self._tokens < 1
+                if not limited:
+                    self._tokens -= 1
+
+        headers = dict()
+        if self.rate_limit:
+            headers.update({'X-RateLimit-Limit': int(self.rate_limit),
+                            'X-RateLimit-Remaining': max(0, int(self._tokens)),
+                            'X-RateLimit-Reset': int(time.time()) + 1})
+
+        if name == 'ping':
+            return None, None, headers
+        elif limited or draw < self.throttle_rate:
+            headers['Retry-After'] = self.retry_after
+            return 429, dict(status=429, message='Too many requests.'), headers
+        elif draw < self.throttle_rate + self.error_rate:
+            return 503, dict(status=503, message='Service unavailable.'), headers
+        return None, None, headers
+
+    def _deposition(self, zid):
+        with self._lock:
+            return self.depositions.get(int(zid))
+
+    def _ping(self, **data):
+        return 200, None
+
+    def _create(self, **data):
+        with self._lock:
+            zid = self._next_id
+            self._next_id += 1
+            self.depositions[zid] = dict(
+                id=zid, state='unsubmitted', submitted=False, metadata=dict(),
+                files=[], links=dict(bucket='{}/api/files/{}'.format(self.host, zid)))
+            return 201, self.depositions[zid]
+
+    def _list(self, **data):
+        with self._lock:
+            return 200, list(self.depositions.values())
+
+    def _get(self, zid, **data):
+        deposition = self._deposition(zid)
+        if deposition is None:
+            return 404, dict(status=404, message='PID does not exist.')
+        return 200, deposition
+
+    def _metadata(self, zid, body, **data):
+        deposition = self._deposition(zid)
+        if deposition is None:
+            return 404, dict(status=404, message='PID does not exist.')
+        elif deposition['state'] == 'done':
+            return 400, dict(status=400, message='Deposition is published.')
+        deposition['metadata'] = json.loads(body.decode('utf-8'))['metadata']
+        return 200, deposition
+
+    def _publish(self, zid, **data):
+        deposition = self._deposition(zid)
+        if deposition is None:
+            return 404, dict(status=404, message='PID does not exist.')
+        elif not deposition['files']:
+            return 400, dict(status=400, message='Missing uploaded files.')
+        deposition.update(
+            state='done', submitted=True, doi='10.5072/zenodo.{}'.format(zid),
+            doi_url='https://doi.org/10.5072/zenodo.{}'.format(zid))
+        return 202, deposition
+
+    def _edit(self, zid, **data):
+        deposition = self._deposition(zid)
+        if deposition is None:
+            return 404, dict(status=404, message='PID does not exist.')
+        deposition['state'] = 'inprogress'
+        return 201, deposition
+
+    def _file(self, zid, filename, md5, size, **data):
+        filename = urllib.parse.unquote(filename)
+        deposition = self._deposition(zid)
+        if deposition is None:
+            return 404, dict(status=404, message='Bucket does not exist.')
+        elif deposition['submitted']:
+            # Files are locked once published, even while editing.
+            return 403, dict(status=403, message='Bucket is locked for modifications.')
+        if self.bandwidth:
+            time.sleep(size / float(self.bandwidth))
+        with self._lock:
+            deposition['files'] = [f for f in deposition['files']
+                                   if f['filename'] != filename]
+            deposition['files'].append(dict(filename=filename, filesize=size,
+                                            checksum=md5))
+        return 201, dict(key=filename, size=size, checksum='md5:' + md5)
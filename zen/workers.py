@@ -0,0 +1,167 @@
+'''Worker processes with hard per-call time and memory limits.
+
+`joblib.Parallel` cannot interrupt a call, so one input that sends a library
+into an endless loop stalls the whole batch. Here every worker is a process
+of its own: a call running past its deadline gets its worker killed and
+replaced, and an address-space limit turns runaway allocations into a
+`MemoryError` inside the worker, after which it is replaced as well.
+
+    for index, status, value in zen.workers.imap_isolated(
+            func, items, num_workers=4, timeout=60, max_memory=2 * 2**30):
+        ...
+'''
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import resource
+import time
+import traceback
+
+logger = logging.getLogger("zen.workers")
+
+# Outcomes of a call, as reported by `imap_isolated`.
+OK = 'ok'
+TIMEOUT = 'timeout'
+MEMORY = 'memory'
+ERROR = 'error'
+CRASHED = 'crashed'
+
+
+def num_workers(n_jobs):
+    '''Number of processes for a joblib-style `n_jobs` (-1 = all CPUs).'''
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, n_jobs)
+
+
+def _serve(conn, func, max_memory):
+    if max_memory is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        index, args = task
+        try:
+            conn.send((index, OK, func(*args)))
+        except MemoryError:
+            # The heap may be in any state now; let the parent replace us.
+            conn.send((index, MEMORY, 'exceeded {} bytes'.format(max_memory)))
+            break
+        except Exception:
+            conn.send((index, ERROR, traceback.format_exc()))
+
+
+class _Worker(object):
+
+    def __init__(self, ctx, func, max_memory):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_serve, args=(child, func, max_memory),
+                                   daemon=True)
+        self.process.start()
+        child.close()
+        self.task = None
+        self.deadline = None
+
+    def submit(self, index, args, timeout):
+        self.task = index
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.conn.send((index, args))
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join()
+        self.conn.close()
+
+
+def imap_isolated(func, items, num_workers=1, timeout=None, max_memory=None):
+    '''Apply a function to every item in limited, replaceable worker processes.
+
+    Parameters
+    ----------
+    func : callable
+        Picklable, module-level function; called as `func(*item)`.
+
+    items : iterable of tuple
+        Arguments of every call.
+
+    num_workers : int, default=1
+        Number of worker processes.
+
+    timeout : float, default=None
+        Wall-clock seconds allowed per call; its worker is killed beyond it.
+
+    max_memory : int, default=None
+        Address-space limit of each worker, in bytes.
+
+    Yields
+    ------
+    index : int
+        Position of the item.
+
+    status : str
+        One of OK, TIMEOUT, MEMORY, ERROR (an exception was raised) or
+        CRASHED (the worker died).
+
+    value : object
+        The result for OK, otherwise a description of the failure.
+    '''
+    ctx = multiprocessing.get_context()
+    pending = list(enumerate(items))[::-1]
+    workers = [_Worker(ctx, func, max_memory)
+               for _ in range(min(num_workers, len(pending)))]
+
+    def assign(worker):
+        if pending:
+            worker.submit(*pending.pop(), timeout=timeout)
+
+    def replace(worker):
+        worker.stop(kill=True)
+        fresh = _Worker(ctx, func, max_memory)
+        workers[workers.index(worker)] = fresh
+        return fresh
+
+    try:
+        for worker in workers:
+            assign(worker)
+
+        while any(worker.task is not None for worker in workers):
+            busy = [worker for worker in workers if worker.task is not None]
+            deadlines = [w.deadline for w in busy if w.deadline is not None]
+            wait = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+            ready = multiprocessing.connection.wait([w.conn for w in busy], timeout=wait)
+
+            for worker in busy:
+                index = worker.task
+                if worker.conn in ready:
+                    try:
+                        _, status, value = worker.conn.recv()
+                    except (EOFError, OSError):
+                        status, value = CRASHED, 'exit code {}'.format(
+                            worker.process.exitcode)
+                elif worker.deadline is not None and time.monotonic() >= worker.deadline:
+                    status, value = TIMEOUT, 'exceeded {}s'.format(timeout)
+                else:
+                    continue
+
+                worker.task = None
+                if status in (TIMEOUT, MEMORY, CRASHED):
+                    logger.warning('item %d: %s (%s); replacing worker', index, status, value)
+                    worker = replace(worker)
+                assign(worker)
+                yield index, status, value
+    finally:
+        for worker in workers:
+            worker.stop(kill=worker.task is not None)